@@ -1,7 +1,11 @@
+import logging
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.tools.metrics import MetricsMiddleware
+
 
 def create_app():
     app = FastAPI(title="Анализатор Текста",
@@ -18,10 +22,17 @@ def create_app():
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_middleware(MetricsMiddleware)
 
     @app.on_event('startup')
     def startup():
-        pass
+        # Импорт здесь: модуль подготовки импортирует обработчики, которые импортируют пакет app
+        from app.config import settings
+        from app.warmup import readiness
+
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+        if settings.preload:
+            readiness.start()
 
     return app
 
@@ -0,0 +1,321 @@
+"""
+Пакетный анализ архивов сообщений без HTTP: сообщения читаются потоком из файла JSONL или CSV, анализируются
+пакетами в пуле процессов теми же обработчиками, что и в сервисе (MoodHandler, ToxicHandler, NatashaHandler),
+а результаты дописываются в файл JSONL в порядке входных сообщений по мере готовности пакетов.
+
+Строка JSONL - строка JSON с текстом или объект с текстом в поле --text-field, строка CSV - запись с текстом
+в столбце --text-field. Каждая строка результата содержит index - номер сообщения во входном файле (с нуля),
+id - значение поля --id-field, если оно задано, и разделы запрошенных видов анализа (или error).
+
+После каждого записанного пакета сохраняется контрольная точка (файл --checkpoint, по умолчанию
+<output>.checkpoint): количество обработанных сообщений и размер файла результатов. Повторный запуск с теми же
+параметрами продолжает работу с контрольной точки, отбрасывая недописанный хвост файла результатов.
+
+Запуск:
+    python -m app.bulk archive.jsonl scores.jsonl --analyses mood,toxicity --workers 4
+    python -m app.bulk posts.csv scores.jsonl --text-field text --id-field post_id --batch-size 512
+    python -m app.bulk posts.csv scores.jsonl --text-field text --restart
+"""
+import argparse
+import csv
+import fcntl
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator
+
+from pydantic import BaseModel
+
+logger = logging.getLogger('app.bulk')
+
+
+class BulkCheckpoint(BaseModel):
+    """
+        Контрольная точка пакетного анализа.
+
+        Атрибуты:
+        ----------
+        input : str
+            Путь к входному файлу.
+        options : dict
+            Параметры, влияющие на результаты (виды анализа, фильтры, поля); продолжить можно только с теми же.
+        done : int
+            Количество обработанных входных сообщений (включая сообщения с ошибкой).
+        output_bytes : int
+            Размер файла результатов после записи последнего пакета.
+        completed : bool
+            Входной файл обработан полностью.
+        """
+
+    input: str
+    options: dict
+    done: int = 0
+    output_bytes: int = 0
+    completed: bool = False
+
+    def save(self, path: str):
+        """
+        Сохраняет контрольную точку атомарно: через временный файл и os.replace.
+        """
+
+        temporary = path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            file.write(self.json(ensure_ascii=False))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+
+
+def read_records(path: str, file_format: str, text_field: str, id_field: str | None) -> Iterator[tuple]:
+    """
+        Читает сообщения из файла потоком, не загружая файл в память. Пустые строки JSONL пропускаются.
+
+        Returns:
+            Iterator[tuple]: Тройки (id, текст, ошибка): для разобранных сообщений ошибка - None,
+            для неразобранных текст - None.
+        """
+
+    with open(path, encoding='utf-8', newline='') as file:
+        if file_format == 'csv':
+            for row in csv.DictReader(file):
+                text = row.get(text_field)
+                record_id = row.get(id_field) if id_field else None
+                if text is None:
+                    yield record_id, None, f"Нет столбца '{text_field}'"
+                else:
+                    yield record_id, text, None
+            return
+
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+            except ValueError as error:
+                yield None, None, f'Некорректный JSON: {error}'
+                continue
+            record_id = value.get(id_field) if id_field and isinstance(value, dict) else None
+            if isinstance(value, dict):
+                value = value.get(text_field)
+            if isinstance(value, str):
+                yield record_id, value, None
+            else:
+                yield record_id, None, f"Ожидается строка или объект с полем '{text_field}'"
+
+
+def _init_worker(torch_threads: int):
+    """
+    Инициализатор процесса пула: ограничивает потоки PyTorch долей ядер процесса и загружает модели.
+    Параллелизм обеспечивают процессы пакетного анализа, поэтому пул Natasha в них не запускается.
+    """
+
+    from app.config import settings
+
+    settings.torch_threads = torch_threads
+    settings.natasha_pool = False
+
+    from app.warmup import preload_models
+    preload_models()
+
+
+def analyze_batch(messages: list, analyses: list, filters: list) -> list:
+    """
+        Анализирует пакет сообщений (см. process_with_list) и возвращает результаты в компактном виде -
+        словарями встроенных типов только с разделами запрошенных видов анализа.
+        """
+
+    from fastapi.encoders import jsonable_encoder
+    from app.text_analysis import process_with_list
+
+    if not messages:
+        return []
+    result = process_with_list(data=messages, analyses=analyses, filters=filters)
+    exclude = result.unrequested_sections().get('results', {}).get('__all__', set())
+    return [jsonable_encoder(item, exclude=exclude) for item in result.results]
+
+
+def _load_checkpoint(checkpoint_path: str, input_path: str, output_path: str, options: dict,
+                     restart: bool) -> BulkCheckpoint:
+    """
+    Загружает контрольную точку или, если ее нет либо указан restart, создает новую.
+
+    Raises:
+        ValueError: Если контрольная точка получена для другого файла или с другими параметрами,
+            или файл результатов короче записанного в ней.
+    """
+
+    checkpoint = BulkCheckpoint(input=os.path.abspath(input_path), options=options)
+    if restart or not os.path.exists(checkpoint_path):
+        return checkpoint
+
+    saved = BulkCheckpoint.parse_file(checkpoint_path)
+    if (saved.input, saved.options) != (checkpoint.input, checkpoint.options):
+        raise ValueError(f'Контрольная точка {checkpoint_path} получена для другого файла или с другими '
+                         f'параметрами, для запуска заново укажите --restart')
+    output_bytes = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+    if saved.done and output_bytes < saved.output_bytes:
+        raise ValueError(f'Файл результатов {output_path} короче, чем записано в контрольной точке, '
+                         f'для запуска заново укажите --restart')
+    return saved
+
+
+@contextmanager
+def _exclusive(path: str):
+    """
+    Захватывает файл блокировки на время выполнения блока.
+
+    Raises:
+        ValueError: Если файл уже заблокирован другим процессом.
+    """
+
+    with open(path, 'w') as file:
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise ValueError(f'Контрольная точка {path} уже используется другим запуском') from None
+        yield
+
+
+def _submit(executor: ProcessPoolExecutor | None, messages: list, analyses: list, filters: list) -> Future:
+    if executor is not None:
+        return executor.submit(analyze_batch, messages, analyses, filters)
+    future = Future()
+    future.set_result(analyze_batch(messages, analyses, filters))
+    return future
+
+
+def run(input_path: str, output_path: str, file_format: str, analyses: list, filters: list, text_field: str,
+        id_field: str | None, workers: int, batch_size: int, checkpoint_path: str, restart: bool = False,
+        start_method: str = 'spawn', torch_threads: int = 1) -> BulkCheckpoint:
+    """
+        Выполняет пакетный анализ входного файла с продолжением с контрольной точки.
+
+        Args:
+            workers (int): Количество процессов пула (0 - анализ в текущем процессе).
+            batch_size (int): Количество сообщений в пакете.
+            restart (bool): Начать заново, не учитывая контрольную точку.
+
+        Returns:
+            BulkCheckpoint: Итоговая контрольная точка.
+
+        Raises:
+            ValueError: Если контрольная точка получена для другого файла или с другими параметрами
+                или используется другим запуском.
+        """
+
+    # Два запуска с одной контрольной точкой перемешали бы строки файла результатов
+    with _exclusive(checkpoint_path + '.lock'):
+        options = {'format': file_format, 'analyses': list(analyses), 'filters': list(filters),
+                   'text_field': text_field, 'id_field': id_field}
+        checkpoint = _load_checkpoint(checkpoint_path, input_path, output_path, options, restart)
+        if checkpoint.completed:
+            logger.info('Файл %s уже обработан (%s сообщений)', input_path, checkpoint.done)
+            return checkpoint
+        if checkpoint.done:
+            logger.info('Продолжение с сообщения %s', checkpoint.done)
+
+        executor = None
+        if workers:
+            executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(start_method),
+                                           initializer=_init_worker, initargs=(torch_threads,))
+
+        records = islice(read_records(input_path, file_format, text_field, id_field), checkpoint.done, None)
+        # Пакетов в работе не больше, чем нужно для загрузки всех процессов, чтобы не читать весь файл в память
+        pending = deque()
+        max_pending = max(1, workers) * 2
+        start_time = time.perf_counter()
+        start_done = checkpoint.done
+
+        def commit():
+            batch, future = pending.popleft()
+            results = iter(future.result())
+            lines = []
+            for index, (record_id, text, error) in enumerate(batch, start=checkpoint.done):
+                line = {'index': index}
+                if id_field:
+                    line['id'] = record_id
+                line.update({'error': error} if error is not None else next(results))
+                lines.append(json.dumps(line, ensure_ascii=False) + '\n')
+            output.write(''.join(lines).encode('utf-8'))
+            output.flush()
+            os.fsync(output.fileno())
+            checkpoint.done += len(batch)
+            checkpoint.output_bytes = output.tell()
+            checkpoint.save(checkpoint_path)
+
+            elapsed = time.perf_counter() - start_time
+            logger.info('Обработано %s сообщений, %.0f сообщений/с', checkpoint.done,
+                        (checkpoint.done - start_done) / elapsed if elapsed else 0)
+
+        # Недописанный после контрольной точки хвост файла результатов отбрасывается
+        with open(output_path, 'r+b' if checkpoint.done else 'wb') as output:
+            output.truncate(checkpoint.output_bytes)
+            output.seek(checkpoint.output_bytes)
+            try:
+                while batch := list(islice(records, batch_size)):
+                    messages = [text for _, text, error in batch if error is None]
+                    pending.append((batch, _submit(executor, messages, analyses, filters)))
+                    if len(pending) >= max_pending:
+                        commit()
+                while pending:
+                    commit()
+            finally:
+                if executor is not None:
+                    executor.shutdown(wait=not pending, cancel_futures=True)
+
+        checkpoint.completed = True
+        checkpoint.save(checkpoint_path)
+        return checkpoint
+
+
+def _detect_format(path: str) -> str:
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+if __name__ == '__main__':
+    from typing import get_args
+
+    from app.config import settings
+    from app.models import CollectionAnalysis
+
+    cpu_count = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='входной файл JSONL или CSV')
+    parser.add_argument('output', help='файл результатов JSONL')
+    parser.add_argument('--format', choices=('jsonl', 'csv'),
+                        help='формат входного файла (по умолчанию - по расширению)')
+    parser.add_argument('--text-field', default='message', help='поле или столбец с текстом сообщения')
+    parser.add_argument('--id-field', help='поле или столбец с идентификатором сообщения, копируемым в результат')
+    parser.add_argument('--analyses', type=lambda value: value.split(','), default=['mood', 'toxicity'],
+                        help='виды анализа через запятую: ' + ', '.join(get_args(CollectionAnalysis)))
+    parser.add_argument('--filter', action='append', default=[], dest='filters',
+                        help='слово или фраза фильтра Natasha (можно указать несколько раз)')
+    parser.add_argument('--workers', type=int, default=max(1, cpu_count // settings.torch_threads),
+                        help='количество процессов (0 - в текущем процессе)')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--checkpoint', help='файл контрольной точки (по умолчанию <output>.checkpoint)')
+    parser.add_argument('--restart', action='store_true', help='начать заново, не учитывая контрольную точку')
+    parser.add_argument('--start-method', default='spawn', choices=('spawn', 'forkserver', 'fork'))
+    args = parser.parse_args()
+
+    unknown = set(args.analyses) - set(get_args(CollectionAnalysis))
+    if unknown:
+        parser.error(f'неизвестные виды анализа: {", ".join(sorted(unknown))}')
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    try:
+        result = run(args.input, args.output, args.format or _detect_format(args.input), args.analyses, args.filters,
+                     args.text_field, args.id_field, args.workers, args.batch_size,
+                     args.checkpoint or args.output + '.checkpoint', args.restart, args.start_method,
+                     torch_threads=max(1, cpu_count // max(args.workers, 1)))
+    except ValueError as error:
+        parser.exit(2, f'{error}\n')
+    logger.info('Готово: %s сообщений', result.done)
+    sys.exit(0)
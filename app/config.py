@@ -0,0 +1,125 @@
+from pydantic import BaseSettings
+
+
+class Settings(BaseSettings):
+    """
+        Настройки приложения, читаются из переменных окружения с префиксом NORMA_.
+
+        Атрибуты:
+        ----------
+        torch_batch_size : int
+            Количество фрагментов текста в одном прямом проходе трансформера.
+        torch_threads : int
+            Количество потоков PyTorch для одного прямого прохода.
+        inference_workers : int
+            Количество запросов, выполняемых одновременно (0 - количество ядер, деленное на torch_threads).
+        inference_queue_size : int
+            Количество запросов, ожидающих выполнения; при заполненной очереди запросы сразу отклоняются.
+        overload_status_code : int
+            Код ответа на отклоненный запрос: 503 или 429.
+        overload_retry_after : int
+            Значение заголовка Retry-After в ответе на отклоненный запрос, с.
+        degrade_threshold : float
+            Доля заполнения пула и очереди, начиная с которой запросы обслуживаются в упрощенном режиме
+            (только настроение fastText, без трансформера и Natasha); 0 - не упрощать.
+        preload : bool
+            Загружать и прогревать модели при запуске приложения (в фоне, готовность - GET /ready).
+            Если выключено, модели загружаются при первом запросе.
+        mmap_dir : str
+            Каталог файлов массивов эмбеддингов Navec, отображаемых в память и разделяемых процессами ('' - не отображать,
+            по умолчанию; python -m app.serve включает отображение сам).
+        torch_backend : str
+            Бэкенд инференса модели токсичности: 'torch' или 'onnx' (модель экспортируется командой
+            python -m app.tools.nlp_torch.export).
+        onnx_model_dir : str
+            Каталог экспортированных моделей ONNX.
+        onnx_threads : int
+            Количество потоков ONNX Runtime (0 - по умолчанию ONNX Runtime).
+        torch_chunk_stride : int
+            Перекрытие соседних фрагментов длинного текста в токенах (0 - без перекрытия); уменьшает шаг между
+            фрагментами, длина фрагмента не меняется.
+        micro_batching : bool
+            Объединять одиночные запросы к моделям в микробатчи.
+        micro_batch_max_size : int
+            Максимальный размер микробатча.
+        micro_batch_max_wait_ms : float
+            Максимальное время ожидания формирования микробатча в миллисекундах (ожидают только элементы,
+            за которыми в очередь уже ставятся другие; одиночный вызов обрабатывается без ожидания).
+        cache_enabled : bool
+            Кэшировать результаты анализа текстов в памяти.
+        cache_max_size : int
+            Максимальное количество записей в кэше каждого обработчика.
+        cache_ttl : float
+            Время жизни записи кэша в секундах.
+        cache_backend : str
+            Общий кэш за кэшем в памяти: 'memory' - только память процесса, 'sqlite' - файл SQLite на общем томе.
+        cache_path : str
+            Путь к файлу общего кэша.
+        cache_max_bytes : int
+            Максимальный размер значений каждого движка в общем кэше в байтах.
+        cache_version : str
+            Версия моделей, входит в ключ кэша; меняется при обновлении моделей, чтобы не отдавать старые результаты.
+        filter_index_cache_size : int
+            Количество скомпилированных списков фильтров, хранимых в памяти.
+        morph_cache_size : int
+            Количество словоформ в общем кэше лемм и известных слов морфологического словаря.
+        collection_dedup : bool
+            Анализировать копии сообщения в коллекции (с точностью до регистра и пробелов) один раз.
+        stream_window_size : int
+            Количество сообщений в окне потоковой обработки коллекции по умолчанию.
+        natasha_batch_size : int
+            Количество предложений (текстов для NER) в одном батче slovnet при пакетном анализе коллекции.
+        natasha_extractor_gate : bool
+            Пропускать извлечение дат и адресов yargy для текстов без ключевых слов их грамматик.
+        natasha_pool : bool
+            Выполнять анализ Natasha в пуле процессов, а не в процессе сервера.
+        natasha_pool_size : int
+            Количество процессов пула Natasha (0 - по количеству ядер).
+        natasha_pool_start_method : str
+            Способ запуска процессов пула: 'spawn', 'forkserver' или 'fork'.
+        concurrent_engines : bool
+            Запускать движки анализа (настроение, токсичность, Natasha) одного запроса параллельно.
+        engine_threads : int
+            Количество потоков общего пула для параллельного запуска движков.
+        """
+
+    torch_batch_size: int = 32
+    torch_threads: int = 4
+    inference_workers: int = 0
+    inference_queue_size: int = 32
+    overload_status_code: int = 503
+    overload_retry_after: int = 1
+    degrade_threshold: float = 0
+    preload: bool = True
+    mmap_dir: str = ''
+    torch_backend: str = 'torch'
+    onnx_model_dir: str = '/var/cache/norma/onnx'
+    onnx_threads: int = 0
+    torch_chunk_stride: int = 0
+    micro_batching: bool = True
+    micro_batch_max_size: int = 32
+    micro_batch_max_wait_ms: float = 5
+    cache_enabled: bool = True
+    cache_max_size: int = 10000
+    cache_ttl: float = 3600
+    cache_backend: str = 'memory'
+    cache_path: str = '/var/cache/norma/results.sqlite3'
+    cache_max_bytes: int = 512 * 1024 * 1024
+    cache_version: str = '1'
+    filter_index_cache_size: int = 256
+    morph_cache_size: int = 100000
+    collection_dedup: bool = True
+    stream_window_size: int = 64
+    natasha_batch_size: int = 64
+    natasha_extractor_gate: bool = True
+    natasha_pool: bool = False
+    natasha_pool_size: int = 0
+    natasha_pool_start_method: str = 'spawn'
+    concurrent_engines: bool = True
+    engine_threads: int = 16
+
+    class Config:
+        env_prefix = 'NORMA_'
+
+
+settings = Settings()
@@ -1,5 +1,12 @@
+import numpy as np
+
+from app.config import settings
+from app.tools import profiling
+from app.tools.cache import LRUCache, SQLiteCache, TieredCache, make_key
+from app.tools.loading import LazyModel
 from app.tools.nlp_dostoevsky.main import NlpToolDostoevsky
 from app.tools.nlp_natasha.main import NlpToolNatasha
+from app.tools.nlp_natasha.pool import NatashaPool
 from app.tools.nlp_torch.main import NlpToolTorch
 from app.tools.nlp_torch.models import ToxicContentModel, ToxicModel
 from app.tools.nlp_dostoevsky.models import MoodContentModel, MoodModel
@@ -10,9 +17,18 @@ class Handler:
     """
         Класс, предоставляющий методы для анализа данных, включая обработку строк и списков.
 
+        Attributes:
+            model_identity (str): Идентификатор модели, входит в ключ кэша.
+            cache (LRUCache | TieredCache | None): Кэш результатов анализа отдельных текстов.
+            columns (tuple): Названия столбцов массива результатов (поля модели вероятностей).
+
         Methods:
             get_analyze(data: str | list) -> Any:
                 Вызывает соответствующий метод в зависимости от типа данных (строка или список).
+                Результаты для уже проанализированных текстов берутся из кэша.
+
+            get_array(data: list) -> tuple[np.ndarray, np.ndarray]:
+                Возвращает результаты анализа списка текстов массивами NumPy, без моделей для каждого текста.
 
         Static Methods:
             _get_analyze_from_str(text: str) -> Any:
@@ -22,6 +38,46 @@ class Handler:
                 Внутренний статический метод для анализа данных типа list.
         """
 
+    model_identity: str = ''
+    cache: LRUCache | TieredCache | None = None
+    columns: tuple = ()
+
+    @staticmethod
+    def _create_cache(name: str, model) -> LRUCache | TieredCache | None:
+        """
+        Создает кэш результатов обработчика согласно настройкам.
+
+        Args:
+            name (str): Имя кэша.
+            model (type[BaseModel]): Модель результата, в которую восстанавливаются значения из общего кэша.
+
+        Returns:
+            LRUCache | TieredCache | None: Кэш или None, если кэширование отключено.
+        """
+
+        if not settings.cache_enabled:
+            return None
+        local = LRUCache(name, maxsize=settings.cache_max_size, ttl=settings.cache_ttl)
+        if settings.cache_backend == 'sqlite':
+            shared = SQLiteCache(name, settings.cache_path, model, max_bytes=settings.cache_max_bytes,
+                                 ttl=settings.cache_ttl)
+            return TieredCache(local, shared)
+        return local
+
+    @classmethod
+    def _cache_key(cls, text: str, **kwargs) -> str:
+        """
+        Формирует ключ кэша для текста.
+
+        Args:
+            text (str): Входной текст для анализа.
+
+        Returns:
+            str: Ключ кэша.
+        """
+
+        return make_key(text, cls.model_identity, settings.cache_version)
+
     @staticmethod
     def _get_analyze_from_str(text: str, **kwargs):
         """
@@ -64,15 +120,101 @@ class Handler:
             Any: Результат анализа данных.
         """
 
-        if isinstance(data, str):
-            return cls._get_analyze_from_str(data, **kwargs)
-        else:
+        if cls.cache is None:
+            if isinstance(data, str):
+                return cls._get_analyze_from_str(data, **kwargs)
             return cls._get_analyze_from_list(data, **kwargs)
 
+        if isinstance(data, str):
+            key = cls._cache_key(data, **kwargs)
+            with profiling.stage('cache'):
+                result = cls.cache.get(key)
+            profiling.add('cache_hits', int(result is not None))
+            if result is None:
+                result = cls._get_analyze_from_str(data, **kwargs)
+                cls.cache.set(key, result)
+            return result
+
+        with profiling.stage('cache'):
+            keys = [cls._cache_key(text, **kwargs) for text in data]
+            cached = cls.cache.get_many(keys)
+        profiling.add('cache_hits', len(cached))
+        results = [cached.get(key) for key in keys]
+        missed = [index for index, result in enumerate(results) if result is None]
+        if missed:
+            computed = {}
+            for index, result in zip(missed, cls._get_analyze_from_list([data[index] for index in missed], **kwargs)):
+                results[index] = result
+                computed[keys[index]] = result
+            cls.cache.set_many(computed)
+        return results
+
+
+    @staticmethod
+    def _get_array_from_list(data: list, **kwargs) -> tuple:
+        """
+        Внутренний статический метод для анализа списка текстов с результатом в виде массивов.
+
+        Args:
+            data (list): Входной список для анализа.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Вероятности (строка на текст, столбцы columns) и количество токенов.
+        """
+
+        pass
+
+    @staticmethod
+    def _result_to_row(result) -> tuple:
+        """
+        Переводит результат анализа текста из кэша в строку массива вероятностей и количество токенов.
+        """
+
+        pass
+
+    @classmethod
+    def get_array(cls, data: list, **kwargs) -> tuple:
+        """
+        Возвращает результаты анализа списка текстов в виде массивов NumPy без создания моделей для каждого текста.
+        Результаты уже проанализированных текстов берутся из кэша, остальные тексты анализируются одним вызовом
+        и в кэш не записываются.
+
+        Args:
+            data (list): Входной список для анализа.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Вероятности формы (len(data), len(columns)) и количество токенов
+            в каждом тексте (0, если модель не считает токены).
+        """
+
+        values = np.empty((len(data), len(cls.columns)), dtype=np.float64)
+        count_tokens = np.zeros(len(data), dtype=np.int64)
+        missed = list(range(len(data)))
+        if cls.cache is not None and data:
+            with profiling.stage('cache'):
+                keys = [cls._cache_key(text, **kwargs) for text in data]
+                cached = cls.cache.get_many(keys)
+            profiling.add('cache_hits', len(cached))
+            missed = []
+            for index, key in enumerate(keys):
+                result = cached.get(key)
+                if result is None:
+                    missed.append(index)
+                else:
+                    values[index], count_tokens[index] = cls._result_to_row(result)
+
+        if missed:
+            values[missed], count_tokens[missed] = cls._get_array_from_list([data[index] for index in missed],
+                                                                            **kwargs)
+        return values, count_tokens
+
 
 class MoodHandler(Handler):
 
     nlp_dostoevsky = NlpToolDostoevsky
+    model_identity = 'dostoevsky/fasttext-social-network-model'
+    cache = Handler._create_cache('mood', MoodModel)
+    columns = tuple(MoodContentModel.__fields__)
 
     @staticmethod
     def _get_analyze_from_str(text: str, **kwargs) -> MoodModel:
@@ -86,6 +228,16 @@ class MoodHandler(Handler):
             result.append(MoodModel(mood=MoodContentModel(**pr)))
         return result
 
+    @staticmethod
+    def _get_array_from_list(data: list, **kwargs) -> tuple:
+        proba = MoodHandler.nlp_dostoevsky.analyze_list(data)
+        values = np.array([[pr[column] for column in MoodHandler.columns] for pr in proba], dtype=np.float64)
+        return values, np.zeros(len(data), dtype=np.int64)
+
+    @staticmethod
+    def _result_to_row(result: MoodModel) -> tuple:
+        return [getattr(result.mood, column) for column in MoodHandler.columns], 0
+
 
 class ToxicHandler(Handler):
     """
@@ -94,10 +246,41 @@ class ToxicHandler(Handler):
         Атрибуты:
         ----------
         nlp_torch_toxic : NlpToolTorch
-            Экземпляр класса NlpToolTorch, инициализированный с использованием модели 'cointegrated/rubert-tiny-toxicity'.
+            Экземпляр класса NlpToolTorch, инициализированный с использованием модели 'cointegrated/rubert-tiny-toxicity'
+            (загружается при первом обращении).
+        """
+
+    model_name = 'cointegrated/rubert-tiny-toxicity'
+    nlp_torch_toxic = LazyModel('toxicity.model', lambda: NlpToolTorch(ToxicHandler.model_name))
+    model_identity = f'{model_name}:{settings.torch_backend}'
+    cache = Handler._create_cache('toxicity', ToxicModel)
+    columns = tuple(ToxicContentModel.__fields__)
+
+    @staticmethod
+    def _reduce_chunks(proba: np.ndarray) -> np.ndarray:
+        """
+        Сводит вероятности фрагментов длинного текста к вероятностям всего текста: для оскорбления и опасности
+        берется максимум по фрагментам, угроза и непристойность усредняются последовательно (вес фрагмента
+        уменьшается вдвое с каждым следующим), нетоксичность - дополнение максимума оскорбления.
+
+        Параметры:
+        ----------
+        proba : np.ndarray
+            Вероятности фрагментов формы (количество фрагментов, 5).
+
+        Возвращает:
+        ----------
+        np.ndarray
+            Вероятности текста (5 значений в порядке полей ToxicContentModel).
         """
 
-    nlp_torch_toxic = NlpToolTorch('cointegrated/rubert-tiny-toxicity')
+        weights = 0.5 ** (len(proba) - np.arange(len(proba)))
+        weights[0] = 0.5 ** (len(proba) - 1)
+        result = weights @ proba
+        result[1] = proba[:, 1].max()
+        result[4] = proba[:, 4].max()
+        result[0] = 1 - result[1]
+        return result
 
     @staticmethod
     def _data_averaging(data: list, toxicity_count_tokens: int):
@@ -117,24 +300,8 @@ class ToxicHandler(Handler):
             Итоговая модель токсичности.
         """
 
-        result_toxic_model = None
-        for item in data:
-            res = item.tolist()
-            if not result_toxic_model:
-                result_toxic_model = ToxicModel(toxicity=ToxicContentModel.from_list(res),
-                                                toxicity_count_tokens=toxicity_count_tokens)
-            toxic_model = ToxicModel(toxicity=ToxicContentModel.from_list(res),
-                                     toxicity_count_tokens=toxicity_count_tokens)
-            if toxic_model.toxicity.insult > result_toxic_model.toxicity.insult:
-                result_toxic_model.toxicity.insult = toxic_model.toxicity.insult
-            if toxic_model.toxicity.dangerous > result_toxic_model.toxicity.dangerous:
-                result_toxic_model.toxicity.dangerous = toxic_model.toxicity.dangerous
-
-            result_toxic_model.toxicity.obscenity = (result_toxic_model.toxicity.obscenity
-                                                     + toxic_model.toxicity.obscenity) / 2
-            result_toxic_model.toxicity.threat = (result_toxic_model.toxicity.threat + toxic_model.toxicity.threat) / 2
-        result_toxic_model.toxicity.non_toxic = 1 - result_toxic_model.toxicity.insult
-        return result_toxic_model
+        res = ToxicHandler._reduce_chunks(np.stack(data)).tolist()
+        return ToxicModel(toxicity=ToxicContentModel.from_list(res), toxicity_count_tokens=toxicity_count_tokens)
 
     @staticmethod
     def _get_analyze_from_str(text: str, **kwargs) -> ToxicModel:
@@ -148,8 +315,8 @@ class ToxicHandler(Handler):
     @staticmethod
     def _get_analyze_from_list(data: list, **kwargs) -> list[ToxicModel]:
         result: list = []
-        proba, toxicity_count_tokens = ToxicHandler.nlp_torch_toxic.predict_probabilities(data)
-        for pr in proba:
+        proba, count_tokens = ToxicHandler.nlp_torch_toxic.predict_probabilities(data)
+        for pr, toxicity_count_tokens in zip(proba, count_tokens):
             if isinstance(pr, list):
                 result.append(ToxicHandler._data_averaging(pr, toxicity_count_tokens))
             else:
@@ -159,17 +326,52 @@ class ToxicHandler(Handler):
         return result
 
 
-class NatashaHandler(Handler):
+    @staticmethod
+    def _get_array_from_list(data: list, **kwargs) -> tuple:
+        proba, count_tokens = ToxicHandler.nlp_torch_toxic.predict_probabilities(data)
+        values = np.stack([ToxicHandler._reduce_chunks(np.stack(pr)) if isinstance(pr, list) else pr
+                           for pr in proba]).astype(np.float64)
+        return values, np.asarray(count_tokens, dtype=np.int64)
 
     @staticmethod
-    def _get_analyze_from_str(text: str, filters=None) -> NatashaModel:
-        nlp_natasha = NlpToolNatasha(text)
-        if filters is None:
-            filters = []
+    def _result_to_row(result: ToxicModel) -> tuple:
+        return [getattr(result.toxicity, column) for column in ToxicHandler.columns], result.toxicity_count_tokens
+
+
+class NatashaHandler(Handler):
+    """
+        Класс для извлечения артефактов, фильтрации по словам и проверки осмысленности текста с помощью Natasha.
+
+        Атрибуты:
+        ----------
+        analyses : tuple
+            Виды анализа, выполняемые обработчиком: 'artifacts', 'filters', 'meaningful'.
+        pool : NatashaPool | None
+            Пул процессов для анализа (None - анализ выполняется в процессе сервера).
+        """
 
-        return NatashaModel(artifacts=nlp_natasha.artifacts(), filters=nlp_natasha.word_filters(filters),
-                            **nlp_natasha.meaningful_text().dict())
+    analyses = NlpToolNatasha.ANALYSES
+    model_identity = 'natasha/news'
+    cache = Handler._create_cache('natasha', NatashaModel)
+    pool = NatashaPool(settings.natasha_pool_size or None, settings.natasha_pool_start_method) \
+        if settings.natasha_pool else None
+
+    @classmethod
+    def _cache_key(cls, text: str, filters=None, analyses=None, **kwargs) -> str:
+        filters = sorted({str(word) for word in filters or []})
+        analyses = sorted(set(analyses or cls.analyses))
+        return make_key(text, cls.model_identity, settings.cache_version, ','.join(analyses), *filters)
 
     @staticmethod
-    def _get_analyze_from_list(data: list, **kwargs):
-        raise ValueError("Не вызывается для списка")
+    def _get_analyze_from_str(text: str, filters=None, analyses=None) -> NatashaModel:
+        if NatashaHandler.pool is not None:
+            return NatashaHandler.pool.analyze(text, filters, analyses)
+        return NlpToolNatasha(text).analyze(filters, analyses)
+
+    @staticmethod
+    def _get_analyze_from_list(data: list, filters=None, analyses=None) -> list[NatashaModel]:
+        if not data:
+            return []
+        if NatashaHandler.pool is not None:
+            return NatashaHandler.pool.analyze_many(data, filters, analyses)
+        return NlpToolNatasha.analyze_many(data, filters, analyses)
@@ -1,27 +1,120 @@
+from fastapi import Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
 from app import create_app
+from app.config import settings
 
-from app.models import InputItemModel, InputItemsModel, OutputItemModel, OutputItemsModel, OutputAverageModel
-from app.text_analysis import process_with_list, process_with_string
+from app.models import InputItemModel, InputItemsModel, InputSummaryModel, OutputItemModel, OutputItemsModel, \
+    OutputAverageModel, CollectionAnalysis
+from app.streaming import DuplexStreamingResponse, stream_collection
+from app.handlers import NatashaHandler
+from app.text_analysis import admission, process_with_list, process_with_string, process_summary
+from app.tools.admission import Overloaded
+from app.tools.batching import MicroBatchScheduler
+from app.tools.cache import LRUCache
+from app.tools.loading import LazyModel
+from app.tools.memory import process_tree_memory
+from app.tools.metrics import COLLECTION_SIZE, render
+from app.warmup import readiness
 
 
 app = create_app()
 
 
+@app.on_event('shutdown')
+def stop_pools():
+    if NatashaHandler.pool is not None:
+        NatashaHandler.pool.shutdown()
+
+
+@app.exception_handler(Overloaded)
+def overloaded_response(request: Request, error: Overloaded):
+    return JSONResponse({'detail': str(error)}, status_code=settings.overload_status_code,
+                        headers={'Retry-After': str(error.retry_after)})
+
+
+def sections_response(result: OutputItemModel | OutputItemsModel | OutputAverageModel) -> JSONResponse:
+    """
+    Формирует ответ только с разделами запрошенных видов анализа.
+    """
+
+    return JSONResponse(jsonable_encoder(result, exclude=result.unrequested_sections()))
+
+
+def process_response(process, **kwargs) -> JSONResponse:
+    """
+    Выполняет обработку и формирует ответ в пуле выполнения запросов, чтобы сериализация больших коллекций
+    не блокировала цикл событий.
+    """
+
+    return sections_response(process(**kwargs))
+
+
 @app.post("/", response_model=OutputItemModel, description="Получение результата для одного поста")
-def get_item(data: InputItemModel):
-    result: OutputItemModel = process_with_string(text=data.message, filters=data.filters)
-    return result
+async def get_item(data: InputItemModel):
+    return await admission.run('/', process_response, process_with_string, text=data.message, filters=data.filters,
+                               analyses=data.analyses, profile=data.profile)
 
 
 @app.post("/collection", response_model=OutputItemsModel, description="Получение результата для коллекции постов")
-def get_collection(data: InputItemsModel):
-    result: OutputItemsModel = process_with_list(data=data.messages)
-    return result
+async def get_collection(data: InputItemsModel):
+    COLLECTION_SIZE.labels('/collection').observe(len(data.messages))
+    return await admission.run('/collection', process_response, process_with_list, data=data.messages,
+                               analyses=data.analyses, filters=data.filters, profile=data.profile)
+
+
+@app.post("/collection/stream", description="Потоковая обработка коллекции постов: сообщения в теле запроса в формате "
+                                         "NDJSON (строка JSON или объект с полем message), результаты - NDJSON "
+                                         "по мере обработки окон по window сообщений")
+async def get_collection_stream(request: Request, analyses: list[CollectionAnalysis] | None = Query(None),
+                                filters: list[str] | None = Query(None),
+                                window: int = Query(settings.stream_window_size, ge=1, le=1024)):
+    return DuplexStreamingResponse(stream_collection(request.stream(), analyses=analyses, filters=filters,
+                                                     window_size=window),
+                                   media_type='application/x-ndjson')
 
 
 @app.post("/summary", response_model=OutputAverageModel, description="Получение усредненного результата для коллекции постов")
-def get_summary(data: InputItemsModel):
-    result: OutputItemsModel = process_with_list(data=data.messages)
-    mood = [item_result.mood for item_result in result.results]
-    toxicity = [item_result.toxicity for item_result in result.results]
-    return OutputAverageModel.calculate_average(mood=mood, toxicity=toxicity, execution=result.execution)
+async def get_summary(data: InputSummaryModel):
+    COLLECTION_SIZE.labels('/summary').observe(len(data.messages))
+    return await admission.run('/summary', process_response, process_summary, data=data.messages,
+                               analyses=data.analyses, percentiles=data.percentiles, profile=data.profile)
+
+
+@app.get("/ready", description="Готовность воркера: 200, когда модели загружены и прогреты, иначе 503")
+def get_ready():
+    return JSONResponse(readiness.status(), status_code=200 if readiness.ready else 503)
+
+
+@app.get("/stats/loading", description="Время загрузки моделей")
+def get_loading_stats():
+    return {name: {'loaded': model.loaded, 'load_time_ms': model.load_time}
+            for name, model in LazyModel.registry.items()}
+
+
+@app.get("/stats/memory", description="Использование памяти (RSS, PSS) процессами сервера")
+def get_memory_stats():
+    return process_tree_memory()
+
+
+@app.get("/stats/batching", description="Гистограммы размеров микробатчей и времени ожидания в очереди")
+def get_batching_stats():
+    return {name: scheduler.stats() for name, scheduler in MicroBatchScheduler.registry.items()}
+
+
+@app.get("/stats/admission", description="Загрузка пула выполнения запросов и очереди")
+def get_admission_stats():
+    return admission.stats()
+
+
+@app.get("/stats/cache", description="Статистика кэшей результатов анализа")
+def get_cache_stats():
+    return {name: cache.stats() for name, cache in LRUCache.registry.items()}
+
+
+@app.get("/metrics", description="Метрики в формате Prometheus: задержки запросов, движков и этапов Natasha, "
+                                 "количество токенов и фрагментов, размеры коллекций, кэши, микробатчи")
+def get_metrics():
+    body, content_type = render()
+    return Response(body, headers={'Content-Type': content_type})
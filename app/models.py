@@ -1,19 +1,33 @@
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, validator
 from app.tools.nlp_natasha.models import NatashaModel
 from app.tools.nlp_torch.models import ToxicModel, ToxicContentModel
 from app.tools.nlp_dostoevsky.models import MoodModel, MoodContentModel
-from app.utils import calculate_average
+
+
+Analysis = Literal['mood', 'toxicity', 'artifacts', 'filters', 'meaningful']
+CollectionAnalysis = Analysis
+SummaryAnalysis = Literal['mood', 'toxicity']
+
+# Поля ответа, которые заполняются только для запрошенных видов анализа
+SECTION_FIELDS = ('mood', 'toxicity', 'toxicity_count_tokens', 'mood_aggregates', 'toxicity_aggregates',
+                  'artifacts', 'filters', 'meaningful', 'natasha_model_count_tokens', 'profile', 'degraded',
+                  'dedup_ratio')
 
 
 class InputItemModel(BaseModel):
     message: str
     filters: list = []
+    analyses: list[Analysis] | None = None
+    profile: bool = False
 
     class Config:
         schema_extra = {
             'example': {
                 'message': 'Это пример для анализа текста',
-                'filters': ['фильтр 1', 'Фильтр 2']
+                'filters': ['фильтр 1', 'Фильтр 2'],
+                'analyses': ['mood', 'toxicity', 'artifacts', 'filters', 'meaningful']
             }
         }
 
@@ -21,38 +35,109 @@ class InputItemModel(BaseModel):
 class InputItemsModel(BaseModel):
     messages: list
     filters: list = []
+    analyses: list[CollectionAnalysis] | None = None
+    profile: bool = False
 
     class Config:
         schema_extra = {
             'example': {
                 'messages': ['Это пример для анализа текста 1', 'Это пример для анализа текста 2'],
-                'filters': ['фильтр 1', 'Фильтр 2']
+                'filters': ['фильтр 1', 'Фильтр 2'],
+                'analyses': ['mood', 'toxicity']
+            }
+        }
+
+
+class InputSummaryModel(InputItemsModel):
+    analyses: list[SummaryAnalysis] | None = None
+    percentiles: list[float] = [50, 90, 95]
+
+    @validator('percentiles', each_item=True)
+    def check_percentile(cls, v):
+        if not 0 <= v <= 100:
+            raise ValueError("Перцентиль должен быть в диапазоне от 0 до 100")
+        return v
+
+    class Config:
+        schema_extra = {
+            'example': {
+                'messages': ['Это пример для анализа текста 1', 'Это пример для анализа текста 2'],
+                'analyses': ['mood', 'toxicity'],
+                'percentiles': [50, 90, 95]
             }
         }
 
 
 class BaseOutputModel(ToxicModel, MoodModel):
+    mood: MoodContentModel | None = None
+    toxicity: ToxicContentModel | None = None
+    toxicity_count_tokens: int | None = None
+
+    def unrequested_sections(self) -> set:
+        """
+        Возвращает поля ответа, относящиеся к не запрошенным видам анализа.
+        """
+
+        return {name for name in SECTION_FIELDS if name in self.__fields__ and getattr(self, name) is None}
+
+
+class ResultItemModel(BaseOutputModel, NatashaModel):
     pass
 
 
-class OutputItemModel(BaseOutputModel, NatashaModel):
+class OutputItemModel(ResultItemModel):
     execution: str | None
+    timings: dict[str, float] = {}
+    profile: dict | None = None
+    degraded: bool | None = None
 
 
 class OutputItemsModel(BaseModel):
-    results: list[BaseOutputModel]
+    results: list[ResultItemModel]
     execution: str | None
+    timings: dict[str, float] = {}
+    profile: dict | None = None
+    degraded: bool | None = None
+    dedup_ratio: float | None = None
+
+    def unrequested_sections(self) -> dict:
+        """
+        Возвращает поля результатов, относящиеся к не запрошенным видам анализа (одинаковы для всей коллекции),
+        а также незаполненные поля дерева времени, упрощенного режима и доли копий.
+        """
+
+        sections = {name: ... for name in ('profile', 'degraded', 'dedup_ratio') if getattr(self, name) is None}
+        if self.results:
+            sections['results'] = {'__all__': self.results[0].unrequested_sections()}
+        return sections
 
 
 class OutputAverageModel(BaseOutputModel):
+    mood_aggregates: dict[str, MoodContentModel] | None = None
+    toxicity_aggregates: dict[str, ToxicContentModel] | None = None
     execution: str | None
+    timings: dict[str, float] = {}
+    profile: dict | None = None
+    degraded: bool | None = None
+    dedup_ratio: float | None = None
 
     @classmethod
-    def calculate_average(cls, mood: list[MoodContentModel],
-                          toxicity: list[ToxicContentModel],
-                          execution: str | None = None):
-        calculate_moods = calculate_average(models=mood)
-        calculate_toxics = calculate_average(models=toxicity)
-        return cls(mood=MoodContentModel(**calculate_moods),
-                   toxicity=ToxicContentModel(**calculate_toxics),
-                   execution=execution)
+    def from_aggregates(cls, mood: dict | None = None, toxicity: dict | None = None,
+                        toxicity_count_tokens: int | None = None, **fields):
+        """
+        Создает усредненный результат из агрегатов (см. app.utils.aggregate): среднее попадает в mood и toxicity,
+        остальные агрегаты - в mood_aggregates и toxicity_aggregates. Остальные поля (timings, profile, degraded,
+        dedup_ratio) передаются как есть.
+        """
+
+        result = {}
+        if mood:
+            mood = {name: MoodContentModel(**dict(zip(MoodContentModel.__fields__, row))) for name, row in mood.items()}
+            result['mood'] = mood.pop('mean')
+            result['mood_aggregates'] = mood
+        if toxicity:
+            toxicity = {name: ToxicContentModel.from_list(row) for name, row in toxicity.items()}
+            result['toxicity'] = toxicity.pop('mean')
+            result['toxicity_aggregates'] = toxicity
+            result['toxicity_count_tokens'] = toxicity_count_tokens
+        return cls(**result, **fields)
@@ -0,0 +1,144 @@
+"""
+Запуск сервера в режиме pre-fork: родительский процесс один раз загружает модели, замораживает объекты
+для сборщика мусора (gc.freeze) и создает воркеры через fork. Воркеры разделяют страницы памяти моделей
+с родителем (copy-on-write) и принимают соединения на общем сокете. Упавший воркер перезапускается.
+
+Самые большие массивы эмбеддингов Navec отображаются в память из файлов в каталоге --mmap-dir
+(по умолчанию NORMA_MMAP_DIR или /var/cache/norma/mmap). Каталог передается и через окружение, поэтому
+массивы разделяют также процессы пула Natasha, которые воркеры запускают через spawn.
+
+С NORMA_NATASHA_POOL=true каждый воркер поднимает собственный пул Natasha (общий пул для воркеров после fork
+невозможен). Если размер пула не задан, ядра делятся между пулами воркеров, иначе процессов пула было бы
+workers × NORMA_NATASHA_POOL_SIZE.
+
+Использование памяти воркерами (RSS и PSS) пишется в лог и доступно по GET /stats/memory.
+
+Запуск:
+    python -m app.serve --workers 4 --port 8668
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+from prometheus_client import multiprocess
+
+from app.config import settings
+from app.tools import memory
+
+logger = logging.getLogger('app.serve')
+
+
+def _run_worker(sock: socket.socket, port: int):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    from app.main import app
+
+    config = uvicorn.Config(app, port=port, lifespan='on', log_level='info')
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(sock: socket.socket, port: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(sock, port)
+        except BaseException:
+            logger.exception('Воркер %s завершился с ошибкой', os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+    logger.info('Запущен воркер %s', pid)
+    return pid
+
+
+def _report_memory():
+    usage = memory.process_tree_memory()
+    for pid, process in usage['processes'].items():
+        logger.info('Память процесса %s: RSS %.1f МБ, PSS %.1f МБ', pid, process.get('rss', 0), process.get('pss', 0))
+    logger.info('Память всего: RSS %.1f МБ, PSS %.1f МБ', usage['total_rss'], usage['total_pss'])
+
+
+def configure(workers: int, mmap_dir: str):
+    """
+    Настраивает процессы сервера до импорта приложения. Каталог отображаемых массивов записывается и в окружение:
+    процессы пула Natasha запускаются через spawn и заново читают настройки из окружения, а не наследуют их.
+    Если пул Natasha включен без явного размера, каждому воркеру достается пул из cpu_count // workers процессов.
+    """
+
+    os.environ['NORMA_MMAP_DIR'] = mmap_dir
+    settings.mmap_dir = mmap_dir
+    if settings.natasha_pool and not settings.natasha_pool_size:
+        settings.natasha_pool_size = max(1, (os.cpu_count() or 1) // workers)
+
+
+def serve(host: str, port: int, workers: int, memory_interval: float, mmap_dir: str = ''):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    configure(workers, mmap_dir)
+
+    start_time = time.perf_counter()
+    from app.main import app  # noqa: F401 - импорт создает обработчики и кэши до fork
+    from app.warmup import preload_models
+    preload_models()
+    logger.info('Модели загружены в родительском процессе за %.0f мс', (time.perf_counter() - start_time) * 1000)
+
+    # Объекты, созданные при загрузке, исключаются из обхода сборщиком мусора, чтобы он не изменял их страницы
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    memory.supervisor_pid = os.getpid()
+    children = {_spawn(sock, port) for _ in range(workers)}
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for child in children:
+            try:
+                os.kill(child, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    next_report = time.monotonic() + min(memory_interval, 60) if memory_interval else None
+    while children:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid:
+            children.discard(pid)
+            if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+                multiprocess.mark_process_dead(pid)
+            if not stopping:
+                logger.warning('Воркер %s завершился (статус %s), перезапуск', pid, status)
+                children.add(_spawn(sock, port))
+            continue
+        if next_report is not None and time.monotonic() >= next_report:
+            _report_memory()
+            next_report = time.monotonic() + memory_interval
+        time.sleep(0.5)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8668)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--memory-interval', type=float, default=300,
+                        help='Период записи использования памяти в лог, с (0 - не записывать)')
+    parser.add_argument('--mmap-dir', default=settings.mmap_dir or '/var/cache/norma/mmap',
+                        help="Каталог файлов массивов эмбеддингов, отображаемых в память ('' - не отображать)")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.memory_interval, args.mmap_dir)
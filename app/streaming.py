@@ -0,0 +1,112 @@
+import json
+from typing import AsyncIterator
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import StreamingResponse
+
+from app.text_analysis import admission, process_with_list
+from app.tools.metrics import COLLECTION_SIZE
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+        Потоковый ответ, который не читает входящие сообщения ASGI в фоне, в отличие от StreamingResponse.
+        Это позволяет читать тело запроса одновременно с отправкой ответа. Отключение клиента обнаруживается
+        при чтении тела запроса (ClientDisconnect) или при отправке ответа.
+        """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+        Разбивает поток байтов тела запроса на непустые строки.
+
+        Args:
+            chunks (AsyncIterator[bytes]): Фрагменты тела запроса.
+
+        Returns:
+            AsyncIterator[bytes]: Строки без символа перевода строки. Декодируются при разборе каждой строки,
+                чтобы строка не в UTF-8 давала ошибку только для себя, а не обрывала поток.
+        """
+
+    buffer = b''
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+def parse_message(line: bytes) -> str:
+    """
+        Разбирает строку NDJSON в кодировке UTF-8: строку JSON с текстом сообщения или объект с полем message.
+
+        Raises:
+            ValueError: Если строка не в UTF-8 (UnicodeDecodeError) или не содержит сообщения.
+        """
+
+    value = json.loads(line.decode('utf-8'))
+    if isinstance(value, dict):
+        value = value.get('message')
+    if not isinstance(value, str):
+        raise ValueError("Ожидается строка или объект с полем 'message'")
+    return value
+
+
+def _dump(value: dict) -> bytes:
+    return (json.dumps(value, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+async def stream_collection(chunks: AsyncIterator[bytes], analyses: list | None = None, filters: list | None = None,
+                            window_size: int = 64) -> AsyncIterator[bytes]:
+    """
+        Анализирует поток сообщений в формате NDJSON окнами по window_size сообщений и возвращает результаты
+        в формате NDJSON по мере готовности каждого окна. В памяти одновременно находится только одно окно.
+
+        Каждая строка результата содержит index - номер строки сообщения во входном потоке (с нуля).
+        Для строк, которые не удалось разобрать, возвращается строка с index и error.
+
+        Args:
+            chunks (AsyncIterator[bytes]): Фрагменты тела запроса.
+            analyses (list | None): Виды анализа для каждого сообщения.
+            filters (list | None): Фильтры для анализа filters.
+            window_size (int): Количество сообщений в окне.
+
+        Returns:
+            AsyncIterator[bytes]: Строки результатов в формате NDJSON.
+        """
+
+    window = []
+    index = -1
+    async for line in iter_lines(chunks):
+        index += 1
+        try:
+            window.append((index, parse_message(line)))
+        except ValueError as error:
+            yield _dump({'index': index, 'error': str(error)})
+            continue
+        if len(window) >= window_size:
+            for result in await _process_window(window, analyses, filters):
+                yield result
+            window = []
+    if window:
+        for result in await _process_window(window, analyses, filters):
+            yield result
+    COLLECTION_SIZE.labels('/collection/stream').observe(index + 1)
+
+
+async def _process_window(window: list, analyses: list | None, filters: list | None) -> list:
+    # Начатый поток не прерывается при заполненной очереди: окно ждет места, а чтение тела запроса приостанавливается
+    result = await admission.run('/collection/stream', process_with_list, data=[message for _, message in window],
+                                 analyses=analyses, filters=filters, wait=True)
+    exclude = result.unrequested_sections().get('results', {}).get('__all__', set())
+    extra = {'degraded': True} if result.degraded else {}
+    return [_dump({'index': index, **jsonable_encoder(item, exclude=exclude), **extra})
+            for (index, _), item in zip(window, result.results)]
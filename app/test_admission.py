@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main
+from app.tools.admission import AdmissionController, Overloaded
+from app.tools.batching import MicroBatchScheduler
+
+client = TestClient(app.main.app)
+
+
+def test_rejects_when_queue_is_full_and_releases_after_work():
+    controller = AdmissionController(workers=1, queue_size=1)
+    started, finish = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        finish.wait(5)
+        return 'готово'
+
+    async def scenario():
+        running = asyncio.ensure_future(controller.run('test', work))
+        queued = asyncio.ensure_future(controller.run('test', lambda: 'в очереди'))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        with pytest.raises(Overloaded):
+            await controller.run('test', work)
+        finish.set()
+        return await running, await queued
+
+    assert asyncio.run(scenario()) == ('готово', 'в очереди')
+    assert controller.admitted == 0
+
+
+def test_waiting_run_gets_slot_when_released():
+    controller = AdmissionController(workers=1, queue_size=0)
+    finish = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(controller.run('test', finish.wait, 5))
+        await asyncio.sleep(0.05)
+        waiting = asyncio.ensure_future(controller.run('test', lambda: 'дождался', wait=True))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        finish.set()
+        return await running, await waiting
+
+    assert asyncio.run(scenario()) == (True, 'дождался')
+
+
+def test_overloaded_response_has_retry_after(monkeypatch):
+    controller = AdmissionController(workers=1, queue_size=0, retry_after=3)
+    controller.admitted = 1
+    monkeypatch.setattr(app.main, 'admission', controller)
+
+    response = client.post('/', json={'message': 'Это пример для анализа текста'})
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == '3'
+
+
+def test_degraded_mode_serves_mood_only(monkeypatch):
+    controller = AdmissionController(workers=1, queue_size=3, degrade_threshold=0.25)
+    controller.admitted = 1
+    monkeypatch.setattr(app.main, 'admission', controller)
+
+    response = client.post('/', json={'message': 'Это пример для анализа текста', 'filters': ['пример']})
+    assert response.status_code == 200
+    result = response.json()
+    assert result['degraded'] is True
+    assert 'mood' in result
+    assert not {'toxicity', 'artifacts', 'filters'} & set(result)
+
+    response = client.post('/summary', json={'messages': ['Это пример для анализа текста']})
+    assert response.json()['degraded'] is True and 'toxicity' not in response.json()
+
+
+def test_single_request_does_not_wait_for_micro_batch(monkeypatch):
+    client.post('/', json={'message': 'Прогрев моделей'})
+    assert MicroBatchScheduler.registry
+    for scheduler in MicroBatchScheduler.registry.values():
+        monkeypatch.setattr(scheduler, 'max_wait_ms', 2000)
+
+    start = time.perf_counter()
+    response = client.post('/', json={'message': f'Отличный сервис {time.time_ns()}', 'profile': True})
+    assert time.perf_counter() - start < 2
+
+    stages = response.json()['profile']['stages']
+    batches = [stages[name]['stages']['micro_batch'] for name in ('mood', 'toxicity')]
+    assert all(batch['batch_size'] == 1 and batch['wait_ms'] < 100 for batch in batches)
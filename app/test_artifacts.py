@@ -0,0 +1,42 @@
+import re
+import string
+from types import SimpleNamespace
+
+from app.tools.nlp_natasha.artifacts import ArtifactScanner
+from app.utils import remove_emojis_and_punctuation
+
+TEXTS = [
+    'Пишите на info@example.ru или звоните +7 (912) 345-67-89.',
+    'Полный текст: https://example.ru/news/2023/05/article?id=123&ref=vk, копия http://Example.COM/a_(b)%20c',
+    'Видео https://youtu.be/dQw4w9WgXcQ 🔥🔥, телефон 8 800 555-35-35 и ٨٠٠ ٥٥٥ ٣٥٣٥',
+    'Эта усталость уже измотала 🙂!!! [x] \\ ok.', 'wef3egf34g', '', '🙂🙂🙂',
+]
+
+# Прежние выражения, которые применялись к тексту по отдельности
+REFERENCE = {
+    'PHONES': r'\+?\d{1,3}[\s\d\-()]+\d{2,3}[\s\d\-()]+\d{2,3}',
+    'EMAILS': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+    'LINKS': r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+',
+}
+
+
+def test_scan_matches_separate_patterns():
+    for text in TEXTS:
+        assert ArtifactScanner.scan(text) == {name: re.findall(pattern, text) for name, pattern in REFERENCE.items()}
+
+    # Цифры внутри ссылки не считаются телефоном
+    assert ArtifactScanner.scan('https://example.ru/id/912-345-67-89') == \
+           {'LINKS': ['https://example.ru/id/912-345-67-89'], 'EMAILS': [], 'PHONES': []}
+
+
+def test_group_spans():
+    spans = [SimpleNamespace(type='PER', normal='Иван Петров'), SimpleNamespace(type='LOC', normal='Москва'),
+             SimpleNamespace(type='PER', normal='Иван Петров'), SimpleNamespace(type=None, normal='-')]
+    assert ArtifactScanner.group_spans(spans) == {'PER': {'Иван Петров'}, 'LOC': {'Москва'}}
+
+
+def test_remove_emojis_and_punctuation():
+    emoji = re.compile('[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U00002702-\U000027B0\U000024C2-\U0001F251]+')
+    for text in TEXTS:
+        expected = emoji.sub('', text).translate(str.maketrans('', '', string.punctuation))
+        assert remove_emojis_and_punctuation(text) == expected
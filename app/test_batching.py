@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+from app.tools.batching import MicroBatchScheduler
+
+
+def test_concurrent_items_share_batch():
+    batches = []
+
+    def process(items):
+        batches.append(list(items))
+        time.sleep(0.05)
+        return [item * 2 for item in items]
+
+    scheduler = MicroBatchScheduler('test-share', process, max_batch_size=8, max_wait_ms=50)
+    results = {}
+
+    def worker(value):
+        results[value] = scheduler(value)
+
+    threads = [threading.Thread(target=worker, args=(value,)) for value in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {value: value * 2 for value in range(8)}
+    assert len(batches) < 8
+    assert scheduler.stats()['batch_size']['count'] == len(batches)
+
+
+def test_single_caller_does_not_wait():
+    scheduler = MicroBatchScheduler('test-single', lambda items: items, max_batch_size=64, max_wait_ms=1000)
+    start = time.perf_counter()
+    for _ in range(3):
+        assert scheduler('текст') == 'текст'
+    assert time.perf_counter() - start < 0.5
+    assert scheduler.stats()['batch_size']['count'] == 3
+
+
+def test_flushes_on_deadline():
+    scheduler = MicroBatchScheduler('test-deadline', lambda items: items, max_batch_size=64, max_wait_ms=5)
+    start = time.perf_counter()
+    assert scheduler('текст') == 'текст'
+    assert time.perf_counter() - start < 1
+
+
+def test_error_propagates_to_callers():
+    def process(items):
+        raise ValueError('ошибка модели')
+
+    scheduler = MicroBatchScheduler('test-error', process, max_batch_size=4, max_wait_ms=1)
+    with pytest.raises(ValueError):
+        scheduler('текст')
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from app import bulk
+
+MESSAGES = ['Отличный сервис, спасибо!', 'Ужасно, верните деньги', 'Встреча 12 марта в Москве', 'wef3egf34g',
+            'ОТЛИЧНЫЙ СЕРВИС, спасибо!']
+
+
+def write_jsonl(path):
+    lines = [json.dumps({'id': index, 'message': message}, ensure_ascii=False)
+             for index, message in enumerate(MESSAGES)]
+    lines[3:3] = ['{"broken', '', json.dumps('Просто строка')]
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+def read_lines(path):
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+
+def run(tmp_path, source, **kwargs):
+    options = dict(file_format='jsonl', analyses=['mood', 'toxicity'], filters=[], text_field='message',
+                   id_field='id', workers=0, batch_size=2, checkpoint_path=str(tmp_path / 'out.checkpoint'))
+    options.update(kwargs)
+    return bulk.run(str(source), str(tmp_path / 'out.jsonl'), **options)
+
+
+def test_jsonl_and_csv(tmp_path):
+    source = tmp_path / 'in.jsonl'
+    write_jsonl(source)
+    checkpoint = run(tmp_path, source)
+    assert checkpoint.completed and checkpoint.done == len(MESSAGES) + 2
+
+    lines = read_lines(tmp_path / 'out.jsonl')
+    assert [line['index'] for line in lines] == list(range(len(MESSAGES) + 2))
+    assert lines[3]['error'].startswith('Некорректный JSON') and lines[4]['id'] is None
+    assert [line['id'] for line in lines if 'error' not in line] == [0, 1, 2, None, 3, 4]
+    assert all(set(line) == {'index', 'id', 'mood', 'toxicity', 'toxicity_count_tokens'}
+               for line in lines if 'error' not in line)
+    assert lines[0]['mood'] == lines[-1]['mood']
+
+    csv_source = tmp_path / 'in.csv'
+    csv_source.write_text('post,text\n7,"Встреча, 12 марта"\n8,"Много\nстрок"\n', encoding='utf-8')
+    run(tmp_path, csv_source, file_format='csv', text_field='text', id_field='post', analyses=['filters'],
+        filters=['встреча'], restart=True)
+    lines = read_lines(tmp_path / 'out.jsonl')
+    assert [(line['id'], line['filters']['passed']) for line in lines] == [('7', False), ('8', True)]
+
+
+def test_resume_after_crash(tmp_path, monkeypatch):
+    source = tmp_path / 'in.jsonl'
+    write_jsonl(source)
+    run(tmp_path, source, checkpoint_path=str(tmp_path / 'clean.checkpoint'))
+    expected = (tmp_path / 'out.jsonl').read_text(encoding='utf-8')
+
+    analyze_batch = bulk.analyze_batch
+    calls = []
+
+    def crashing(messages, analyses, filters):
+        calls.append(messages)
+        if len(calls) == 3:
+            raise RuntimeError('сбой воркера')
+        return analyze_batch(messages, analyses, filters)
+
+    monkeypatch.setattr(bulk, 'analyze_batch', crashing)
+    with pytest.raises(RuntimeError):
+        run(tmp_path, source, restart=True)
+    monkeypatch.setattr(bulk, 'analyze_batch', analyze_batch)
+
+    # Недописанная строка после контрольной точки отбрасывается при продолжении
+    with open(tmp_path / 'out.jsonl', 'a', encoding='utf-8') as output:
+        output.write('{"index": 4, "mo')
+    with pytest.raises(ValueError):
+        run(tmp_path, source, analyses=['mood'])
+
+    checkpoint = run(tmp_path, source)
+    assert checkpoint.completed
+    assert (tmp_path / 'out.jsonl').read_text(encoding='utf-8') == expected
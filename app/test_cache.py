@@ -0,0 +1,109 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.tools.cache import LRUCache, SQLiteCache, TieredCache, make_key
+from app.tools.nlp_torch.models import ToxicContentModel, ToxicModel
+
+
+def test_key_normalizes_text_and_separates_models():
+    assert make_key(' wef3egf34g\n', 'model') == make_key('wef3egf34g', 'model')
+    assert make_key('wef3egf34g', 'model') != make_key('wef3egf34g', 'other-model')
+    assert make_key('wef3egf34g', 'model', 'фильтр') != make_key('wef3egf34g', 'model')
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache('test-lru', maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['hits'] == 3 and cache.stats()['misses'] == 1
+
+
+def test_expires_by_ttl():
+    cache = LRUCache('test-ttl', maxsize=10, ttl=0.01)
+    cache.set('a', 1)
+    time.sleep(0.02)
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_sqlite_cache_shares_results_between_instances(tmp_path):
+    path = str(tmp_path / 'results.sqlite3')
+    writer = SQLiteCache('toxicity', path, ToxicModel, max_bytes=1024 * 1024)
+    value = ToxicModel(toxicity=ToxicContentModel.from_list([0.9, 0.1, 0.2, 0.3, 0.4]), toxicity_count_tokens=5)
+    writer.set_many({'a': value, 'b': value})
+
+    reader = SQLiteCache('toxicity', path, ToxicModel, max_bytes=1024 * 1024)
+    assert reader.get_many(['a', 'b', 'c']) == {'a': value, 'b': value}
+    assert SQLiteCache('mood', path, ToxicModel, max_bytes=1024 * 1024).get('a') is None
+
+
+def test_sqlite_cache_evicts_by_size(tmp_path):
+    cache = SQLiteCache('toxicity', str(tmp_path / 'results.sqlite3'), ToxicModel, max_bytes=400)
+    value = ToxicModel(toxicity=ToxicContentModel.from_list([0.9, 0.1, 0.2, 0.3, 0.4]), toxicity_count_tokens=5)
+    cache.set_many({str(index): value for index in range(20)})
+    cache.evict()
+    assert 0 < cache.stats()['bytes'] <= 400
+
+
+def test_sqlite_cache_evicts_within_namespace(tmp_path):
+    path = str(tmp_path / 'results.sqlite3')
+    value = ToxicModel(toxicity=ToxicContentModel.from_list([0.9, 0.1, 0.2, 0.3, 0.4]), toxicity_count_tokens=5)
+    mood = SQLiteCache('mood', path, ToxicModel, max_bytes=1024 * 1024)
+    mood.set_many({str(index): value for index in range(20)})
+
+    toxicity = SQLiteCache('toxicity', path, ToxicModel, max_bytes=400)
+    toxicity.set_many({str(index): value for index in range(20)})
+    toxicity.evict()
+    assert 0 < toxicity.stats()['bytes'] <= 400
+    assert mood.stats()['size'] == 20
+
+
+def test_sqlite_cache_reads_do_not_write(tmp_path):
+    path = str(tmp_path / 'results.sqlite3')
+    value = ToxicModel(toxicity=ToxicContentModel.from_list([0.9, 0.1, 0.2, 0.3, 0.4]), toxicity_count_tokens=5)
+    cache = SQLiteCache('toxicity', path, ToxicModel, max_bytes=1024 * 1024)
+    cache.set_many({'a': value, 'b': value})
+    connection = cache._connection()
+    connection.execute("UPDATE results SET accessed = 0 WHERE key = 'toxicity:a'")
+
+    changes = connection.total_changes
+    for _ in range(3):
+        assert cache.get('a') == value and cache.get('b') == value
+    assert connection.total_changes == changes
+
+    # Отложенное время обращения записывается вместе со следующей записью значений
+    cache.set('c', value)
+    accessed, = connection.execute("SELECT accessed FROM results WHERE key = 'toxicity:a'").fetchone()
+    assert accessed > 0
+
+
+def test_sqlite_cache_counts_across_threads(tmp_path, monkeypatch):
+    value = ToxicModel(toxicity=ToxicContentModel.from_list([0.9, 0.1, 0.2, 0.3, 0.4]), toxicity_count_tokens=5)
+    cache = SQLiteCache('toxicity', str(tmp_path / 'results.sqlite3'), ToxicModel, max_bytes=1024 * 1024)
+    evictions = []
+    monkeypatch.setattr(cache, 'EVICT_EVERY', 4)
+    monkeypatch.setattr(cache, 'evict', lambda: evictions.append(1))
+
+    def work(thread: int):
+        for index in range(16):
+            cache.set(f'{thread}-{index}', value)
+            cache.get_many([f'{thread}-{index}', 'missing'])
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(work, range(8)))
+    assert len(evictions) == 8 * 16 // 4
+    assert (cache.hits, cache.misses) == (8 * 16, 8 * 16)
+
+
+def test_tiered_cache_promotes_shared_hits(tmp_path):
+    path = str(tmp_path / 'results.sqlite3')
+    value = ToxicModel(toxicity=ToxicContentModel.from_list([0.9, 0.1, 0.2, 0.3, 0.4]), toxicity_count_tokens=5)
+    SQLiteCache('toxicity', path, ToxicModel, max_bytes=1024 * 1024).set('a', value)
+
+    cache = TieredCache(LRUCache('test-tiered', maxsize=10), SQLiteCache('toxicity', path, ToxicModel, 1024 * 1024))
+    assert cache.get('a') == value
+    assert cache.local.get('a') == value
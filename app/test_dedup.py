@@ -0,0 +1,51 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.handlers import MoodHandler, ToxicHandler
+from app.main import app
+from app.text_analysis import process_summary
+from app.utils import deduplicate
+
+client = TestClient(app)
+
+
+def test_deduplicate():
+    texts = ['Купи  сейчас!', 'купи сейчас!', ' КУПИ\nСЕЙЧАС! ', 'Другой текст', 'купи сейчас']
+    assert deduplicate(texts) == (['Купи  сейчас!', 'Другой текст', 'купи сейчас'], [0, 0, 0, 1, 2])
+    assert deduplicate(texts, key=None) == (texts, [0, 1, 2, 3, 4])
+
+
+def test_collection_copies_match_separate_analysis():
+    suffix = str(time.time_ns())
+    messages = [f'Отличный  сервис {suffix}', f'отличный сервис {suffix}', f'ОТЛИЧНЫЙ\tСЕРВИС {suffix} ',
+                f'Ужасный сервис {suffix}', f'Отличный сервис {suffix}']
+    response = client.post('/collection', json={'messages': messages, 'analyses': ['mood', 'toxicity', 'filters'],
+                                                'filters': ['сервис']})
+    assert response.status_code == 200
+    body = response.json()
+    assert body['dedup_ratio'] == 0.6
+
+    # Копии получают результаты первого вхождения, и они совпадают с анализом каждой копии по отдельности
+    for message, result in zip(messages, body['results']):
+        mood, = MoodHandler._get_analyze_from_list([message])
+        toxicity, = ToxicHandler._get_analyze_from_list([message])
+        assert result['mood'] == pytest.approx(mood.dict()['mood'], abs=1e-6)
+        assert result['toxicity'] == pytest.approx(toxicity.dict()['toxicity'], abs=1e-6)
+        assert result['toxicity_count_tokens'] == toxicity.toxicity_count_tokens
+        assert result['filters']['passed'] is False
+
+
+def test_summary_weights_every_message(monkeypatch):
+    messages = ['Все отлично, спасибо!'] * 5 + ['Это ужасно, верните деньги', 'это  ужасно, ВЕРНИТЕ деньги']
+    deduplicated = process_summary(messages)
+    assert deduplicated.dedup_ratio == round(1 - 2 / 7, 4)
+
+    monkeypatch.setattr(settings, 'collection_dedup', False)
+    expected = process_summary(messages)
+    assert expected.dedup_ratio is None
+    assert deduplicated.toxicity_count_tokens == expected.toxicity_count_tokens
+    for field in ('mood', 'toxicity', 'mood_aggregates', 'toxicity_aggregates'):
+        assert getattr(deduplicated, field) == pytest.approx(getattr(expected, field)), field
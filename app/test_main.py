@@ -1,3 +1,4 @@
+import json
 from fastapi.testclient import TestClient
 from app.main import app
 import time
@@ -63,3 +64,55 @@ def test_post_summary():
         # Выводим значение поля "execution" на экран
         print(f"Execution: {response_json['execution']}")
 
+
+
+def test_post_item_selected_analyses():
+    response = client.post("/", json={'message': "Встреча 12 января", 'filters': ["встреча"],
+                                      'analyses': ["toxicity", "filters"]})
+    assert response.status_code == 200
+    response_json = response.json()
+    assert set(response_json) == {'toxicity', 'toxicity_count_tokens', 'filters', 'natasha_model_count_tokens',
+                                  'execution', 'timings'}
+    assert set(response_json['timings']) == {'toxicity', 'natasha'}
+
+
+def test_post_collection_selected_analyses():
+    response = client.post("/collection", json={'messages': ["wef3egf34g", "ewfwertg"], 'analyses': ["mood"]})
+    assert response.status_code == 200
+    assert all(set(item) == {'mood'} for item in response.json()['results'])
+
+
+def test_post_collection_stream():
+    body = '"wef3egf34g"\n{"message": "ewfwertg"}\n[1]\n\n"Это пример для анализа текста"'
+    response = client.post("/collection/stream", params={'window': 2, 'analyses': ['mood']},
+                           content=body.encode('utf-8'))
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line['index'] for line in lines] == [0, 1, 2, 3]
+    assert 'error' in lines[2]
+    assert all(set(line) == {'index', 'mood'} for line in lines if 'error' not in line)
+
+    response = client.post("/collection/stream", params={'analyses': ['filters'], 'filters': ['пример']},
+                           content=body.encode('utf-8'))
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line['filters']['passed'] for line in lines if 'error' not in line] == [True, True, False]
+
+
+def test_post_collection_stream_invalid_utf8():
+    body = '"Привет"\n'.encode('utf-8') + b'"\xff\xfe bad"\n' + '"Пока"\n'.encode('utf-8')
+    response = client.post("/collection/stream", params={'analyses': ['mood']}, content=body)
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line['index'] for line in lines] == [1, 0, 2]
+    assert 'error' in lines[0]
+    assert all(set(line) == {'index', 'mood'} for line in lines[1:])
+
+
+def test_ready_after_warmup():
+    from app.warmup import readiness
+
+    with TestClient(app) as started_client:
+        assert readiness.wait(timeout=300)
+        response = started_client.get("/ready")
+        assert response.status_code == 200
+        assert {'natasha', 'mood', 'toxicity'} <= set(response.json()['timings'])
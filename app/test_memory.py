@@ -0,0 +1,47 @@
+import numpy as np
+
+from app.config import settings
+from app.serve import configure
+from app.tools.memory import memory_usage, mmap_arrays, process_tree_memory
+from app.tools.nlp_natasha.main import NlpToolNatasha
+from app.tools.nlp_natasha.pool import NatashaPool
+
+
+class Holder:
+    def __init__(self):
+        self.indexes = np.arange(12, dtype=np.uint8).reshape(3, 4)
+
+
+def test_mmap_arrays(tmp_path):
+    holder = Holder()
+    mmap_arrays(holder, ('indexes',), str(tmp_path), 'test')
+    assert isinstance(holder.indexes, np.memmap)
+    assert np.array_equal(holder.indexes, np.arange(12, dtype=np.uint8).reshape(3, 4))
+
+    changed = Holder()
+    changed.indexes = np.zeros((2, 2), dtype=np.uint8)
+    mmap_arrays(changed, ('indexes',), str(tmp_path), 'test')
+    assert changed.indexes.shape == (2, 2)
+
+
+def _pool_mmap_state() -> tuple:
+    return settings.mmap_dir, isinstance(NlpToolNatasha.embedding.pq.indexes, np.memmap)
+
+
+def test_natasha_pool_sees_mmap_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('NORMA_MMAP_DIR', '')
+    monkeypatch.setattr(settings, 'mmap_dir', '')
+    configure(workers=2, mmap_dir=str(tmp_path))
+
+    pool = NatashaPool(1)
+    try:
+        assert pool._get_executor().submit(_pool_mmap_state).result() == (str(tmp_path), True)
+    finally:
+        pool.shutdown()
+    assert list(tmp_path.glob('*.npy'))
+
+
+def test_memory_usage():
+    usage = memory_usage()
+    assert usage['rss'] > 0 and usage['pss'] > 0
+    assert process_tree_memory()['total_rss'] >= usage['rss'] * 0.5
@@ -0,0 +1,50 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app)
+
+
+def _samples(text: str) -> dict:
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_metrics_cover_requests_engines_and_tokens():
+    # Уникальные тексты, чтобы результаты не брались из кэша и модели действительно выполнялись
+    suffix = time.time_ns()
+    assert client.post('/', json={'message': f'Это пример для анализа текста {suffix}',
+                                  'filters': ['пример']}).status_code == 200
+    assert client.post('/collection', json={'messages': [f'Привет {suffix}', f'Это пример {suffix}']}).status_code == 200
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/plain')
+    samples = _samples(response.text)
+
+    assert samples['norma_request_duration_seconds_count{endpoint="/",method="POST",status="200"}'] >= 1
+    assert samples['norma_requests_in_progress{endpoint="/metrics"}'] == 1
+    assert samples['norma_collection_size_sum{endpoint="/collection"}'] >= 2
+    for engine in ('mood', 'toxicity', 'natasha'):
+        assert samples[f'norma_engine_duration_seconds_count{{engine="{engine}"}}'] >= 1
+    for stage in ('segment', 'tag_morph', 'artifacts', 'filters', 'meaningful'):
+        assert samples[f'norma_natasha_stage_duration_seconds_count{{stage="{stage}"}}'] >= 1
+    assert samples['norma_toxicity_count_tokens_count'] >= 1
+    assert samples['norma_toxicity_chunks_count'] >= 1
+    assert samples['norma_natasha_model_count_tokens_count'] >= 1
+    assert 'norma_cache_hits_total{cache="toxicity",tier="local"}' in samples
+    assert 'norma_micro_batch_size_count{scheduler="dostoevsky"}' in samples
+
+
+def test_unknown_paths_share_one_series():
+    client.get('/no-such-path-1')
+    client.get('/no-such-path-2')
+    samples = _samples(client.get('/metrics').text)
+    assert samples['norma_request_duration_seconds_count{endpoint="other",method="GET",status="404"}'] >= 2
+    assert not any('no-such-path' in name for name in samples)
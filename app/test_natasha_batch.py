@@ -0,0 +1,47 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.tools.nlp_natasha.main import NlpToolNatasha
+
+client = TestClient(app)
+
+TEXTS = ['Встречи отменили, а плохие слова запретили.', '', '   ', 'wef3egf34g',
+         'Эта усталость уже измотала. Хочется спать, но не получается. Такое может свести с ума.',
+         'Иван Петров переехал из Москвы в Тулу. ООО "Ромашка" открыло офис.']
+FILTERS = ['встреча', 'плохое слово', 'усталость']
+
+
+def test_analyze_many_matches_single_texts():
+    analyses = ('artifacts', 'filters', 'meaningful')
+    expected = [NlpToolNatasha(text).analyze(FILTERS, analyses) for text in TEXTS]
+    assert NlpToolNatasha.analyze_many(TEXTS, FILTERS, analyses) == expected
+
+
+def test_shared_batches_match_per_document_stages():
+    stages = ('tag_morph', 'tag_ner', 'parse_syntax')
+    texts = [text for text in TEXTS if text.strip()]
+    batched = [NlpToolNatasha(text) for text in texts]
+    NlpToolNatasha.run_stages(batched, *stages)
+
+    for tool, text in zip(batched, texts):
+        expected = NlpToolNatasha(text)._require(*stages)
+        assert [(span.start, span.stop, span.type) for span in tool.doc.spans] == \
+               [(span.start, span.stop, span.type) for span in expected.spans]
+        assert [(token.pos, token.feats, token.id, token.head_id, token.rel) for token in tool.doc.tokens] == \
+               [(token.pos, token.feats, token.id, token.head_id, token.rel) for token in expected.tokens]
+
+
+def test_collection_returns_natasha_sections():
+    suffix = str(time.time_ns())
+    messages = ['Встречи отменили ' + suffix, 'Все хорошо ' + suffix]
+    response = client.post('/collection', json={'messages': messages, 'filters': ['встреча'],
+                                                'analyses': ['filters', 'meaningful']})
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert [result['filters']['passed'] for result in results] == [False, True]
+    assert all('meaningful' in result and 'mood' not in result and 'artifacts' not in result for result in results)
+
+    response = client.post('/summary', json={'messages': messages, 'analyses': ['filters']})
+    assert response.status_code == 422
@@ -0,0 +1,22 @@
+from app.tools.nlp_natasha.filters import FilterIndex
+from app.tools.nlp_natasha.main import NlpToolNatasha
+
+
+def test_index_matches_longest_phrase():
+    index = FilterIndex([('плохой',), ('плохой', 'слово'), ('слово', 'пацана')])
+    assert len(index) == 3
+    assert index.match(['это', 'плохой', 'слово', 'пацана']) == [(1, 3)]
+    assert index.match(['плохой', 'день']) == [(0, 1)]
+    assert index.match([]) == []
+
+
+def test_word_filters_by_lemma_and_phrase():
+    result = NlpToolNatasha('Встречи отменили, а плохие слова запретили.').word_filters(['встреча', 'плохое слово'])
+    assert not result.passed
+    assert set(result.tokens) == {'Встречи', 'плохие слова'}
+    assert NlpToolNatasha('Все хорошо').word_filters(['встреча']).passed
+
+
+def test_compiled_filters_are_cached():
+    first = NlpToolNatasha.compile_filters(['встреча', 'плохое слово'])
+    assert NlpToolNatasha.compile_filters(['плохое слово', 'встреча']) is first
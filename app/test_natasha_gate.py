@@ -0,0 +1,51 @@
+from app.tools import profiling
+from app.tools.nlp_natasha.gate import GatedExtractor
+from app.tools.nlp_natasha.main import NlpToolNatasha
+
+TEXTS = [
+    'Встреча назначена на 12 марта 2023 года в Москве, ул. Тверская, д. 7.',
+    'Родился 5 мая, а в 1999 году переехал.', 'Май выдался теплым.', 'Сдать отчет до 01.02.2024',
+    'Живу в Москве', 'Поеду в Тулу на выходных', 'Новосибирск красивый город', 'Россия', 'РФ',
+    'пр-т Мира, 5', 'Краснодарский край', 'республика Татарстан', 'дом 5 квартира 3', 'индекс 123456',
+    'ул. Ленина', 'площадь Победы', 'г. Казань', 'с. Ивановка', 'СПб, Невский проспект',
+    'Пишите на info@example.ru или звоните +7 (912) 345-67-89.',
+    'Эта усталость уже измотала. Хочется спать, но не получается.',
+    'Отличный сервис, все понравилось!', 'wef3egf34g', '', '   ', '🙂🙂🙂',
+    'Цена 500 рублей, скидка 20%', '5 лет назад', 'В прошлом году', '31.12.2023', 'корп. 2, кв. 15', 'Т. Иванов',
+]
+
+
+def test_gate_matches_extractors():
+    for name in ('dates_extractor', 'address_extractor'):
+        gated = getattr(NlpToolNatasha, name)
+        assert isinstance(gated, GatedExtractor) and gated.anchors
+
+        skipped = 0
+        for text in TEXTS:
+            expected = list(gated.extractor(text))
+            assert gated(text) == expected, (name, text)
+            if not gated.has_anchors(text):
+                assert expected == []
+                skipped += 1
+        assert skipped > 0, name
+
+
+def test_check_does_not_parse_known_words(monkeypatch):
+    gated = NlpToolNatasha.address_extractor
+
+    def parse(word):
+        raise AssertionError(word)
+
+    # Известные словарю слова и числа вне диапазонов якорей проверяются без разбора pymorphy2
+    monkeypatch.setattr(gated._morph, 'normalized', parse)
+    assert not gated.has_anchors('Цена 500 рублей, звоните 8 800 555-35-35')
+    assert gated.has_anchors('Доставка по Москве') and gated.has_anchors('индекс 123456')
+
+
+def test_skipped_texts_are_counted_in_profile():
+    with profiling.profile() as root:
+        artifacts = NlpToolNatasha('Отличный сервис, все понравилось!').artifacts()
+
+    assert artifacts.DATES == [] and artifacts.ADDR == []
+    assert root.children['dates'].counters == {'skipped': 1}
+    assert root.children['addresses'].counters == {'skipped': 1}
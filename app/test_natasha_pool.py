@@ -0,0 +1,20 @@
+from fastapi.encoders import jsonable_encoder
+
+from app.tools.nlp_natasha.main import NlpToolNatasha
+from app.tools.nlp_natasha.pool import NatashaPool, WARMUP_TEXT
+
+
+def test_pool_matches_in_process():
+    pool = NatashaPool(1)
+    try:
+        assert len(pool.start()) == 1
+        for analyses in (None, ('filters',)):
+            expected = NlpToolNatasha(WARMUP_TEXT).analyze(['москва'], analyses)
+            assert jsonable_encoder(pool.analyze(WARMUP_TEXT, ['москва'], analyses)) == jsonable_encoder(expected)
+
+        texts = [WARMUP_TEXT, 'Москва', ''] * 12
+        expected = NlpToolNatasha.analyze_many(texts, ['москва'], ('filters', 'meaningful'))
+        assert jsonable_encoder(pool.analyze_many(texts, ['москва'], ('filters', 'meaningful'))) == \
+               jsonable_encoder(expected)
+    finally:
+        pool.shutdown()
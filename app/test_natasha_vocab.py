@@ -0,0 +1,15 @@
+from natasha import MorphVocab
+
+from app.tools.nlp_natasha.vocab import CachedMorphVocab
+
+
+def test_cached_vocab_matches_morph_vocab():
+    vocab, cached = MorphVocab(), CachedMorphVocab('test_morph_vocab', maxsize=2)
+    cases = [('встречи', 'NOUN', {'Case': 'Nom', 'Number': 'Plur'}), ('плохие', 'ADJ', {}), ('wef3egf34g', 'X', {})]
+    for _ in range(2):
+        for word, pos, feats in cases:
+            assert cached.lemmatize(word, pos, feats) == vocab.lemmatize(word, pos, feats)
+            assert cached.word_is_known(word) == vocab.word_is_known(word)
+    stats = cached.memo.stats()
+    assert stats['size'] == 2
+    assert stats['hits'] + stats['misses'] == 12
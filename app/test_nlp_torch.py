@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+import torch
+
+from app.tools.batching import MicroBatchScheduler
+from app.tools.nlp_torch.main import NlpToolTorch
+
+tool = NlpToolTorch('cointegrated/rubert-tiny-toxicity', backend='torch')
+
+LONG_TEXT = ('Эта усталость уже измотала. Хочется спать, но не получается. Хочется расслабиться, но постоянно '
+             'что-то тревожит. Такое может свести с ума. ') * 12
+TEXTS = ['wef3egf34g', 'Это пример для анализа текста', LONG_TEXT, '']
+
+
+def legacy_split_for_token(text: str, max_length=112):
+    """Прежний путь: decode фрагментов и повторная токенизация каждого фрагмента."""
+
+    tokens = tool.tokenizer.encode(text)
+    num_tokens = len(tokens)
+
+    def process(chunk_text):
+        with torch.no_grad():
+            inputs = tool.tokenizer(chunk_text, return_tensors='pt', truncation=True, padding=True)
+            return torch.sigmoid(tool.backend.model(**inputs).logits).cpu().numpy()[0]
+
+    if num_tokens <= max_length:
+        return process(text), num_tokens
+
+    num_chunks = (num_tokens + max_length - 1) // max_length
+    chunk_size = num_tokens // num_chunks
+    remainder = num_tokens % num_chunks
+    split_indices = []
+    start = 0
+    for i in range(num_chunks):
+        end = start + chunk_size + (1 if i < remainder else 0)
+        split_indices.append((start, end))
+        start = end
+    chunk_texts = [tool.tokenizer.decode(tokens[start:end], skip_special_tokens=True) for start, end in split_indices]
+    return [process(chunk_text) for chunk_text in chunk_texts], num_tokens
+
+
+def test_chunk_path_matches_legacy():
+    proba, num_tokens = tool.predict_probabilities(TEXTS)
+    for text, item_proba, item_num_tokens in zip(TEXTS, proba, num_tokens):
+        expected, expected_num_tokens = legacy_split_for_token(text)
+        assert item_num_tokens == expected_num_tokens
+        if isinstance(expected, list):
+            assert isinstance(item_proba, list) and len(item_proba) == len(expected)
+            assert np.allclose(np.stack(item_proba), np.stack(expected), atol=1e-3)
+        else:
+            assert np.allclose(item_proba, expected, atol=1e-3)
+
+
+def test_single_text_matches_list():
+    proba, num_tokens = tool.predict_probabilities(LONG_TEXT)
+    list_proba, list_num_tokens = tool.predict_probabilities([LONG_TEXT])
+    assert num_tokens == list_num_tokens[0]
+    assert np.allclose(np.stack(proba), np.stack(list_proba[0]), atol=1e-3)
+
+
+def test_stride_overlaps_chunks():
+    tokens = tool._encode([LONG_TEXT])[0]
+    overlapped = tool._split_tokens(tokens, stride=16)
+    assert len(overlapped) > len(tool._split_tokens(tokens))
+    content = [chunk[1:-1] for chunk in overlapped]
+    assert all(previous[-16:] == chunk[:16] for previous, chunk in zip(content, content[1:]))
+    assert content[0] + [token for chunk in content[1:] for token in chunk[16:]] == tokens[1:-1]
+
+
+@pytest.mark.parametrize('stride', [0, 16, 100])
+def test_chunks_fit_max_length(stride):
+    tokens = tool._encode([LONG_TEXT])[0]
+    for length in range(100, len(tokens), 7):
+        text_tokens = tokens[:length - 1] + tokens[-1:]
+        chunks = tool._split_tokens(text_tokens, max_length=112, stride=stride)
+        assert all(len(chunk) <= 112 for chunk in chunks), (length, stride)
+        assert all(chunk[0] == tokens[0] and chunk[-1] == tokens[-1] for chunk in chunks)
+
+    with pytest.raises(ValueError):
+        tool._split_tokens(tokens, max_length=112, stride=110)
+
+
+def test_onnx_backend_matches_torch(tmp_path):
+    pytest.importorskip('onnxruntime')
+    from app.tools.nlp_torch.export import check_parity, export
+
+    live = MicroBatchScheduler.registry[tool.model_name_or_path]
+    path = export(tool.model_name_or_path, str(tmp_path / 'model.int8.onnx'))
+    assert check_parity(tool.model_name_or_path, path, atol=0.05) <= 0.05
+    # Проверка не заменяет планировщик работающего экземпляра модели
+    assert MicroBatchScheduler.registry[tool.model_name_or_path] is live
@@ -0,0 +1,65 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.tools import profiling
+from app.tools.batching import MicroBatchScheduler
+
+client = TestClient(app)
+
+
+def test_stages_nest_and_accumulate():
+    with profiling.profile() as root:
+        with profiling.stage('engine'):
+            profiling.add('chunks', 2)
+            for _ in range(3):
+                with profiling.stage('forward'):
+                    time.sleep(0.001)
+
+    tree = root.to_dict()
+    engine = tree['stages']['engine']
+    assert engine['chunks'] == 2
+    assert engine['stages']['forward']['calls'] == 3
+    assert engine['stages']['forward']['ms'] >= 3
+    assert tree['ms'] >= engine['ms'] >= engine['stages']['forward']['ms']
+
+
+def test_disabled_profile_records_nothing():
+    with profiling.profile(False) as root:
+        with profiling.stage('engine'):
+            profiling.add('chunks')
+            assert profiling.current() is None
+    assert root is None
+
+
+def test_threads_and_micro_batches_join_request_tree():
+    def process(items):
+        with profiling.stage('model'):
+            profiling.add('texts', len(items))
+            return items
+
+    scheduler = MicroBatchScheduler('test-profile', process, max_batch_size=4, max_wait_ms=1)
+    with profiling.profile() as root, ThreadPoolExecutor(1) as executor:
+        with profiling.stage('engine'):
+            assert executor.submit(copy_context().run, scheduler, 'текст').result() == 'текст'
+
+    batch = root.to_dict()['stages']['engine']['stages']['micro_batch']
+    assert batch['batch_size'] == 1 and 'wait_ms' in batch
+    assert batch['stages']['model']['texts'] == 1
+
+
+def test_profile_in_response_only_when_requested():
+    text = 'Эта усталость уже измотала. Хочется спать, но не получается. ' * 20 + str(time.time_ns())
+    assert 'profile' not in client.post('/collection', json={'messages': [text]}).json()
+
+    response = client.post('/collection', json={'messages': [text + ' 2'], 'analyses': ['toxicity'], 'profile': True})
+    toxicity = response.json()['profile']['stages']['toxicity']
+    assert toxicity['chunks'] > 1 and toxicity['tokens'] > 112
+    assert {'tokenize', 'forward'} <= set(toxicity['stages'])
+
+    response = client.post('/', json={'message': text, 'analyses': ['artifacts'], 'profile': True})
+    natasha = response.json()['profile']['stages']['natasha']['stages']
+    assert {'dates', 'addresses'} <= set(natasha['artifacts']['stages'])
@@ -0,0 +1,29 @@
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils import aggregate
+
+client = TestClient(app)
+
+
+def test_aggregate():
+    values = np.array([[0.0, 1.0], [1.0, 0.0], [0.5, 0.5]])
+    result = aggregate(values, weights=np.array([2, 1, 1]), percentiles=[50])
+    assert np.allclose(result['mean'], [0.5, 0.5])
+    assert np.allclose(result['max'], [1.0, 1.0])
+    assert np.allclose(result['weighted_mean'], [0.375, 0.625])
+    assert np.allclose(result['p50'], [0.5, 0.5])
+
+
+def test_post_summary_matches_collection():
+    messages = ["wef3egf34g", "Это пример для анализа текста", "ewfwertg"]
+    collection = client.post("/collection", json={'messages': messages}).json()['results']
+    response = client.post("/summary", json={'messages': messages, 'percentiles': [90]})
+    assert response.status_code == 200
+    summary = response.json()
+    for name in ('mood', 'toxicity'):
+        for field, value in summary[name].items():
+            assert abs(value - np.mean([item[name][field] for item in collection])) < 2e-3
+        assert set(summary[f'{name}_aggregates']) == {'max', 'weighted_mean', 'p90'}
+    assert summary['toxicity_count_tokens'] == round(np.mean([item['toxicity_count_tokens'] for item in collection]))
@@ -1,20 +1,181 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from functools import partial
 
-from app.utils import execution_time
+from app.config import settings
+from app.utils import execution_time, measure, aggregate, deduplicate, dedup_key
 from app.handlers import MoodHandler, ToxicHandler, ToxicModel, MoodModel, NatashaHandler, NatashaModel
-from app.models import OutputItemModel, OutputItemsModel, BaseOutputModel
+from app.models import OutputItemModel, OutputItemsModel, OutputAverageModel, ResultItemModel
+from app.tools import profiling
+from app.tools.admission import AdmissionController
+from app.tools.metrics import ENGINE_LATENCY
+
+
+ITEM_ANALYSES = ('mood', 'toxicity', 'artifacts', 'filters', 'meaningful')
+COLLECTION_ANALYSES = ('mood', 'toxicity')
+
+# Виды анализа в упрощенном режиме под перегрузкой: только fastText, без трансформера и Natasha
+DEGRADED_ANALYSES = ('mood',)
+
+# Общий пул потоков для параллельного запуска движков анализа в рамках одного запроса
+engine_executor = ThreadPoolExecutor(max_workers=settings.engine_threads, thread_name_prefix='engine')
+
+# Пул выполнения запросов с ограниченной очередью: по умолчанию одновременно выполняется столько запросов,
+# сколько прямых проходов torch помещается на ядра без переподписки. Микробатчи набираются только из
+# одновременно выполняемых запросов: при одном потоке пула тексты обрабатываются сразу, без ожидания батча
+admission = AdmissionController(
+    workers=settings.inference_workers or max(1, (os.cpu_count() or 1) // settings.torch_threads),
+    queue_size=settings.inference_queue_size,
+    retry_after=settings.overload_retry_after,
+    degrade_threshold=settings.degrade_threshold)
+
+
+def _timed(timings: dict, name: str, call):
+    try:
+        with measure(timings, name), profiling.stage(name):
+            return call()
+    finally:
+        ENGINE_LATENCY.labels(name).observe(timings[name] / 1000)
+
+
+def run_engines(calls: dict, timings: dict) -> dict:
+    """
+        Запускает движки анализа и возвращает их результаты. Если включен параллельный режим, движки выполняются
+        одновременно в общем пуле потоков: инференс torch освобождает GIL и перекрывается с работой Natasha,
+        и задержка запроса приближается к задержке самого медленного движка. Движки в потоках пула выполняются
+        в копии контекста запроса, чтобы их этапы попадали в дерево времени (см. app.tools.profiling).
+
+        Args:
+            calls (dict): Функции без аргументов по названиям движков.
+            timings (dict): Словарь, в который записывается время работы каждого движка в миллисекундах.
+
+        Returns:
+            dict: Результаты по названиям движков.
+        """
+
+    if not settings.concurrent_engines or len(calls) < 2:
+        return {name: _timed(timings, name, call) for name, call in calls.items()}
+
+    futures = {name: engine_executor.submit(copy_context().run, _timed, timings, name, call)
+               for name, call in calls.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def deduplicate_collection(data: list, key=dedup_key) -> tuple[list, list]:
+    """
+        Убирает копии сообщений коллекции перед анализом (см. app.utils.deduplicate), если это включено
+        в настройках; иначе каждое сообщение считается уникальным.
+
+        Returns:
+            tuple[list, list]: Уникальные сообщения и позиции уникального сообщения для каждого исходного.
+        """
+
+    if not settings.collection_dedup:
+        return data, list(range(len(data)))
+    return deduplicate(data, key)
+
+
+def dedup_ratio(data: list, unique: list) -> float | None:
+    """
+    Возвращает долю сообщений коллекции, которые оказались копиями других, или None, если копии не убираются.
+    """
+
+    if not settings.collection_dedup or not data:
+        return None
+    return round(1 - len(unique) / len(data), 4)
 
 
 @execution_time
-def process_with_string(text: str, filters: list) -> OutputItemModel:
-    mood: MoodModel = MoodHandler.get_analyze(data=text)
-    toxic: ToxicModel = ToxicHandler.get_analyze(data=text)
-    natasha: NatashaModel = NatashaHandler.get_analyze(data=text, filters=filters)
-    return OutputItemModel(**mood.dict(), **toxic.dict(), **natasha.dict())
+def process_with_string(text: str, filters: list, analyses: list | None = None, profile: bool = False,
+                        degraded: bool = False) -> OutputItemModel:
+    analyses = DEGRADED_ANALYSES if degraded else analyses or ITEM_ANALYSES
+    calls, timings = {}, {}
+
+    if 'mood' in analyses:
+        calls['mood'] = partial(MoodHandler.get_analyze, data=text)
+    if 'toxicity' in analyses:
+        calls['toxicity'] = partial(ToxicHandler.get_analyze, data=text)
+    natasha_analyses = [analysis for analysis in NatashaHandler.analyses if analysis in analyses]
+    if natasha_analyses:
+        calls['natasha'] = partial(NatashaHandler.get_analyze, data=text, filters=filters, analyses=natasha_analyses)
+
+    result = {}
+    model: MoodModel | ToxicModel | NatashaModel
+    with profiling.profile(profile) as root:
+        for model in run_engines(calls, timings).values():
+            result.update(model.dict())
+
+    return OutputItemModel(**result, timings=timings, profile=root.to_dict() if root else None,
+                           degraded=degraded or None)
 
 
 @execution_time
-def process_with_list(data: list) -> OutputItemsModel:
-    toxic: list[ToxicModel] = ToxicHandler.get_analyze(data=data)
-    mood: list[MoodModel] = MoodHandler.get_analyze(data=data)
-    return OutputItemsModel(results=[BaseOutputModel(**mood_model.dict(), **toxic_model.dict()) for mood_model, toxic_model in zip(mood, toxic)])
+def process_with_list(data: list, analyses: list | None = None, filters: list | None = None, profile: bool = False,
+                      degraded: bool = False) -> OutputItemsModel:
+    analyses = DEGRADED_ANALYSES if degraded else analyses or COLLECTION_ANALYSES
+    calls, timings, indexes = {}, {}, {}
+
+    # Каждое уникальное сообщение анализируется один раз, результаты раскладываются по всем его копиям.
+    # Модели не различают регистр и пробелы, Natasha различает, поэтому для нее копии - только одинаковые тексты
+    unique, index = deduplicate_collection(data)
+    if 'toxicity' in analyses:
+        calls['toxicity'] = partial(ToxicHandler.get_analyze, data=unique)
+        indexes['toxicity'] = index
+    if 'mood' in analyses:
+        calls['mood'] = partial(MoodHandler.get_analyze, data=unique)
+        indexes['mood'] = index
+    natasha_analyses = [analysis for analysis in NatashaHandler.analyses if analysis in analyses]
+    if natasha_analyses:
+        natasha_unique, indexes['natasha'] = deduplicate_collection(data, key=None)
+        calls['natasha'] = partial(NatashaHandler.get_analyze, data=natasha_unique, filters=filters,
+                                   analyses=natasha_analyses)
+
+    results = [{} for _ in data]
+    models: list[ToxicModel] | list[MoodModel] | list[NatashaModel]
+    with profiling.profile(profile) as root:
+        for name, models in run_engines(calls, timings).items():
+            models = [model.dict() for model in models]
+            for result, position in zip(results, indexes[name]):
+                result.update(models[position])
+
+    return OutputItemsModel(results=[ResultItemModel(**result) for result in results], timings=timings,
+                            profile=root.to_dict() if root else None, degraded=degraded or None,
+                            dedup_ratio=dedup_ratio(data, unique))
+
+
+@execution_time
+def process_summary(data: list, analyses: list | None = None, percentiles=(50, 90, 95), profile: bool = False,
+                    degraded: bool = False) -> OutputAverageModel:
+    analyses = DEGRADED_ANALYSES if degraded else analyses or COLLECTION_ANALYSES
+    calls, timings = {}, {}
+    if not data:
+        return OutputAverageModel(timings=timings, degraded=degraded or None)
+
+    unique, index = deduplicate_collection(data)
+    if 'toxicity' in analyses:
+        calls['toxicity'] = partial(ToxicHandler.get_array, data=unique)
+    if 'mood' in analyses:
+        calls['mood'] = partial(MoodHandler.get_array, data=unique)
+
+    # Вероятности остаются массивами NumPy и сводятся одним векторным проходом, без моделей для каждого текста
+    result = {}
+    weights = None
+    with profiling.profile(profile) as root:
+        arrays = run_engines(calls, timings)
+        with profiling.stage('aggregate'):
+            # Строки уникальных сообщений повторяются для каждой копии, чтобы средние, веса и перцентили
+            # по-прежнему считались по всем исходным сообщениям
+            if len(unique) < len(data):
+                arrays = {name: (values[index], count_tokens[index])
+                          for name, (values, count_tokens) in arrays.items()}
+            if 'toxicity' in arrays:
+                values, weights = arrays['toxicity']
+                result['toxicity'] = aggregate(values, weights, percentiles)
+                result['toxicity_count_tokens'] = round(weights.mean())
+            if 'mood' in arrays:
+                values, _ = arrays['mood']
+                result['mood'] = aggregate(values, weights, percentiles)
 
+    return OutputAverageModel.from_aggregates(**result, timings=timings, profile=root.to_dict() if root else None,
+                                              degraded=degraded or None, dedup_ratio=dedup_ratio(data, unique))
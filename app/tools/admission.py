@@ -0,0 +1,116 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from functools import partial
+
+from app.tools.metrics import INFERENCE_ADMITTED, REQUESTS_DEGRADED, REQUESTS_REJECTED
+
+
+class Overloaded(Exception):
+    """
+        Исключение при переполнении очереди: запрос отклоняется сразу, клиенту предлагается повторить
+        его через retry_after секунд.
+        """
+
+    def __init__(self, retry_after: int):
+        super().__init__('Сервис перегружен, повторите запрос позже')
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+        Контроль допуска запросов к инференсу: запросы выполняются в отдельном пуле из workers потоков,
+        еще не более queue_size запросов ожидают в очереди, остальные сразу отклоняются (Overloaded).
+        Место в очереди освобождается, когда работа завершена, а не когда клиент перестал ждать.
+
+        Атрибуты:
+        ----------
+        workers : int
+            Количество одновременно выполняемых запросов.
+        queue_size : int
+            Количество запросов, ожидающих выполнения.
+        retry_after : int
+            Значение заголовка Retry-After для отклоненных запросов, с.
+        degrade_threshold : float
+            Доля заполнения (выполняемые и ожидающие запросы относительно workers + queue_size), начиная с которой
+            запросы обслуживаются в упрощенном режиме (0 - не упрощать).
+        admitted : int
+            Количество принятых, но еще не завершенных запросов.
+        """
+
+    # Период проверки освобождения места в очереди при ожидании, с
+    WAIT_INTERVAL = 0.01
+
+    def __init__(self, workers: int, queue_size: int, retry_after: int = 1, degrade_threshold: float = 0):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self.degrade_threshold = degrade_threshold
+        self.admitted = 0
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='inference')
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    @property
+    def load(self) -> float:
+        return self.admitted / self.capacity
+
+    def _try_acquire(self) -> bool | None:
+        """
+        Занимает место в очереди и возвращает, нужно ли обслужить запрос в упрощенном режиме,
+        или None, если очередь заполнена.
+        """
+
+        with self._lock:
+            if self.admitted >= self.capacity:
+                return None
+            degraded = bool(self.degrade_threshold) and self.admitted / self.capacity >= self.degrade_threshold
+            self.admitted += 1
+        INFERENCE_ADMITTED.inc()
+        return degraded
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.admitted -= 1
+        INFERENCE_ADMITTED.dec()
+
+    async def run(self, endpoint: str, func, *args, wait: bool = False, **kwargs):
+        """
+        Выполняет func в пуле инференса. Если очередь заполнена, отклоняет запрос (Overloaded) или, если wait
+        истинно, ждет освобождения места (для окон потоковой обработки, которые не должны прерываться).
+
+        Если включено упрощение и нагрузка выше порога, func получает аргумент degraded=True.
+
+        Returns:
+            Результат func.
+        """
+
+        degraded = self._try_acquire()
+        while degraded is None:
+            if not wait:
+                REQUESTS_REJECTED.labels(endpoint).inc()
+                raise Overloaded(self.retry_after)
+            await asyncio.sleep(self.WAIT_INTERVAL)
+            degraded = self._try_acquire()
+        if degraded:
+            REQUESTS_DEGRADED.labels(endpoint).inc()
+            kwargs['degraded'] = True
+
+        try:
+            future = self.executor.submit(copy_context().run, partial(func, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        return {'workers': self.workers,
+                'queue_size': self.queue_size,
+                'admitted': self.admitted,
+                'load': self.load,
+                'degrade_threshold': self.degrade_threshold}
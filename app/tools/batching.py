@@ -0,0 +1,194 @@
+import queue
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import Future
+
+from app.tools import profiling
+
+
+class Histogram:
+    """
+        Простая кумулятивная гистограмма значений.
+
+        Атрибуты:
+        ----------
+        buckets : tuple
+            Верхние границы корзин (включительно).
+        """
+
+    def __init__(self, buckets: tuple):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value)] += 1
+            self._sum += value
+
+    def snapshot(self) -> dict:
+        """
+        Возвращает состояние гистограммы: накопленное количество значений по корзинам, общее количество и сумму.
+        """
+
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+
+        buckets, cumulative = {}, 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {'buckets': buckets, 'count': cumulative, 'sum': total_sum}
+
+
+class MicroBatchScheduler:
+    """
+        Планировщик микробатчей: собирает одиночные запросы из разных потоков в очередь и передает их модели
+        одним батчем. Батч составляется из элементов, уже стоящих в очереди, и отправляется, когда набирается
+        max_batch_size элементов, очередь пуста и больше никто не ставит в нее элементы, или истекает max_wait_ms
+        с момента поступления первого элемента батча. Если других вызывающих нет, элемент обрабатывается сразу
+        в потоке вызывающего без очереди: одиночный запрос не ждет и не платит за переход между потоками.
+        Батчи набираются из запросов, пришедших, пока модель занята предыдущим элементом или батчем.
+
+        Атрибуты:
+        ----------
+        name : str
+            Имя планировщика, под которым публикуется его статистика.
+        process_batch : callable
+            Функция, принимающая список элементов и возвращающая список результатов того же размера и порядка.
+        max_batch_size : int
+            Максимальный размер батча.
+        max_wait_ms : float
+            Максимальное время ожидания формирования батча в миллисекундах.
+        batch_sizes : Histogram
+            Гистограмма размеров батчей.
+        wait_times : Histogram
+            Гистограмма времени ожидания элементов в очереди (мс).
+        """
+
+    BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+    WAIT_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100)
+
+    registry = {}
+
+    def __init__(self, name: str, process_batch, max_batch_size: int = 32, max_wait_ms: float = 5):
+        self.name = name
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batch_sizes = Histogram(self.BATCH_SIZE_BUCKETS)
+        self.wait_times = Histogram(self.WAIT_BUCKETS_MS)
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        # Вызывающие, ожидающие результата, и те из них, чьи элементы еще не взяты из очереди в батч
+        self._active = 0
+        self._queued = 0
+        MicroBatchScheduler.registry[name] = self
+
+    def submit(self, item) -> Future:
+        """
+        Ставит элемент в очередь и возвращает Future с результатом его обработки.
+        """
+
+        self._ensure_started()
+        with self._lock:
+            self._queued += 1
+        future = Future()
+        self._queue.put((item, future, time.perf_counter(), profiling.current()))
+        return future
+
+    def __call__(self, item):
+        """
+        Обрабатывает элемент в составе ближайшего батча и возвращает результат. Если других вызывающих нет,
+        элемент обрабатывается сразу в текущем потоке.
+        """
+
+        with self._lock:
+            alone = self._active == 0
+            self._active += 1
+        try:
+            if alone:
+                future = Future()
+                self._flush([(item, future, time.perf_counter(), profiling.current())])
+            else:
+                future = self.submit(item)
+            return future.result()
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def stats(self) -> dict:
+        return {'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'batch_size': self.batch_sizes.snapshot(),
+                'wait_ms': self.wait_times.snapshot()}
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f'micro-batch-{self.name}', daemon=True)
+                self._thread.start()
+
+    def _take(self, timeout: float | None = None):
+        item = self._queue.get(timeout=timeout) if timeout is None or timeout > 0 else self._queue.get_nowait()
+        with self._lock:
+            self._queued -= 1
+        return item
+
+    def _collect(self) -> list:
+        batch = [self._take()]
+        deadline = batch[0][2] + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._take(0))
+                continue
+            except queue.Empty:
+                pass
+            # Очередь пуста: ждать имеет смысл, только если кто-то уже ставит в нее элемент
+            if not self._queued:
+                break
+            try:
+                batch.append(self._take(deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            self._flush(self._collect())
+
+    def _flush(self, batch: list):
+        started = time.perf_counter()
+        self.batch_sizes.observe(len(batch))
+        for _, _, enqueued, _ in batch:
+            self.wait_times.observe((started - enqueued) * 1000)
+
+        # Этапы батча измеряются, если хотя бы один запрос в нем профилируется, и добавляются в дерево каждого из них
+        try:
+            with profiling.profile(any(node is not None for *_, node in batch)) as batch_node:
+                results = self.process_batch([item for item, *_ in batch])
+        except Exception as error:
+            for _, future, _, _ in batch:
+                future.set_exception(error)
+            return
+
+        for (_, future, enqueued, node), result in zip(batch, results):
+            if node is not None:
+                self._attach(node, batch_node, len(batch), (started - enqueued) * 1000)
+            future.set_result(result)
+
+    @staticmethod
+    def _attach(node: profiling.ProfileNode, batch_node: profiling.ProfileNode, batch_size: int, wait_ms: float):
+        item_node = node.child('micro_batch')
+        item_node.elapsed_ns += batch_node.elapsed_ns
+        item_node.calls += 1
+        item_node.counters.update(batch_node.counters)
+        item_node.counters.update(batch_size=batch_size, wait_ms=round(wait_ms, 3))
+        item_node.children.update(batch_node.children)
@@ -0,0 +1,344 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from app.utils import normalize_text
+
+
+def make_key(text: str, *parts) -> str:
+    """
+        Формирует ключ кэша из хэша нормализованного текста и дополнительных частей (идентификатор модели, фильтры).
+
+        Args:
+            text (str): Текст, для которого кэшируется результат.
+            *parts: Дополнительные части ключа.
+
+        Returns:
+            str: Ключ кэша.
+        """
+
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (normalize_text(text),) + tuple(str(part) for part in parts):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+        Потокобезопасный кэш в памяти с вытеснением по размеру (LRU) и временем жизни записей (TTL).
+
+        Атрибуты:
+        ----------
+        name : str
+            Имя кэша, под которым публикуется его статистика.
+        maxsize : int
+            Максимальное количество записей.
+        ttl : float | None
+            Время жизни записи в секундах (None - без ограничения).
+        hits : int
+            Количество попаданий.
+        misses : int
+            Количество промахов.
+        """
+
+    registry = {}
+
+    def __init__(self, name: str, maxsize: int, ttl: float | None = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        LRUCache.registry[name] = self
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires, value = item
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_many(self, keys: list) -> dict:
+        result = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                result[key] = value
+        return result
+
+    def set_many(self, items: dict):
+        for key, value in items.items():
+            self.set(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0}
+
+
+class SQLiteCache:
+    """
+        Кэш результатов в файле SQLite (режим WAL), общий для нескольких процессов и контейнеров,
+        подключивших один том. Переживает перезапуски воркеров.
+
+        Значения хранятся в виде JSON и восстанавливаются в модель model. Если суммарный размер записей
+        пространства ключей name превышает max_bytes, удаляются его записи, к которым дольше всего не обращались;
+        записи других пространств (других движков) при этом не затрагиваются.
+
+        Чтение не пишет в базу и не берет блокировку записи SQLite: время обращения записи обновляется
+        не чаще раза в ACCESS_RESOLUTION секунд, а обновления откладываются и выполняются в одной транзакции
+        с ближайшей записью значений или вытеснением (или после накопления TOUCH_EVERY ключей).
+
+        Атрибуты:
+        ----------
+        name : str
+            Имя кэша (пространство ключей в общей таблице).
+        path : str
+            Путь к файлу базы данных.
+        model : type[BaseModel]
+            Модель, в которую восстанавливаются сохраненные значения.
+        max_bytes : int
+            Максимальный суммарный размер значений пространства ключей в байтах.
+        ttl : float | None
+            Время жизни записи в секундах (None - без ограничения).
+        """
+
+    EVICT_EVERY = 256
+    ACCESS_RESOLUTION = 60
+    TOUCH_EVERY = 256
+
+    def __init__(self, name: str, path: str, model: type[BaseModel], max_bytes: int, ttl: float | None = None):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        # Счетчики обращений и записей общие для потоков воркера
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Отложенные обновления времени обращения: ключ в таблице -> время
+        self._touched = {}
+        self._touched_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS results ('
+                               'key TEXT PRIMARY KEY, namespace TEXT NOT NULL, value TEXT NOT NULL, '
+                               'size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)')
+            connection.execute('DROP INDEX IF EXISTS results_accessed')
+            connection.execute('CREATE INDEX IF NOT EXISTS results_namespace_accessed ON results (namespace, accessed)')
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _namespaced(self, key: str) -> str:
+        return f'{self.name}:{key}'
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def get_many(self, keys: list) -> dict:
+        if not keys:
+            return {}
+
+        now = time.time()
+        names = {self._namespaced(key): key for key in keys}
+        rows = []
+        connection = self._connection()
+        names_list = list(names)
+        for start in range(0, len(names_list), 500):
+            part = names_list[start:start + 500]
+            placeholders = ','.join('?' * len(part))
+            query = f'SELECT key, value, created, accessed FROM results WHERE key IN ({placeholders})'
+            rows.extend(connection.execute(query, part).fetchall())
+
+        result, touched = {}, {}
+        for name, value, created, accessed in rows:
+            if self.ttl and created + self.ttl < now:
+                continue
+            result[names[name]] = self.model.parse_obj(json.loads(value))
+            if accessed + self.ACCESS_RESOLUTION < now:
+                touched[name] = now
+
+        if touched:
+            with self._touched_lock:
+                self._touched.update(touched)
+                pending = len(self._touched)
+            if pending >= self.TOUCH_EVERY:
+                with self._transaction() as connection:
+                    self._write_touched(connection)
+
+        with self._lock:
+            self.hits += len(result)
+            self.misses += len(names) - len(result)
+        return result
+
+    def set_many(self, items: dict):
+        if not items:
+            return
+
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            data = json.dumps(jsonable_encoder(value), ensure_ascii=False)
+            rows.append((self._namespaced(key), self.name, data, len(data.encode('utf-8')), now, now))
+
+        with self._transaction() as connection:
+            connection.executemany('INSERT OR REPLACE INTO results (key, namespace, value, size, created, accessed) '
+                                   'VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self._write_touched(connection)
+
+        with self._lock:
+            self._writes += len(rows)
+            evict = self._writes >= self.EVICT_EVERY
+            if evict:
+                self._writes = 0
+        if evict:
+            self.evict()
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _write_touched(self, connection: sqlite3.Connection):
+        with self._touched_lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            connection.executemany('UPDATE results SET accessed = ? WHERE key = ?',
+                                   [(accessed, key) for key, accessed in touched.items()])
+
+    def evict(self):
+        """
+        Удаляет записи пространства ключей, к которым дольше всего не обращались, пока их суммарный размер
+        превышает max_bytes.
+        """
+
+        with self._transaction() as connection:
+            self._write_touched(connection)
+            total, = connection.execute('SELECT COALESCE(SUM(size), 0) FROM results WHERE namespace = ?',
+                                        (self.name,)).fetchone()
+            if total <= self.max_bytes:
+                return
+
+            excess = total - self.max_bytes
+            cursor = connection.execute('SELECT key, size FROM results WHERE namespace = ? ORDER BY accessed',
+                                        (self.name,))
+            stale, freed = [], 0
+            for key, size in cursor:
+                if freed >= excess:
+                    break
+                stale.append((key,))
+                freed += size
+            cursor.close()
+            connection.executemany('DELETE FROM results WHERE key = ?', stale)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        count, size = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results WHERE namespace = ?', (self.name,)).fetchone()
+        return {'size': count,
+                'bytes': size,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0}
+
+
+class TieredCache:
+    """
+        Двухуровневый кэш: быстрый кэш в памяти процесса перед общим кэшем на диске.
+        Промахи первого уровня запрашиваются из второго одним запросом, найденные значения поднимаются в первый.
+
+        Атрибуты:
+        ----------
+        local : LRUCache
+            Кэш в памяти процесса.
+        shared : SQLiteCache
+            Общий кэш на диске.
+        """
+
+    def __init__(self, local: LRUCache, shared: SQLiteCache):
+        self.local = local
+        self.shared = shared
+        LRUCache.registry[local.name] = self
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def get_many(self, keys: list) -> dict:
+        result = self.local.get_many(keys)
+        missed = [key for key in keys if key not in result]
+        if missed:
+            found = self.shared.get_many(missed)
+            self.local.set_many(found)
+            result.update(found)
+        return result
+
+    def set_many(self, items: dict):
+        self.local.set_many(items)
+        self.shared.set_many(items)
+
+    def stats(self) -> dict:
+        return {'local': self.local.stats(), 'shared': self.shared.stats()}
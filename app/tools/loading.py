@@ -0,0 +1,65 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModel:
+    """
+        Дескриптор атрибута класса, который загружает модель при первом обращении, а не при импорте модуля.
+        Загрузка выполняется один раз и потокобезопасно, время загрузки записывается и логируется.
+
+        Атрибуты:
+        ----------
+        name : str
+            Имя компонента в логах и статистике загрузки.
+        factory : callable
+            Функция без аргументов, создающая модель.
+        load_time : float | None
+            Время загрузки в миллисекундах (включая загрузку моделей, от которых зависит эта).
+        """
+
+    registry = {}
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self.factory = factory
+        self.load_time = None
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        LazyModel.registry[name] = self
+
+    def __get__(self, instance, owner):
+        if self._loaded:
+            return self._value
+        return self.load()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self):
+        """
+        Загружает модель, если она еще не загружена, и возвращает ее.
+        """
+
+        with self._lock:
+            if not self._loaded:
+                start_time = time.perf_counter()
+                self._value = self.factory()
+                self.load_time = (time.perf_counter() - start_time) * 1000
+                self._loaded = True
+                logger.info('Загружен компонент %s за %.0f мс', self.name, self.load_time)
+        return self._value
+
+    def replace(self, value):
+        """
+        Подменяет модель готовым объектом без вызова factory (например, легкой моделью-заменителем в бенчмарках).
+        """
+
+        with self._lock:
+            self._value = value
+            self.load_time = 0.0
+            self._loaded = True
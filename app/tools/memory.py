@@ -0,0 +1,102 @@
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Процесс-супервизор в режиме pre-fork (python -m app.serve); None - сервер запущен без него
+supervisor_pid = None
+
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def memory_usage(pid: int | str = 'self') -> dict:
+    """
+        Возвращает использование памяти процессом в мегабайтах по /proc/<pid>/smaps_rollup: RSS, PSS
+        (RSS с долей разделяемых страниц, поделенных между процессами) и разделяемую/частную память.
+
+        Args:
+            pid (int | str): Идентификатор процесса.
+
+        Returns:
+            dict: Значения по названиям полей в нижнем регистре (пустой словарь, если данные недоступны).
+        """
+
+    result = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as file:
+            for line in file:
+                name, _, value = line.partition(':')
+                if name in SMAPS_FIELDS:
+                    result[name.lower()] = int(value.split()[0]) / 1024
+    except OSError:
+        return {}
+    return result
+
+
+def child_pids(pid: int) -> list:
+    """
+        Возвращает идентификаторы дочерних процессов.
+        """
+
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as file:
+            return [int(child) for child in file.read().split()]
+    except OSError:
+        return []
+
+
+def process_tree_memory() -> dict:
+    """
+        Возвращает использование памяти всеми процессами сервера: супервизором и его воркерами в режиме pre-fork
+        (вместе с их дочерними процессами, например пулом Natasha), иначе - текущим процессом и его дочерними.
+
+        Returns:
+            dict: Использование памяти по идентификаторам процессов и сумма RSS и PSS.
+        """
+
+    root = supervisor_pid or os.getpid()
+    pids, queue = [], [root]
+    while queue:
+        pid = queue.pop(0)
+        pids.append(pid)
+        queue.extend(child_pids(pid))
+
+    processes = {pid: memory_usage(pid) for pid in pids}
+    return {'pid': os.getpid(),
+            'supervisor': supervisor_pid,
+            'processes': processes,
+            'total_rss': sum(usage.get('rss', 0) for usage in processes.values()),
+            'total_pss': sum(usage.get('pss', 0) for usage in processes.values())}
+
+
+def mmap_arrays(obj, names: tuple, directory: str, prefix: str):
+    """
+        Заменяет массивы NumPy в атрибутах объекта на отображения в память (mmap) файлов .npy. Страницы таких
+        массивов разделяются всеми процессами, отображающими один файл, и не учитываются как частная память.
+        Файл записывается при первом вызове; если размерность или тип массива изменились, он перезаписывается.
+        При ошибке записи массивы остаются в памяти процесса.
+
+        Args:
+            obj: Объект с массивами в атрибутах.
+            names (tuple): Названия атрибутов.
+            directory (str): Каталог файлов.
+            prefix (str): Префикс имен файлов (например, идентификатор модели).
+        """
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for name in names:
+            array = getattr(obj, name)
+            path = os.path.join(directory, f'{prefix}.{name}.npy')
+            mapped = np.load(path, mmap_mode='r') if os.path.exists(path) else None
+            if mapped is None or mapped.shape != array.shape or mapped.dtype != array.dtype:
+                temporary = f'{path}.{os.getpid()}.tmp'
+                with open(temporary, 'wb') as file:
+                    np.save(file, np.ascontiguousarray(array))
+                os.replace(temporary, path)
+                mapped = np.load(path, mmap_mode='r')
+            setattr(obj, name, mapped)
+    except OSError as error:
+        logger.warning('Массивы %s не отображены в память: %s', prefix, error)
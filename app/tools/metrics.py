@@ -0,0 +1,135 @@
+import os
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, \
+    generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+CHUNK_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 32, 64)
+COLLECTION_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+
+REQUEST_LATENCY = Histogram('norma_request_duration_seconds', 'Время обработки HTTP-запроса',
+                            ('method', 'endpoint', 'status'), buckets=LATENCY_BUCKETS)
+REQUESTS_IN_PROGRESS = Gauge('norma_requests_in_progress', 'Количество обрабатываемых HTTP-запросов',
+                             ('endpoint',), multiprocess_mode='livesum')
+ENGINE_LATENCY = Histogram('norma_engine_duration_seconds', 'Время работы движка анализа (обработчика) в запросе',
+                           ('engine',), buckets=LATENCY_BUCKETS)
+NATASHA_STAGE_LATENCY = Histogram('norma_natasha_stage_duration_seconds', 'Время этапа обработки текста Natasha',
+                                  ('stage',), buckets=LATENCY_BUCKETS)
+TOXICITY_TOKENS = Histogram('norma_toxicity_count_tokens', 'Количество токенов модели токсичности в тексте',
+                            buckets=TOKEN_BUCKETS)
+TOXICITY_CHUNKS = Histogram('norma_toxicity_chunks', 'Количество фрагментов, на которые разбит текст',
+                            buckets=CHUNK_BUCKETS)
+NATASHA_TOKENS = Histogram('norma_natasha_model_count_tokens', 'Количество токенов Natasha в тексте',
+                           buckets=TOKEN_BUCKETS)
+COLLECTION_SIZE = Histogram('norma_collection_size', 'Количество сообщений в коллекции',
+                            ('endpoint',), buckets=COLLECTION_BUCKETS)
+INFERENCE_ADMITTED = Gauge('norma_inference_admitted', 'Количество выполняемых и ожидающих в очереди запросов',
+                           multiprocess_mode='livesum')
+REQUESTS_REJECTED = Counter('norma_requests_rejected', 'Количество запросов, отклоненных из-за перегрузки',
+                            ('endpoint',))
+NATASHA_EXTRACTOR_TEXTS = Counter('norma_natasha_extractor_texts',
+                                  'Количество текстов, переданных экстрактору yargy (result=run) или пропущенных '
+                                  'предварительной проверкой (result=skipped)', ('extractor', 'result'))
+REQUESTS_DEGRADED = Counter('norma_requests_degraded', 'Количество запросов, обслуженных в упрощенном режиме',
+                            ('endpoint',))
+
+
+class StatsCollector:
+    """
+        Публикует в Prometheus статистику, которую компоненты уже накапливают сами: попадания и промахи кэшей
+        (LRUCache.registry) и гистограммы микробатчей (MicroBatchScheduler.registry). Значения читаются
+        в момент сбора метрик, поэтому на горячем пути (например, в кэше лемм) метрики ничего не стоят.
+
+        В многопроцессном режиме значения относятся к процессу, обработавшему запрос /metrics.
+        """
+
+    def collect(self):
+        from app.tools.batching import MicroBatchScheduler
+        from app.tools.cache import LRUCache
+
+        hits = CounterMetricFamily('norma_cache_hits', 'Количество попаданий в кэш', labels=('cache', 'tier'))
+        misses = CounterMetricFamily('norma_cache_misses', 'Количество промахов кэша', labels=('cache', 'tier'))
+        size = GaugeMetricFamily('norma_cache_size', 'Количество записей в кэше', labels=('cache', 'tier'))
+        for name, cache in LRUCache.registry.items():
+            stats = cache.stats()
+            tiers = {'local': stats['local'], 'shared': stats['shared']} if 'local' in stats else {'local': stats}
+            for tier, tier_stats in tiers.items():
+                hits.add_metric((name, tier), tier_stats['hits'])
+                misses.add_metric((name, tier), tier_stats['misses'])
+                size.add_metric((name, tier), tier_stats['size'])
+        yield from (hits, misses, size)
+
+        batch_size = HistogramMetricFamily('norma_micro_batch_size', 'Размер микробатча', labels=('scheduler',))
+        wait = HistogramMetricFamily('norma_micro_batch_wait_seconds', 'Время ожидания элемента в очереди микробатча',
+                                     labels=('scheduler',))
+        for name, scheduler in MicroBatchScheduler.registry.items():
+            _add_histogram(batch_size, name, scheduler.batch_sizes.snapshot(), scale=1)
+            _add_histogram(wait, name, scheduler.wait_times.snapshot(), scale=0.001)
+        yield from (batch_size, wait)
+
+
+def _add_histogram(family: HistogramMetricFamily, label: str, snapshot: dict, scale: float):
+    buckets = [(bound if bound == '+Inf' else str(float(bound) * scale), count)
+               for bound, count in snapshot['buckets'].items()]
+    family.add_metric((label,), buckets, snapshot['sum'] * scale)
+
+
+REGISTRY.register(StatsCollector())
+
+
+class MetricsMiddleware:
+    """
+        ASGI middleware, измеряющий время обработки запросов (вместе с передачей тела потокового ответа)
+        и количество обрабатываемых запросов. Пути, не относящиеся к маршрутам приложения, объединяются
+        в endpoint='other', чтобы не раздувать количество рядов.
+        """
+
+    def __init__(self, app):
+        self.app = app
+        self._paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        if self._paths is None:
+            self._paths = {route.path for route in scope['app'].routes}
+        endpoint = scope['path'] if scope['path'] in self._paths else 'other'
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(endpoint)
+        in_progress.inc()
+        start_time = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_LATENCY.labels(scope['method'], endpoint, str(status)).observe(time.perf_counter() - start_time)
+            in_progress.dec()
+
+
+def render() -> tuple:
+    """
+    Формирует ответ /metrics. Если задана переменная окружения PROMETHEUS_MULTIPROC_DIR (несколько воркеров),
+    метрики собираются из файлов всех процессов.
+
+    Returns:
+        tuple[bytes, str]: Тело ответа и его тип.
+    """
+
+    registry = REGISTRY
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        registry.register(StatsCollector())
+    return generate_latest(registry), CONTENT_TYPE_LATEST
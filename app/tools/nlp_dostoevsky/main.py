@@ -1,6 +1,11 @@
 from dostoevsky.tokenization import RegexTokenizer
 from dostoevsky.models import FastTextSocialNetworkModel
 
+from app.config import settings
+from app.tools import profiling
+from app.tools.batching import MicroBatchScheduler
+from app.tools.loading import LazyModel
+
 
 class NlpToolDostoevsky:
     """
@@ -9,12 +14,17 @@ class NlpToolDostoevsky:
         Атрибуты:
         ----------
         model : FastTextSocialNetworkModel
-            Экземпляр модели FastTextSocialNetworkModel для анализа текста.
+            Экземпляр модели FastTextSocialNetworkModel для анализа текста (загружается при первом обращении).
+        scheduler : MicroBatchScheduler
+            Планировщик, объединяющий одиночные тексты из параллельных запросов в один вызов model.predict.
 
         """
 
     __instance = {}
-    model = FastTextSocialNetworkModel(tokenizer=RegexTokenizer())
+    model = LazyModel('dostoevsky.model', lambda: FastTextSocialNetworkModel(tokenizer=RegexTokenizer()))
+    scheduler = MicroBatchScheduler('dostoevsky', lambda data: NlpToolDostoevsky._predict(data, k=5),
+                                    max_batch_size=settings.micro_batch_max_size,
+                                    max_wait_ms=settings.micro_batch_max_wait_ms)
 
     def __new__(cls):
         """
@@ -50,7 +60,9 @@ class NlpToolDostoevsky:
                     Словарь с результатами анализа, содержащий вероятности для каждого класса.
                 """
 
-        return cls.model.predict([text], k)[0]
+        if settings.micro_batching and k == 5:
+            return cls.scheduler(text)
+        return cls._predict([text], k)[0]
 
     @classmethod
     def analyze_list(cls, data: list, k=5):
@@ -70,6 +82,12 @@ class NlpToolDostoevsky:
                     Список словарей с результатами анализа для каждого текста, содержащий вероятности для каждого класса.
                 """
 
-        return cls.model.predict(data, k)
+        return cls._predict(data, k)
+
+    @classmethod
+    def _predict(cls, data: list, k=5):
+        with profiling.stage('fasttext'):
+            profiling.add('texts', len(data))
+            return cls.model.predict(data, k)
 
 
@@ -0,0 +1,61 @@
+import re
+
+
+class ArtifactScanner:
+    """
+        Поиск артефактов текста (ссылок, электронных адресов, телефонов) одним проходом по тексту.
+        Выражения всех видов объединены в одно скомпилированное выражение с именованными группами, поэтому
+        текст просматривается один раз, а не отдельным re.findall для каждого вида.
+
+        Виды проверяются в порядке PATTERNS: если фрагмент подходит под несколько видов, он относится к первому
+        (цифры внутри ссылки или электронного адреса не считаются телефоном).
+        """
+
+    PATTERNS = {
+        # То же множество символов, что и в прежнем выражении
+        # (?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|%[0-9a-fA-F]{2})+: диапазон $-_ включает цифры, заглавные буквы,
+        # @.&+*(),\ и %, поэтому оно сводится к одному классу символов
+        'LINKS': r'https?://[!$-_a-z]+',
+        'EMAILS': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+        'PHONES': r'\+?\d{1,3}[\s\d\-()]+\d{2,3}[\s\d\-()]+\d{2,3}',
+    }
+
+    # Все виды начинаются с печатного символа ASCII или цифры: проверка первого символа позволяет быстро
+    # пропускать кириллицу, пробелы и смайлики, не пробуя в каждой позиции все три выражения
+    PATTERN = re.compile(r'(?=[\d!-~])(?:%s)' % '|'.join(f'(?P<{name}>{pattern})'
+                                                        for name, pattern in PATTERNS.items()))
+
+    @staticmethod
+    def scan(text: str) -> dict:
+        """
+        Находит артефакты в тексте.
+
+        Args:
+            text (str): Текст для анализа.
+
+        Returns:
+            dict: Списки найденных фрагментов по видам (ключи PATTERNS) в порядке их появления в тексте.
+        """
+
+        result = {name: [] for name in ArtifactScanner.PATTERNS}
+        for match in ArtifactScanner.PATTERN.finditer(text):
+            result[match.lastgroup].append(match.group())
+        return result
+
+    @staticmethod
+    def group_spans(spans) -> dict:
+        """
+        Группирует нормальные формы именованных сущностей по типам за один проход.
+
+        Args:
+            spans (Iterable[natasha.doc.DocSpan]): Нормализованные именованные сущности документа.
+
+        Returns:
+            dict: Множества нормальных форм по типам сущностей (PER, LOC, ORG).
+        """
+
+        result = {}
+        for span in spans:
+            if span.type:
+                result.setdefault(span.type, set()).add(span.normal)
+        return result
@@ -0,0 +1,70 @@
+class FilterIndex:
+    """
+        Индекс фильтров по леммам: префиксное дерево (trie) последовательностей лемм фильтров.
+        Позволяет за один проход по леммам документа найти как отдельные слова, так и фразы из нескольких слов.
+
+        Атрибуты:
+        ----------
+        size : int
+            Количество фраз в индексе.
+        max_length : int
+            Длина самой длинной фразы в леммах.
+        """
+
+    END = None
+
+    def __init__(self, phrases):
+        self._trie = {}
+        self.size = 0
+        self.max_length = 0
+        for lemmas in phrases:
+            self.add(lemmas)
+
+    def add(self, lemmas):
+        """
+        Добавляет в индекс фразу, заданную последовательностью лемм.
+        """
+
+        lemmas = tuple(lemmas)
+        if not lemmas:
+            return
+        node = self._trie
+        for lemma in lemmas:
+            node = node.setdefault(lemma, {})
+        if FilterIndex.END not in node:
+            node[FilterIndex.END] = True
+            self.size += 1
+            self.max_length = max(self.max_length, len(lemmas))
+
+    def __len__(self):
+        return self.size
+
+    def match(self, lemmas: list) -> list:
+        """
+        Находит вхождения фраз индекса в последовательность лемм документа.
+        В каждой позиции выбирается самое длинное совпадение, после него поиск продолжается с конца совпадения.
+
+        Args:
+            lemmas (list): Леммы токенов документа.
+
+        Returns:
+            list: Пары (начало, конец) совпавших отрезков в индексах токенов.
+        """
+
+        matches = []
+        start = 0
+        while start < len(lemmas):
+            node = self._trie
+            end = None
+            for position in range(start, min(start + self.max_length, len(lemmas))):
+                node = node.get(lemmas[position])
+                if node is None:
+                    break
+                if FilterIndex.END in node:
+                    end = position + 1
+            if end is None:
+                start += 1
+            else:
+                matches.append((start, end))
+                start = end
+        return matches
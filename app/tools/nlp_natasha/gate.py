@@ -0,0 +1,217 @@
+import re
+
+from yargy.predicates.bank import DictionaryPredicate, TypePredicate, caseless, eq, gte, in_, in_caseless, lte
+from yargy.predicates.constructors import AndPredicate, OrPredicate
+from yargy.rule.bnf import BNFRule
+from yargy.tokenizer import INT, RUSSIAN
+
+from app.tools import profiling
+from app.tools.metrics import NATASHA_EXTRACTOR_TEXTS
+
+# Слово, которое токенизатор парсера разбирает pymorphy2 (токен типа RU)
+RUSSIAN_WORD = re.compile(r'[а-яё]+', re.IGNORECASE)
+
+
+def _predicate_anchors(predicate) -> set | None:
+    """
+    Возвращает якоря предиката yargy: ключи ('value', значение), ('lower', значение в нижнем регистре),
+    ('normal', нормальная форма) или ('int', минимум, максимум) - целое число в диапазоне (None - без границы),
+    хотя бы одному из которых соответствует любой подходящий токен. Если предикат не ограничивает токен
+    словарем или диапазоном (регистр, граммема, тип кроме INT), возвращает None.
+    """
+
+    if isinstance(predicate, eq):
+        return {('value', predicate.value)}
+    if isinstance(predicate, in_):
+        return {('value', value) for value in predicate.value}
+    if isinstance(predicate, caseless):
+        return {('lower', predicate.value)}
+    if isinstance(predicate, in_caseless):
+        return {('lower', value) for value in predicate.value}
+    if isinstance(predicate, DictionaryPredicate):
+        return {('normal', value) for value in predicate.value}
+    if isinstance(predicate, gte):
+        return {('int', predicate.value, None)}
+    if isinstance(predicate, lte):
+        return {('int', None, predicate.value)}
+    if isinstance(predicate, TypePredicate) and predicate.value == INT:
+        return {('int', None, None)}
+    if isinstance(predicate, AndPredicate):
+        parts = [_predicate_anchors(item) for item in predicate.predicates]
+        # Границы чисел из одного предиката объединяются в один диапазон (gte(1) & lte(31) - от 1 до 31)
+        ranges = [next(iter(part)) for part in parts if part and len(part) == 1 and next(iter(part))[0] == 'int']
+        if len(ranges) > 1:
+            lows = [low for _, low, _ in ranges if low is not None]
+            highs = [high for _, _, high in ranges if high is not None]
+            parts = [part for part in parts if not part or next(iter(part)) not in ranges]
+            parts.append({('int', max(lows, default=None), min(highs, default=None))})
+        return _best(parts)
+    if isinstance(predicate, OrPredicate):
+        parts = [_predicate_anchors(item) for item in predicate.predicates]
+        return None if any(part is None for part in parts) else set().union(*parts)
+    return None
+
+
+def _cost(key: tuple) -> int:
+    """
+    Оценка частоты якоря в обычных текстах: слова встречаются реже однобуквенных сокращений,
+    те - реже чисел, числа - реже знаков препинания.
+    """
+
+    if key[0] == 'int':
+        return 2
+    if not any(char.isalnum() for char in key[1]):
+        return 3
+    return 1 if len(key[1]) == 1 else 0
+
+
+def _best(options: list) -> set | None:
+    """
+    Выбирает из якорей обязательных элементов самые редкие (любой из них подходит, так как каждый
+    обязательный элемент присутствует в совпадении).
+    """
+
+    options = [option for option in options if option is not None]
+    if not options:
+        return None
+    return min(options, key=lambda option: (max(map(_cost, option)), len(option), _width(option)))
+
+
+def _width(anchors: set) -> int:
+    """
+    Суммарная ширина диапазонов чисел среди якорей: из равных по частоте якорей выбираются более узкие диапазоны.
+    """
+
+    return sum((key[2] if key[2] is not None else 10 ** 9) - (key[1] or 0) for key in anchors if key[0] == 'int')
+
+
+def _rule_anchors(rule: BNFRule, memo: dict, stack: set) -> set | None:
+    """
+    Возвращает якоря правила грамматики: объединение по вариантам (productions) якорей одного обязательного
+    элемента варианта. Если у какого-то варианта нет такого элемента (пустой вариант, только граммемы и т.п.),
+    правило может совпасть с любым текстом и возвращается None. Рекурсивное правило внутри самого себя
+    считается не имеющим якорей, поэтому выбирается другой элемент варианта.
+    """
+
+    key = id(rule)
+    if key in memo:
+        return memo[key]
+    if key in stack:
+        return None
+
+    stack.add(key)
+    anchors = set()
+    for production in rule.productions:
+        options = [_rule_anchors(term, memo, stack) if isinstance(term, BNFRule) else _predicate_anchors(term)
+                   for term in production.terms]
+        production_anchors = _best(options)
+        if production_anchors is None:
+            anchors = None
+            break
+        anchors |= production_anchors
+    stack.discard(key)
+    memo[key] = anchors
+    return anchors
+
+
+class GatedExtractor:
+    """
+        Экстрактор yargy с быстрой предварительной проверкой текста. Из грамматики экстрактора выводятся якоря:
+        слова, их нормальные формы и диапазоны чисел, хотя бы одно из которых обязательно входит в любое
+        совпадение (для дат - названия месяцев, "год", числа до 31 и годы; для адресов - "ул", "г", "д", "пр-т",
+        названия городов и регионов, номера домов и индексы). Если в тексте нет ни одного якоря, парсер
+        не запускается: результат совпадает с результатом экстрактора, но без разбора pymorphy2 и построения
+        таблицы разбора Эрли.
+
+        Проверка не разбирает слова pymorphy2. Текст делится на токены скомпилированным выражением
+        токенизатора парсера, а слова ищутся в множестве словоформ (без различия е и ё) всех лексем,
+        нормальные формы которых - якоря. Слово, известное словарю pymorphy2, имеет нормальную форму-якорь,
+        только если оно входит в такую лексему, поэтому разбор нужен лишь однобуквенным и неизвестным
+        словарю словам. Доля пропущенных текстов публикуется в метрике norma_natasha_extractor_texts_total.
+
+        Атрибуты:
+        ----------
+        name : str
+            Название экстрактора в метриках.
+        extractor : natasha.extractors.Extractor
+            Исходный экстрактор.
+        anchors : set | None
+            Якоря грамматики (None - грамматика может совпасть с текстом без якорей, проверка не выполняется).
+        """
+
+    def __init__(self, name: str, extractor):
+        self.name = name
+        self.extractor = extractor
+        self.anchors = _rule_anchors(extractor.parser.rule, {}, set())
+
+        tokenizer = extractor.parser.tokenizer
+        self._pattern, self._types, self._morph = tokenizer.regexp, tokenizer.mapping, tokenizer.morph
+
+        anchors = self.anchors or set()
+        self._ints = [(key[1] or 0, key[2]) for key in anchors if key[0] == 'int']
+        self._values = {key[1] for key in anchors if key[0] == 'value'}
+        self._lowers = {key[1] for key in anchors if key[0] == 'lower'}
+        self._normals = {key[1] for key in anchors if key[0] == 'normal'}
+        self._forms = self._lexeme_forms(self._morph.raw, self._normals)
+        self._run = NATASHA_EXTRACTOR_TEXTS.labels(name, 'run')
+        self._skipped = NATASHA_EXTRACTOR_TEXTS.labels(name, 'skipped')
+
+    @staticmethod
+    def _lexeme_forms(morph, normals: set) -> set:
+        """
+        Возвращает словоформы в нижнем регистре с заменой ё на е всех лексем pymorphy2, нормальная форма
+        которых входит в normals.
+        """
+
+        forms = set()
+        for normal in normals:
+            if not RUSSIAN_WORD.fullmatch(normal):
+                continue
+            for parse in morph.parse(normal):
+                if parse.normal_form.replace('ё', 'е') == normal.replace('ё', 'е'):
+                    forms.update(form.word.replace('ё', 'е') for form in parse.lexeme)
+        return forms
+
+    def _has_normal(self, word: str) -> bool:
+        """
+        Проверяет, может ли слово (токен типа RU) иметь нормальную форму-якорь.
+        """
+
+        lower = word.lower()
+        if lower.replace('ё', 'е') in self._forms:
+            return True
+        if len(lower) > 1 and self._morph.raw.word_is_known(lower):
+            return False
+        return not self._normals.isdisjoint(self._morph.normalized(word))
+
+    def has_anchors(self, text: str) -> bool:
+        """
+        Проверяет, есть ли в тексте якорь грамматики, то есть может ли экстрактор что-то найти.
+        """
+
+        if self.anchors is None:
+            return True
+
+        for match in self._pattern.finditer(text):
+            value, token_type = match.group(), self._types[match.lastgroup]
+            if token_type == INT and self._ints:
+                number = int(value)
+                if any(low <= number and (high is None or number <= high) for low, high in self._ints):
+                    return True
+            lower = value.lower()
+            if value in self._values or lower in self._lowers:
+                return True
+            if token_type == RUSSIAN:
+                if self._normals and self._has_normal(value):
+                    return True
+            elif lower in self._normals:
+                return True
+        return False
+
+    def __call__(self, text: str):
+        if not self.has_anchors(text):
+            self._skipped.inc()
+            profiling.add('skipped')
+            return []
+        self._run.inc()
+        return list(self.extractor(text))
@@ -1,75 +1,215 @@
-import re
-from concurrent.futures import ThreadPoolExecutor
-from natasha import NewsNERTagger, Doc, NewsEmbedding, Segmenter, NewsMorphTagger, NewsSyntaxParser, MorphVocab, \
+import copy
+from natasha import NewsNERTagger, Doc, NewsEmbedding, Segmenter, NewsMorphTagger, NewsSyntaxParser, \
     DatesExtractor, AddrExtractor
-from app.tools.nlp_natasha.models import NatashaArtifactsModel, NatashaMeaningfulModel, NatashaWordFiltersModel
+from natasha.doc import adapt_spans, inject_morph, inject_syntax, offset_syntax, sent_words
+from app.config import settings
+from app.tools import profiling
+from app.tools.cache import LRUCache, make_key
+from app.tools.loading import LazyModel
+from app.tools.memory import mmap_arrays
+from app.tools.metrics import NATASHA_STAGE_LATENCY, NATASHA_TOKENS
+from app.tools.nlp_natasha.artifacts import ArtifactScanner
+from app.tools.nlp_natasha.filters import FilterIndex
+from app.tools.nlp_natasha.gate import GatedExtractor
+from app.tools.nlp_natasha.vocab import CachedMorphVocab
+from app.tools.nlp_natasha.models import NatashaArtifactsModel, NatashaMeaningfulModel, NatashaWordFiltersModel, \
+    NatashaModel
 from app.utils import remove_emojis_and_punctuation
 
 
+def load_embedding() -> NewsEmbedding:
+    """
+    Загружает эмбеддинги Navec. Если задан settings.mmap_dir, самые большие массивы квантованных векторов
+    отображаются в память из файлов и разделяются всеми процессами на узле.
+    """
+
+    embedding = NewsEmbedding()
+    if settings.mmap_dir:
+        mmap_arrays(embedding.pq, ('indexes', 'norm', 'ab'), settings.mmap_dir, embedding.meta.id)
+    return embedding
+
+
+def gated(name: str, extractor):
+    """
+    Оборачивает экстрактор yargy предварительной проверкой ключевых слов грамматики (GatedExtractor),
+    если она включена в настройках.
+    """
+
+    return GatedExtractor(name, extractor) if settings.natasha_extractor_gate else extractor
+
+
 class NlpToolNatasha:
     """
         Класс предоставляет инструменты для обработки текста на русском языке с использованием библиотеки Natasha.
 
+        Модели загружаются при первом обращении к ним (см. LazyModel) или при подготовке приложения к работе.
+
         Атрибуты:
             embedding (NewsEmbedding): Модель эмбеддингов для новостей.
             segmenter (Segmenter): Сегментатор текста.
             morph_tagger (NewsMorphTagger): Морфологический тэггер.
-            morph_vocab (MorphVocab): Морфологический словарь.
+            morph_vocab (CachedMorphVocab): Морфологический словарь с кэшем лемм и известных слов.
             ner_tagger (NewsNERTagger): Тэггер именованных сущностей.
             syntax_parser (NewsSyntaxParser): Синтаксический парсер.
-            dates_extractor (DatesExtractor): Экстрактор дат.
-            address_extractor (AddrExtractor): Экстрактор адресов.
+            dates_extractor (GatedExtractor): Экстрактор дат с проверкой ключевых слов.
+            address_extractor (GatedExtractor): Экстрактор адресов с проверкой ключевых слов.
+            filter_indexes (LRUCache): Скомпилированные индексы фильтров по хэшу списка фильтров.
         """
 
     __instance = {}
-    embedding = NewsEmbedding()
-    segmenter = Segmenter()
-    morph_tagger = NewsMorphTagger(embedding)
-    morph_vocab = MorphVocab()
-    ner_tagger = NewsNERTagger(embedding)
-    syntax_parser = NewsSyntaxParser(embedding)
-    dates_extractor = DatesExtractor(morph_vocab)
-    address_extractor = AddrExtractor(morph_vocab)
+    embedding = LazyModel('natasha.embedding', load_embedding)
+    segmenter = LazyModel('natasha.segmenter', Segmenter)
+    morph_tagger = LazyModel('natasha.morph_tagger', lambda: NewsMorphTagger(NlpToolNatasha.embedding))
+    morph_vocab = LazyModel('natasha.morph_vocab', lambda: CachedMorphVocab(maxsize=settings.morph_cache_size))
+    ner_tagger = LazyModel('natasha.ner_tagger', lambda: NewsNERTagger(NlpToolNatasha.embedding))
+    syntax_parser = LazyModel('natasha.syntax_parser', lambda: NewsSyntaxParser(NlpToolNatasha.embedding))
+    dates_extractor = LazyModel('natasha.dates_extractor', lambda: gated('dates', DatesExtractor(NlpToolNatasha.morph_vocab)))
+    address_extractor = LazyModel('natasha.address_extractor',
+                                  lambda: gated('addresses', AddrExtractor(NlpToolNatasha.morph_vocab)))
+    filter_indexes = LRUCache('filter_index', maxsize=settings.filter_index_cache_size)
+
+    # Модели, которые загружаются при подготовке приложения (синтаксис и NER нужны не всегда и грузятся по требованию)
+    MODELS = ('segmenter', 'morph_tagger', 'morph_vocab', 'dates_extractor', 'address_extractor')
+
+    # Этапы обработки Doc и модели, которые им нужны
+    STAGES = {
+        'tag_morph': 'morph_tagger',
+        'tag_ner': 'ner_tagger',
+        'parse_syntax': 'syntax_parser',
+    }
+
+    # Виды анализа, выполняемые методом analyze
+    ANALYSES = ('artifacts', 'filters', 'meaningful')
+
+    # Типы именованных сущностей, которые Natasha находит в тексте
+    SPAN_TYPES = ('PER', 'LOC', 'ORG')
 
     def __init__(self, text):
 
         """
-        Инициализирует, и выполняет обработку текста :
+        Инициализирует обработку текста. Этапы выполняются лениво, при первом обращении к ним:
 
-        1. Создает объект Doc для текста.
-        2. Сегментирует текст.
-        3. Синтаксический анализ.
-        4. Распознавание именованных сущностей.
-        5. Морфологический анализ.
+        1. Создание объекта Doc и сегментация - при первом обращении к doc.
+        2. Морфологический анализ, распознавание именованных сущностей и синтаксический анализ - только
+           для методов, которым они нужны (см. _require).
 
         Args:
             text (str): Текст для обработки.
+        """
+        self.text = text
+        self._doc = None
+        self._stages = set()
+
+    @property
+    def doc(self) -> Doc:
+        """
+        Объект Doc для текста, сегментированный на предложения и токены.
+        """
+
+        if self._doc is None:
+            with profiling.stage('segment', NATASHA_STAGE_LATENCY.labels('segment')):
+                self._doc = Doc(self.text)
+                self._doc.segment(NlpToolNatasha.segmenter)
+        return self._doc
+
+    def _require(self, *stages: str) -> Doc:
+        """
+        Выполняет над Doc еще не выполненные этапы обработки.
+
+        Args:
+            *stages (str): Этапы из STAGES: 'tag_morph', 'tag_ner', 'parse_syntax'.
 
         Returns:
-            Doc: Объект Doc с выполненными этапами обработки.
+            Doc: Объект Doc с выполненными этапами.
         """
-        self.text = text
 
-        self.doc = Doc(self.text)
-        self.doc.segment(NlpToolNatasha.segmenter)
-        self.doc.parse_syntax(NlpToolNatasha.syntax_parser)
-        self.doc.tag_ner(NlpToolNatasha.ner_tagger)
-        self.doc.tag_morph(NlpToolNatasha.morph_tagger)
+        doc = self.doc
+        for stage in stages:
+            if stage not in self._stages:
+                with profiling.stage(stage, NATASHA_STAGE_LATENCY.labels(stage)):
+                    getattr(doc, stage)(getattr(NlpToolNatasha, NlpToolNatasha.STAGES[stage]))
+                self._stages.add(stage)
+        return doc
 
     @staticmethod
-    def _extract_phone_numbers(text):
-        phone_numbers = re.findall(r'\+?\d{1,3}[\s\d\-()]+\d{2,3}[\s\d\-()]+\d{2,3}', text)
-        return phone_numbers
+    def required_stages(filters: list | None = None, analyses=None) -> tuple:
+        """
+        Возвращает этапы Doc, которые понадобятся для видов анализа analyses с фильтрами filters.
+        """
+
+        if analyses is None:
+            analyses = NlpToolNatasha.ANALYSES
+        stages = []
+        if 'artifacts' in analyses and NlpToolNatasha._needs_spans():
+            stages += ['tag_morph', 'tag_ner', 'parse_syntax']
+        elif 'filters' in analyses and NlpToolNatasha.compile_filters(filters or []):
+            stages.append('tag_morph')
+        return tuple(stages)
 
     @staticmethod
-    def _extract_emails(text):
-        emails = re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text)
-        return emails
+    def _needs_spans() -> bool:
+        # Сейчас NatashaArtifactsModel не содержит полей PER/LOC/ORG, и функция всегда возвращает False:
+        # NER, морфология и синтаксис для артефактов не выполняются. Ветки для именованных сущностей
+        # (required_stages, artifacts) и пакетный NER _tag_ner_many оставлены намеренно - они включатся сами,
+        # когда такие поля появятся в модели ответа; _tag_ner_many проверяется тестом test_natasha_batch.
+        return any(span_type in NatashaArtifactsModel.__fields__ for span_type in NlpToolNatasha.SPAN_TYPES)
+
+    @staticmethod
+    def _batched(model):
+        """
+        Возвращает копию модели slovnet (с общими весами) с размером батча для пакетного анализа.
+        """
+
+        model = copy.copy(model)
+        model.batch_size = settings.natasha_batch_size
+        return model
+
+    @staticmethod
+    def run_stages(tools: list, *stages: str):
+        """
+        Выполняет этапы Doc сразу для нескольких текстов: предложения всех текстов (для NER - тексты целиком)
+        сортируются по длине и размечаются общими батчами slovnet, результаты раскладываются обратно по текстам.
+        Тексты, для которых этап уже выполнен, пропускаются.
+
+        Args:
+            tools (list[NlpToolNatasha]): Обрабатываемые тексты.
+            *stages (str): Этапы из STAGES.
+        """
+
+        for stage in stages:
+            pending = [tool for tool in tools if stage not in tool._stages]
+            if not pending:
+                continue
+
+            with profiling.stage(stage):
+                model = NlpToolNatasha._batched(getattr(NlpToolNatasha, NlpToolNatasha.STAGES[stage]))
+                if stage == 'tag_ner':
+                    NlpToolNatasha._tag_ner_many(model, pending)
+                else:
+                    sents = [(tool, sent_id, sent) for tool in pending
+                             for sent_id, sent in enumerate(tool.doc.sents, 1) if sent.tokens]
+                    sents.sort(key=lambda item: len(item[2].tokens))
+                    markups = model.map([sent_words(sent) for _, _, sent in sents])
+                    for (tool, sent_id, sent), markup in zip(sents, markups):
+                        if stage == 'tag_morph':
+                            inject_morph(sent.tokens, markup.tokens)
+                        else:
+                            inject_syntax(sent.tokens, markup.tokens)
+                            offset_syntax(sent_id, sent.tokens)
+                profiling.add('texts', len(pending))
+
+            for tool in pending:
+                tool._stages.add(stage)
 
     @staticmethod
-    def _extract_urls(text):
-        urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', text)
-        return urls
+    def _tag_ner_many(model, tools: list):
+        for tool in tools:
+            tool.doc.spans = []
+        tools = sorted((tool for tool in tools if tool.text.strip()), key=lambda tool: len(tool.text))
+        for tool, markup in zip(tools, model.map([tool.text for tool in tools])):
+            tool.doc.spans = list(adapt_spans(tool.doc, markup.spans))
+            tool.doc.envelop_span_tokens()
+            tool.doc.envelop_sent_spans()
 
     def artifacts(self) -> NatashaArtifactsModel:
         """
@@ -83,57 +223,86 @@ class NlpToolNatasha:
                 NatashaArtifactsModel: извлеченные артефакты из текста
             """
 
-        # Параллельная нормализация span'ов
-        with ThreadPoolExecutor() as executor:
-            executor.map(lambda span: span.normalize(NlpToolNatasha.morph_vocab), self.doc.spans)
+        result = {}
+
+        # Именованные сущности (NER, морфология и синтаксис для нормализации) нужны, только если модель ответа их содержит
+        if NlpToolNatasha._needs_spans():
+            doc = self._require('tag_morph', 'tag_ner', 'parse_syntax')
 
-        # Более эффективная генерация записей с использованием списковых включений
-        result = {record.type: set(record.normal for record in self.doc.spans if record.type) for record in self.doc.spans}
+            with profiling.stage('normalize'):
+                for span in doc.spans:
+                    span.normalize(NlpToolNatasha.morph_vocab)
 
-        # Параллельное извлечение дат и адресов
-        with ThreadPoolExecutor() as executor:
-            result["DATES"] = list(executor.map(lambda x: x.fact, NlpToolNatasha.dates_extractor(self.text)))
-            result["ADDR"] = list(executor.map(lambda x: x.fact, NlpToolNatasha.address_extractor(self.text)))
+            result = ArtifactScanner.group_spans(doc.spans)
 
-        result["PHONES"] = NlpToolNatasha._extract_phone_numbers(self.text)
-        result["EMAILS"] = NlpToolNatasha._extract_emails(self.text)
-        result["LINKS"] = NlpToolNatasha._extract_urls(self.text)
+        # Извлечение дат и адресов (yargy работает на чистом Python, потоки из-за GIL не ускоряют его);
+        # тексты без ключевых слов грамматик пропускаются без разбора
+        with profiling.stage('dates'):
+            result["DATES"] = [match.fact for match in NlpToolNatasha.dates_extractor(self.text)]
+        with profiling.stage('addresses'):
+            result["ADDR"] = [match.fact for match in NlpToolNatasha.address_extractor(self.text)]
+
+        with profiling.stage('regex'):
+            result.update(ArtifactScanner.scan(self.text))
 
         result = {key: value for key, value in result.items() if value}
 
         return NatashaArtifactsModel(**result)
 
-    def word_filters(self, filters: list) -> NatashaWordFiltersModel:
+    @staticmethod
+    def compile_filters(filters: list) -> FilterIndex:
         """
-            Метод для фильтрации текста на основе заданных фильтров по леммам.
+            Компилирует список фильтров (слов и фраз) в индекс лемм. Фразы токенизируются и размечаются
+            морфологическим тэггером одним батчем. Индекс кэшируется по хэшу списка фильтров.
 
             Args:
-                text (str): Текст для фильтрации.
                 filters (list): Список фильтров.
 
             Returns:
-                NatashaWordFiltersModel: Результат фильтрации, содержащий информацию о прохождении и непрошедших токенах.
+                FilterIndex: Индекс лемм фильтров.
             """
 
-        forbidden_lemmas = []
-        for word in filters:
-            doc_for_filter = NlpToolNatasha(word).doc
+        phrases = sorted({str(phrase) for phrase in filters})
+        key = make_key('\x00'.join(phrases))
+        index = NlpToolNatasha.filter_indexes.get(key)
+        if index is not None:
+            return index
+
+        words = [[token.text for token in NlpToolNatasha.segmenter.tokenize(phrase)] for phrase in phrases]
+        words = [phrase_words for phrase_words in words if phrase_words]
+        markups = NlpToolNatasha.morph_tagger.map(words) if words else []
+        index = FilterIndex(
+            [NlpToolNatasha.morph_vocab.lemmatize(token.text, token.pos, token.feats) for token in markup.tokens]
+            for markup in markups
+        )
+        NlpToolNatasha.filter_indexes.set(key, index)
+        return index
 
-            for token in doc_for_filter.tokens:
-                token.lemmatize(NlpToolNatasha.morph_vocab)
+    def word_filters(self, filters: list) -> NatashaWordFiltersModel:
+        """
+            Метод для фильтрации текста на основе заданных фильтров по леммам. Фильтр из нескольких слов
+            срабатывает, если леммы его слов идут в тексте подряд.
 
-            forbidden_lemmas.append(doc_for_filter.tokens[0].lemma)
+            Args:
+                filters (list): Список фильтров.
 
-        for token in self.doc.tokens:
-            token.lemmatize(NlpToolNatasha.morph_vocab)
+            Returns:
+                NatashaWordFiltersModel: Результат фильтрации, содержащий информацию о прохождении и непрошедших токенах.
+            """
 
-        forbidden = []
+        index = NlpToolNatasha.compile_filters(filters)
+        if not index:
+            return NatashaWordFiltersModel(passed=True, tokens=[])
 
-        for token in self.doc.tokens:
-            if token.lemma in forbidden_lemmas:
-                forbidden.append(token.text)
+        doc = self._require('tag_morph')
+        for token in doc.tokens:
+            token.lemmatize(NlpToolNatasha.morph_vocab)
 
-        return NatashaWordFiltersModel(passed=len(forbidden) == 0, tokens=set(forbidden))
+        forbidden = set()
+        for start, end in index.match([token.lemma for token in doc.tokens]):
+            forbidden.add(self.text[doc.tokens[start].start:doc.tokens[end - 1].stop])
+
+        return NatashaWordFiltersModel(passed=len(forbidden) == 0, tokens=forbidden)
 
     def meaningful_text(self) -> NatashaMeaningfulModel:
         """
@@ -159,3 +328,52 @@ class NlpToolNatasha:
 
         return NatashaMeaningfulModel(meaningful=True, natasha_model_count_tokens=len(self.doc.tokens))
 
+    def analyze(self, filters: list | None = None, analyses=None) -> NatashaModel:
+        """
+        Выполняет запрошенные виды анализа текста.
+
+        Args:
+            filters (list | None): Список фильтров для word_filters.
+            analyses (Iterable[str] | None): Виды анализа из ANALYSES (по умолчанию все).
+
+        Returns:
+            NatashaModel: Результаты запрошенных видов анализа и количество токенов.
+        """
+
+        if analyses is None:
+            analyses = NlpToolNatasha.ANALYSES
+
+        result = {}
+        if 'artifacts' in analyses:
+            with profiling.stage('artifacts', NATASHA_STAGE_LATENCY.labels('artifacts')):
+                result['artifacts'] = self.artifacts()
+        if 'filters' in analyses:
+            with profiling.stage('filters', NATASHA_STAGE_LATENCY.labels('filters')):
+                result['filters'] = self.word_filters(filters or [])
+        if 'meaningful' in analyses:
+            with profiling.stage('meaningful', NATASHA_STAGE_LATENCY.labels('meaningful')):
+                result.update(self.meaningful_text().dict())
+        else:
+            result['natasha_model_count_tokens'] = len(self.doc.tokens)
+        NATASHA_TOKENS.observe(result['natasha_model_count_tokens'])
+        profiling.add('tokens', result['natasha_model_count_tokens'])
+        return NatashaModel(**result)
+
+    @staticmethod
+    def analyze_many(texts: list, filters: list | None = None, analyses=None) -> list:
+        """
+        Выполняет запрошенные виды анализа для списка текстов. Этапы разметки slovnet выполняются для всех
+        текстов общими батчами (см. run_stages), затем каждый текст анализируется как в analyze.
+
+        Args:
+            texts (list): Тексты для анализа.
+            filters (list | None): Список фильтров для word_filters.
+            analyses (Iterable[str] | None): Виды анализа из ANALYSES (по умолчанию все).
+
+        Returns:
+            list[NatashaModel]: Результаты в порядке текстов.
+        """
+
+        tools = [NlpToolNatasha(text) for text in texts]
+        NlpToolNatasha.run_stages(tools, *NlpToolNatasha.required_stages(filters, analyses))
+        return [tool.analyze(filters, analyses) for tool in tools]
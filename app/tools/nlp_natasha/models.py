@@ -19,8 +19,8 @@ class NatashaMeaningfulModel(BaseModel):
 
 
 class NatashaModel(BaseModel):
-    artifacts: NatashaArtifactsModel
-    filters: NatashaWordFiltersModel
-    meaningful: bool
-    natasha_model_count_tokens: int
+    artifacts: NatashaArtifactsModel | None = None
+    filters: NatashaWordFiltersModel | None = None
+    meaningful: bool | None = None
+    natasha_model_count_tokens: int | None = None
 
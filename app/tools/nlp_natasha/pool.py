@@ -0,0 +1,122 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi.encoders import jsonable_encoder
+
+from app.tools.nlp_natasha.main import NlpToolNatasha
+from app.tools.nlp_natasha.models import NatashaModel
+
+
+WARMUP_TEXT = 'Встреча 1 января 2024 года в Москве на улице Ленина, дом 5. Пишите на https://example.com'
+
+
+def _warmup():
+    """
+    Инициализатор процесса пула: модели NlpToolNatasha (LazyModel) загружаются при первом обращении,
+    то есть этим прогоном текста, который заодно прогревает кэши и грамматики.
+    """
+
+    NlpToolNatasha(WARMUP_TEXT).analyze(['встреча'])
+
+
+def _ping(_) -> int:
+    return os.getpid()
+
+
+def _analyze(text: str, filters: tuple, analyses: tuple) -> dict:
+    """
+    Выполняет анализ в процессе пула. Результат возвращается в компактном виде - словарем встроенных типов,
+    без объектов pydantic и записей Natasha.
+    """
+
+    return jsonable_encoder(NlpToolNatasha(text).analyze(list(filters), analyses))
+
+
+def _analyze_many(texts: list, filters: tuple, analyses: tuple) -> list:
+    return jsonable_encoder(NlpToolNatasha.analyze_many(texts, list(filters), analyses))
+
+
+class NatashaPool:
+    """
+        Долгоживущий пул процессов для анализа текста с помощью Natasha. Токенизация, разметка slovnet и разбор
+        грамматик yargy выполняются на чистом Python и в одном процессе упираются в GIL, пул распределяет их
+        по ядрам. Модели загружаются в каждый процесс один раз инициализатором _warmup при запуске процесса.
+
+        Атрибуты:
+        ----------
+        processes : int
+            Количество процессов (по умолчанию - количество ядер).
+        start_method : str
+            Способ запуска процессов multiprocessing: 'spawn', 'forkserver' или 'fork'.
+        """
+
+    # Минимальное количество текстов в части списка, отправляемой в один процесс
+    MIN_CHUNK = 16
+
+    def __init__(self, processes: int | None = None, start_method: str = 'spawn'):
+        self.processes = processes or os.cpu_count() or 1
+        self.start_method = start_method
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(self.processes,
+                                                         mp_context=multiprocessing.get_context(self.start_method),
+                                                         initializer=_warmup)
+        return self._executor
+
+    def start(self) -> list:
+        """
+        Запускает все процессы пула и дожидается загрузки в них моделей.
+
+        Returns:
+            list: Идентификаторы процессов пула.
+        """
+
+        executor = self._get_executor()
+        return sorted(set(executor.map(_ping, range(self.processes))))
+
+    def analyze(self, text: str, filters: list | None = None, analyses=None) -> NatashaModel:
+        """
+        Выполняет анализ текста в одном из процессов пула (см. NlpToolNatasha.analyze).
+        """
+
+        analyses = tuple(analyses if analyses is not None else NlpToolNatasha.ANALYSES)
+        try:
+            result = self._get_executor().submit(_analyze, text, tuple(filters or ()), analyses).result()
+        except BrokenProcessPool:
+            # Процесс пула завершился аварийно: следующий вызов создаст новый пул
+            self.shutdown(wait=False)
+            raise
+        return NatashaModel.parse_obj(result)
+
+    def analyze_many(self, texts: list, filters: list | None = None, analyses=None) -> list:
+        """
+        Выполняет пакетный анализ списка текстов (см. NlpToolNatasha.analyze_many): список делится на непрерывные
+        части по числу процессов, но не меньше MIN_CHUNK текстов в части, чтобы батчи slovnet оставались большими.
+        """
+
+        analyses = tuple(analyses if analyses is not None else NlpToolNatasha.ANALYSES)
+        parts = max(1, min(self.processes, len(texts) // self.MIN_CHUNK))
+        size = -(-len(texts) // parts)
+        executor = self._get_executor()
+        try:
+            futures = [executor.submit(_analyze_many, texts[start:start + size], tuple(filters or ()), analyses)
+                       for start in range(0, len(texts), size)]
+            results = [item for future in futures for item in future.result()]
+        except BrokenProcessPool:
+            self.shutdown(wait=False)
+            raise
+        return [NatashaModel.parse_obj(result) for result in results]
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
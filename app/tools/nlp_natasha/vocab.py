@@ -0,0 +1,39 @@
+from natasha import MorphVocab
+
+from app.tools.cache import LRUCache
+
+
+class CachedMorphVocab(MorphVocab):
+    """
+        Морфологический словарь с общим ограниченным кэшем лемматизации и проверки известности слов.
+        Лемма кэшируется по словоформе, части речи и граммемам, известность слова - по словоформе.
+        Обе операции вытесняются из одного LRU кэша, его статистика публикуется под именем name.
+
+        Атрибуты:
+        ----------
+        memo : LRUCache
+            Кэш результатов лемматизации и проверки известности слов.
+        """
+
+    def __init__(self, name: str = 'morph_vocab', maxsize: int = 100000):
+        MorphVocab.__init__(self)
+        self.memo = LRUCache(name, maxsize=maxsize)
+
+    def __repr__(self):
+        return '%s()' % self.__class__.__name__
+
+    def lemmatize(self, word, pos, feats):
+        key = ('lemma', word, pos, tuple(sorted(feats.items())) if feats else None)
+        lemma = self.memo.get(key)
+        if lemma is None:
+            lemma = MorphVocab.lemmatize(self, word, pos, feats)
+            self.memo.set(key, lemma)
+        return lemma
+
+    def word_is_known(self, word, strict=False):
+        key = ('known', word, strict)
+        known = self.memo.get(key)
+        if known is None:
+            known = MorphVocab.word_is_known(self, word, strict)
+            self.memo.set(key, known)
+        return known
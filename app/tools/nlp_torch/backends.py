@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+import torch
+from transformers import AutoModelForSequenceClassification
+
+from app.config import settings
+
+try:
+    import onnxruntime
+except ImportError:  # onnxruntime нужен только для бэкенда 'onnx'
+    onnxruntime = None
+
+
+class InferenceBackend:
+    """
+        Интерфейс бэкенда инференса модели классификации последовательностей.
+
+        Бэкенд получает батч идентификаторов токенов и маску внимания в виде массивов NumPy (int64)
+        и возвращает логиты модели размерности (размер батча, количество классов).
+
+        Атрибуты:
+        ----------
+        name : str
+            Название бэкенда, под которым он выбирается в настройках.
+        model_name_or_path : str
+            Имя модели или путь к модели.
+        """
+
+    name = ''
+
+    def __init__(self, model_name_or_path: str):
+        self.model_name_or_path = model_name_or_path
+
+    def predict_logits(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        pass
+
+
+class TorchBackend(InferenceBackend):
+    """
+        Инференс в PyTorch с динамическим квантованием линейных слоев в int8.
+        """
+
+    name = 'torch'
+
+    def __init__(self, model_name_or_path: str):
+        super().__init__(model_name_or_path)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name_or_path)
+        self.model.eval()
+
+        #Квантование модели для ускорения инференса
+        self.model = torch.quantization.quantize_dynamic(
+            self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def predict_logits(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            return self.model(input_ids=torch.from_numpy(input_ids).to(self.model.device),
+                              attention_mask=torch.from_numpy(attention_mask).to(self.model.device)).logits.cpu().numpy()
+
+
+class OnnxBackend(InferenceBackend):
+    """
+        Инференс в ONNX Runtime на CPU по модели, экспортированной и квантованной в int8
+        командой python -m app.tools.nlp_torch.export.
+
+        Атрибуты:
+        ----------
+        path : str
+            Путь к файлу модели ONNX.
+        session : onnxruntime.InferenceSession
+            Сессия ONNX Runtime.
+        """
+
+    name = 'onnx'
+
+    def __init__(self, model_name_or_path: str, path: str | None = None):
+        super().__init__(model_name_or_path)
+        if onnxruntime is None:
+            raise RuntimeError("Для бэкенда 'onnx' требуется пакет onnxruntime")
+
+        self.path = path or onnx_model_path(model_name_or_path)
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Модель ONNX не найдена: {self.path}. "
+                                    f"Выполните python -m app.tools.nlp_torch.export --model {model_name_or_path}")
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if settings.onnx_threads:
+            options.intra_op_num_threads = settings.onnx_threads
+        self.session = onnxruntime.InferenceSession(self.path, options, providers=['CPUExecutionProvider'])
+        self._inputs = {item.name for item in self.session.get_inputs()}
+
+    def predict_logits(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        feed = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self._inputs:
+            feed['token_type_ids'] = np.zeros_like(input_ids)
+        return self.session.run(['logits'], feed)[0]
+
+
+BACKENDS = {backend.name: backend for backend in (TorchBackend, OnnxBackend)}
+
+
+def onnx_model_path(model_name_or_path: str, quantized: bool = True) -> str:
+    """
+        Возвращает путь к файлу модели ONNX в каталоге settings.onnx_model_dir.
+
+        Args:
+            model_name_or_path (str): Имя модели или путь к модели.
+            quantized (bool): Путь к модели, квантованной в int8 (иначе - к исходной модели в float32).
+
+        Returns:
+            str: Путь к файлу модели.
+        """
+
+    name = model_name_or_path.strip('/').replace('/', '__')
+    return os.path.join(settings.onnx_model_dir, name, 'model.int8.onnx' if quantized else 'model.onnx')
+
+
+def create_backend(name: str, model_name_or_path: str) -> InferenceBackend:
+    """
+        Создает бэкенд инференса по названию из BACKENDS.
+
+        Raises:
+            ValueError: Если бэкенд с таким названием не существует.
+        """
+
+    if name not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд инференса: {name}. Доступны: {', '.join(BACKENDS)}")
+    return BACKENDS[name](model_name_or_path)
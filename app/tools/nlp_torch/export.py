@@ -0,0 +1,122 @@
+"""
+Экспорт модели классификации в ONNX с квантованием в int8 для бэкенда 'onnx' и проверка совпадения
+вероятностей с бэкендом 'torch'.
+
+Модель берется из локального кэша Hugging Face (без обращения к сети), результат сохраняется
+в каталог settings.onnx_model_dir (NORMA_ONNX_MODEL_DIR) или по пути --output.
+
+Запуск:
+    python -m app.tools.nlp_torch.export --model cointegrated/rubert-tiny-toxicity
+    python -m app.tools.nlp_torch.export --check-only
+"""
+import argparse
+import inspect
+import os
+import sys
+
+import numpy as np
+import torch
+from transformers import AutoModelForSequenceClassification
+
+from app.tools.nlp_torch.backends import OnnxBackend, onnx_model_path
+from app.tools.nlp_torch.main import NlpToolTorch
+
+
+PARITY_TEXTS = [
+    'Это пример для анализа текста',
+    'Сердце красавицы склонно к измене и перемене... Раз, два, три, даю пробу.',
+    'Экзамен...для меня...всегда праздник, профессор.',
+    'Эта усталость уже измотала. Хочется спать, но не получается. Хочется расслабиться, но постоянно что-то '
+    'тревожит. Такое может свести с ума. ' * 8,
+    'wef3egf34g',
+    '',
+]
+
+
+class _LogitsModel(torch.nn.Module):
+    """
+    Обертка модели с выходом только logits - для экспорта графа с одним именованным выходом.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+
+
+def export(model_name_or_path: str, output: str, opset: int = 14) -> str:
+    """
+    Экспортирует модель в ONNX (float32) и квантует веса в int8 динамическим квантованием ONNX Runtime.
+
+    Returns:
+        str: Путь к квантованной модели.
+    """
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    model = AutoModelForSequenceClassification.from_pretrained(model_name_or_path, local_files_only=True)
+    model.eval()
+
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    fp32_path = os.path.join(os.path.dirname(output), 'model.onnx')
+    input_ids = torch.ones((2, 16), dtype=torch.long)
+    attention_mask = torch.ones((2, 16), dtype=torch.long)
+    # Новые версии torch по умолчанию экспортируют через dynamo (нужен onnxscript), используется TorchScript-экспорт
+    options = {'dynamo': False} if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(_LogitsModel(model), (input_ids, attention_mask), fp32_path,
+                          input_names=['input_ids', 'attention_mask'], output_names=['logits'],
+                          dynamic_axes={'input_ids': {0: 'batch', 1: 'sequence'},
+                                        'attention_mask': {0: 'batch', 1: 'sequence'},
+                                        'logits': {0: 'batch'}},
+                          opset_version=opset, **options)
+
+    quantize_dynamic(fp32_path, output, weight_type=QuantType.QInt8)
+    return output
+
+
+def check_parity(model_name_or_path: str, path: str, atol: float) -> float:
+    """
+    Сравнивает вероятности бэкендов 'onnx' и 'torch' на контрольных текстах (включая длинный текст,
+    разбиваемый на фрагменты).
+
+    Returns:
+        float: Максимальное абсолютное расхождение вероятностей.
+    """
+
+    # Один экземпляр без планировщика: модель torch загружается один раз, а планировщик работающего
+    # экземпляра той же модели не заменяется в статистике
+    tool = NlpToolTorch(model_name_or_path, backend='torch', micro_batching=False)
+    expected, expected_tokens = tool.predict_probabilities(PARITY_TEXTS)
+    tool.backend = OnnxBackend(model_name_or_path, path=path)
+    actual, actual_tokens = tool.predict_probabilities(PARITY_TEXTS)
+    if expected_tokens != actual_tokens:
+        raise AssertionError('Количество токенов не совпадает')
+
+    max_diff = max(float(np.abs(np.stack(a if isinstance(a, list) else [a]) -
+                                np.stack(e if isinstance(e, list) else [e])).max())
+                   for a, e in zip(actual, expected))
+    print(f'Максимальное расхождение вероятностей onnx/torch: {max_diff:.4f} (допуск {atol})')
+    return max_diff
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='cointegrated/rubert-tiny-toxicity')
+    parser.add_argument('--output', help='Путь к квантованной модели (по умолчанию в NORMA_ONNX_MODEL_DIR)')
+    parser.add_argument('--opset', type=int, default=14)
+    parser.add_argument('--atol', type=float, default=0.05, help='Допустимое расхождение вероятностей с torch')
+    parser.add_argument('--check-only', action='store_true', help='Только проверить уже экспортированную модель')
+    args = parser.parse_args(argv)
+
+    output = args.output or onnx_model_path(args.model)
+    if not args.check_only:
+        export(args.model, output, args.opset)
+        print(f'Модель сохранена: {output}')
+    return 0 if check_parity(args.model, output, args.atol) <= args.atol else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,16 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from transformers import AutoTokenizer
+import numpy as np
 import torch
 
+from app.config import settings
+from app.tools import profiling
+from app.tools.batching import MicroBatchScheduler
+from app.tools.metrics import TOXICITY_CHUNKS, TOXICITY_TOKENS
+from app.tools.nlp_torch.backends import InferenceBackend, create_backend
+
 
 # Установка количества потоков
-torch.set_num_threads(4)
+torch.set_num_threads(settings.torch_threads)
 
 
 class NlpToolTorch:
@@ -16,11 +23,16 @@ class NlpToolTorch:
         Имя модели или путь к модели, используемой для предсказаний.
     tokenizer : AutoTokenizer
         Токенизатор, используемый для преобразования текста в токены.
-    model : AutoModelForSequenceClassification
-        Модель для классификации последовательностей, используемая для предсказаний.
+    backend : InferenceBackend
+        Бэкенд инференса модели ('torch' или 'onnx').
+    batch_size : int
+        Количество фрагментов текста в одном прямом проходе модели.
+    scheduler : MicroBatchScheduler | None
+        Планировщик, объединяющий одиночные тексты из параллельных запросов в микробатчи.
     """
 
-    def __init__(self, model_name_or_path):
+    def __init__(self, model_name_or_path, batch_size: int | None = None, backend: str | None = None,
+                 micro_batching: bool = True):
         """
         Инициализирует экземпляр класса NlpToolTorch с заданной моделью.
 
@@ -28,16 +40,25 @@ class NlpToolTorch:
         ----------
         model_name_or_path : str
             Имя модели или путь к модели, используемой для предсказаний.
+        batch_size : int, optional
+            Размер батча для инференса (по умолчанию берется из настроек).
+        backend : str, optional
+            Бэкенд инференса (по умолчанию берется из настроек).
+        micro_batching : bool, optional
+            Создать планировщик микробатчей (он публикуется в статистике под именем модели и заменяет
+            планировщик другого экземпляра той же модели; отключается для вспомогательных экземпляров).
         """
 
         self.model_name_or_path = model_name_or_path
+        self.batch_size = batch_size or settings.torch_batch_size
         self.tokenizer = AutoTokenizer.from_pretrained(model_name_or_path)
-        self.model = AutoModelForSequenceClassification.from_pretrained(model_name_or_path)
-        self.model.eval()
+        self.backend: InferenceBackend = create_backend(backend or settings.torch_backend, model_name_or_path)
 
-        #Квантование модели для ускорения инференса
-        self.model = torch.quantization.quantize_dynamic(
-            self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.scheduler = None
+        if micro_batching:
+            self.scheduler = MicroBatchScheduler(model_name_or_path, self._predict_scheduled,
+                                                 max_batch_size=settings.micro_batch_max_size,
+                                                 max_wait_ms=settings.micro_batch_max_wait_ms)
 
     def predict_probabilities(self, text):
         """
@@ -52,28 +73,140 @@ class NlpToolTorch:
         ----------
         tuple
             - numpy.ndarray или list of numpy.ndarray: Вероятности для каждого текста.
-            - int: Количество токенов в тексте.
+            - int или list of int: Количество токенов в тексте (для списка - в каждом тексте).
         """
 
         if isinstance(text, str):
+            if settings.micro_batching and self.scheduler is not None:
+                return self.scheduler(text)
             proba, num_tokens = self._split_for_token(text=text)
             return proba, num_tokens
         elif isinstance(text, list):
-            num_tokens = 0
-            all_proba = []
-            for item in text:
-                item_result, num_tokens = self._split_for_token(text=item)
-                all_proba.append(item_result)
-            return all_proba, num_tokens
+            return self._predict_batch(text)
 
-    def _process_chunk(self, text: str):
+    def _predict_batch(self, texts: list, max_length=112):
         """
-        Обрабатывает один фрагмент текста и возвращает вероятности .
+        Предсказывает вероятности для списка текстов батчами.
+
+        Тексты токенизируются один раз, длинные тексты разбиваются на фрагменты по токенам.
+        Все фрагменты сортируются по длине и группируются в батчи размера batch_size,
+        для каждого батча выполняется один прямой проход модели.
+        Результаты возвращаются в исходном порядке текстов.
 
         Параметры:
         ----------
-        text : str
-            Фрагмент текста для обработки.
+        texts : list
+            Список текстов для предсказания.
+        max_length : int, optional
+            Максимальная длина фрагмента в токенах (по умолчанию 112).
+
+        Возвращает:
+        ----------
+        tuple
+            - list: Для каждого текста numpy.ndarray, либо list of numpy.ndarray, если текст был разбит на фрагменты.
+            - list of int: Количество токенов в каждом тексте.
+        """
+
+        with profiling.stage('tokenize'):
+            encoded = self._encode(texts)
+
+        chunk_ids, owners = [], []
+        chunked, num_tokens = [], []
+        with profiling.stage('split'):
+            for index, tokens in enumerate(encoded):
+                chunks = self._split_tokens(tokens, max_length=max_length)
+                num_tokens.append(len(tokens))
+                chunked.append(len(chunks) > 1)
+                TOXICITY_TOKENS.observe(len(tokens))
+                TOXICITY_CHUNKS.observe(len(chunks))
+                chunk_ids.extend(chunks)
+                owners.extend([index] * len(chunks))
+        profiling.add('texts', len(texts))
+        profiling.add('chunks', len(chunk_ids))
+        profiling.add('tokens', sum(num_tokens))
+
+        proba = self._process_sorted(chunk_ids)
+
+        all_proba = [[] for _ in texts]
+        for owner, item_proba in zip(owners, proba):
+            all_proba[owner].append(item_proba)
+        return [item if is_chunked else item[0] for item, is_chunked in zip(all_proba, chunked)], num_tokens
+
+    def _predict_scheduled(self, texts: list) -> list:
+        """
+        Обрабатывает микробатч одиночных текстов от планировщика.
+
+        Возвращает:
+        ----------
+        list of tuple
+            Пары (вероятности, количество токенов) для каждого текста.
+        """
+
+        proba, num_tokens = self._predict_batch(texts)
+        return list(zip(proba, num_tokens))
+
+    def _process_sorted(self, chunks: list):
+        """
+        Обрабатывает фрагменты батчами, предварительно отсортировав их по длине,
+        чтобы минимизировать паддинг внутри батча.
+
+        Параметры:
+        ----------
+        chunks : list of list of int
+            Идентификаторы токенов каждого фрагмента (со служебными токенами).
+
+        Возвращает:
+        ----------
+        list of numpy.ndarray
+            Вероятности для каждого фрагмента в исходном порядке.
+        """
+
+        order = sorted(range(len(chunks)), key=lambda index: len(chunks[index]))
+        result = [None] * len(chunks)
+        for start in range(0, len(order), self.batch_size):
+            indices = order[start:start + self.batch_size]
+            proba = self._process_batch([chunks[index] for index in indices])
+            for index, item_proba in zip(indices, proba):
+                result[index] = item_proba
+        return result
+
+    def _process_batch(self, chunks: list):
+        """
+        Обрабатывает батч фрагментов за один прямой проход модели.
+
+        Тензоры input_ids и attention_mask собираются напрямую из идентификаторов токенов,
+        без повторной токенизации.
+
+        Параметры:
+        ----------
+        chunks : list of list of int
+            Идентификаторы токенов каждого фрагмента (со служебными токенами).
+
+        Возвращает:
+        ----------
+        numpy.ndarray
+            Вероятности для каждого фрагмента, размерность (len(chunks), количество классов).
+        """
+
+        width = max(len(ids) for ids in chunks)
+        input_ids = np.full((len(chunks), width), self.tokenizer.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(chunks), width), dtype=np.int64)
+        for row, ids in enumerate(chunks):
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+
+        with profiling.stage('forward'):
+            logits = self.backend.predict_logits(input_ids, attention_mask)
+        return 1 / (1 + np.exp(-logits))
+
+    def _process_chunk(self, ids: list):
+        """
+        Обрабатывает один фрагмент и возвращает вероятности .
+
+        Параметры:
+        ----------
+        ids : list of int
+            Идентификаторы токенов фрагмента (со служебными токенами).
 
         Возвращает:
         ----------
@@ -81,16 +214,90 @@ class NlpToolTorch:
             Вероятности для фрагмента текста.
         """
 
-        with torch.no_grad():
-            inputs = self.tokenizer(text, return_tensors='pt', truncation=True, padding=True).to(self.model.device)
-            proba = torch.sigmoid(self.model(**inputs).logits).cpu().numpy()
-            proba = proba[0]
-            return proba
+        return self._process_batch([ids])[0]
+
+    def _encode(self, texts: list) -> list:
+        """
+        Токенизирует список текстов за один вызов токенизатора.
+
+        Параметры:
+        ----------
+        texts : list
+            Список текстов.
+
+        Возвращает:
+        ----------
+        list of list of int
+            Идентификаторы токенов каждого текста (со служебными токенами).
+        """
+
+        if not texts:
+            return []
+        return self.tokenizer(texts, add_special_tokens=True)['input_ids']
+
+    def _split_tokens(self, tokens: list, max_length=112, stride: int | None = None) -> list:
+        """
+        Разбивает токены текста на фрагменты, если их больше максимальной длины.
+
+        Токены текста без служебных делятся на равные части, и каждый фрагмент собирается из среза токенов
+        с добавлением служебных токенов, без decode/encode. С перекрытием stride каждый фрагмент, кроме первого,
+        начинается на stride токенов раньше конца предыдущего: перекрытие вычитается из шага между фрагментами,
+        а не добавляется к фрагменту, поэтому длина любого фрагмента со служебными токенами не превышает max_length.
+
+        Параметры:
+        ----------
+        tokens : list of int
+            Идентификаторы токенов текста (со служебными токенами).
+        max_length : int, optional
+            Максимальная длина фрагмента в токенах со служебными токенами (по умолчанию 112).
+        stride : int, optional
+            Количество токенов перекрытия с предыдущим фрагментом (по умолчанию берется из настроек, 0 - без перекрытия).
+
+        Возвращает:
+        ----------
+        list of list of int
+            Идентификаторы токенов каждого фрагмента (со служебными токенами).
+
+        Raises:
+        ----------
+        ValueError
+            Если перекрытие не меньше длины фрагмента без служебных токенов.
+        """
+
+        num_tokens = len(tokens)
+        if num_tokens <= max_length:
+            return [tokens]
+
+        if stride is None:
+            stride = settings.torch_chunk_stride
+
+        special_ids = set(self.tokenizer.all_special_ids)
+        content = [token for token in tokens if token not in special_ids]
+        window = max_length - self.tokenizer.num_special_tokens_to_add()
+        step = window - stride
+        if step <= 0:
+            raise ValueError(f'Перекрытие фрагментов ({stride}) должно быть меньше их длины ({window})')
+
+        # Каждый фрагмент добавляет к покрытым токенам не больше step новых, первый - еще stride токенов
+        covered = len(content) - stride
+        num_chunks = (covered + step - 1) // step  # Вычисляем количество частей
+        chunk_size = covered // num_chunks  # Определяем размер каждой части
+        remainder = covered % num_chunks  # Оставшийся остаток
+
+        chunks = []
+        end = stride
+        for i in range(num_chunks):
+            start = end - stride
+            end += chunk_size + (1 if i < remainder else 0)
+            chunks.append(self.tokenizer.build_inputs_with_special_tokens(content[start:end]))
+        return chunks
 
     def _split_for_token(self, text: str, max_length=112):
         """
         Разбивает текст на фрагменты, если он превышает максимальную длину, и предсказывает вероятности для каждого фрагмента.
 
+        Все фрагменты одного текста обрабатываются одним батчем.
+
         Параметры:
         ----------
         text : str
@@ -105,28 +312,5 @@ class NlpToolTorch:
             - int: Количество токенов в тексте.
         """
 
-        tokens = self.tokenizer.encode(text)
-        num_tokens = len(tokens)
-
-        if num_tokens <= max_length:
-
-            return self._process_chunk(text), num_tokens
-        else:
-            num_chunks = (num_tokens + max_length - 1) // max_length  # Вычисляем количество частей
-            chunk_size = num_tokens // num_chunks  # Определяем размер каждой части
-            remainder = num_tokens % num_chunks  # Оставшийся остаток
-
-            # Определяем индексы для деления
-            split_indices = []
-            start = 0
-            for i in range(num_chunks):
-                end = start + chunk_size + (1 if i < remainder else 0)
-                split_indices.append((start, end))
-                start = end
-
-            chunks = [tokens[start:end] for start, end in split_indices]
-            chunk_texts = [self.tokenizer.decode(chunk, skip_special_tokens=True) for chunk in chunks]
-
-            proba = [self._process_chunk(chunk_text) for chunk_text in chunk_texts]
-
-            return proba, num_tokens
+        proba, num_tokens = self._predict_batch([text], max_length=max_length)
+        return proba[0], num_tokens[0]
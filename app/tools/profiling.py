@@ -0,0 +1,116 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class ProfileNode:
+    """
+        Узел дерева времени обработки запроса: этап, его время и вложенные этапы.
+
+        Атрибуты:
+        ----------
+        elapsed_ns : int
+            Суммарное время этапа в наносекундах (perf_counter_ns).
+        calls : int
+            Количество выполнений этапа (например, прямых проходов модели по батчам).
+        counters : dict
+            Счетчики этапа (количество фрагментов, токенов, попаданий в кэш).
+        children : dict
+            Вложенные этапы по названиям, в порядке первого выполнения.
+        """
+
+    __slots__ = ('elapsed_ns', 'calls', 'counters', 'children')
+
+    def __init__(self):
+        self.elapsed_ns = 0
+        self.calls = 0
+        self.counters = {}
+        self.children = {}
+
+    def child(self, name: str) -> 'ProfileNode':
+        node = self.children.get(name)
+        if node is None:
+            node = self.children[name] = ProfileNode()
+        return node
+
+    def to_dict(self) -> dict:
+        result = {'ms': round(self.elapsed_ns / 1e6, 3)}
+        if self.calls > 1:
+            result['calls'] = self.calls
+        result.update(self.counters)
+        if self.children:
+            result['stages'] = {name: child.to_dict() for name, child in self.children.items()}
+        return result
+
+
+_current: ContextVar[ProfileNode | None] = ContextVar('profile_node', default=None)
+
+
+def current() -> ProfileNode | None:
+    """
+    Возвращает текущий узел дерева времени или None, если профилирование запроса не включено.
+    """
+
+    return _current.get()
+
+
+@contextmanager
+def profile(enabled: bool = True):
+    """
+    Включает построение дерева времени для кода внутри блока и возвращает его корень (None, если enabled ложно).
+    Этапы в других потоках попадают в дерево, если поток запущен с копией контекста (contextvars.copy_context).
+    """
+
+    if not enabled:
+        yield None
+        return
+
+    root = ProfileNode()
+    token = _current.set(root)
+    start = time.perf_counter_ns()
+    try:
+        yield root
+    finally:
+        root.elapsed_ns += time.perf_counter_ns() - start
+        root.calls += 1
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str, histogram=None):
+    """
+    Измеряет этап обработки. Если профилирование включено, время записывается во вложенный узел текущего узла
+    (повторные этапы с тем же названием суммируются), если задана гистограмма Prometheus - наблюдается в ней
+    в секундах. Без профилирования и гистограммы время не измеряется.
+    """
+
+    parent = _current.get()
+    if parent is None and histogram is None:
+        yield
+        return
+
+    node, token = None, None
+    if parent is not None:
+        node = parent.child(name)
+        token = _current.set(node)
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter_ns() - start
+        if node is not None:
+            node.elapsed_ns += elapsed
+            node.calls += 1
+            _current.reset(token)
+        if histogram is not None:
+            histogram.observe(elapsed / 1e9)
+
+
+def add(name: str, value: int = 1):
+    """
+    Увеличивает счетчик текущего узла дерева времени, если профилирование включено.
+    """
+
+    node = _current.get()
+    if node is not None:
+        node.counters[name] = node.counters.get(name, 0) + value
@@ -1,7 +1,9 @@
 import time
-from pydantic import BaseModel
+from contextlib import contextmanager
+import numpy as np
 import re
 import string
+import unicodedata
 
 
 def execution_time(func):
@@ -24,31 +26,117 @@ def execution_time(func):
     return wrapper
 
 
-def calculate_average(models: list[BaseModel]) -> dict:
+@contextmanager
+def measure(timings: dict, name: str):
     """
-        Вычисляет среднее значение для списка моделей.
+        Контекстный менеджер, записывающий время выполнения блока в миллисекундах в словарь timings под ключом name.
 
         Args:
-            models (list[BaseModel]): Список моделей, для которых нужно вычислить среднее.
+            timings (dict): Словарь для записи времени.
+            name (str): Название измеряемого этапа.
+        """
+
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = (time.perf_counter() - start_time) * 1000
+
+
+def aggregate(values: np.ndarray, weights: np.ndarray | None = None, percentiles=(50, 90, 95)) -> dict:
+    """
+        Вычисляет агрегаты по столбцам массива значений одним векторным проходом: среднее, максимум,
+        перцентили и, если заданы веса, взвешенное среднее.
+
+        Args:
+            values (np.ndarray): Значения формы (количество элементов, количество столбцов).
+            weights (np.ndarray | None): Веса элементов, например количество токенов в тексте.
+            percentiles (Iterable[float]): Перцентили от 0 до 100.
 
         Returns:
-            dict: Словарь со средними значениями по полям моделей.
+            dict: Строки агрегатов по названиям 'mean', 'max', 'weighted_mean', 'p<перцентиль>'.
         """
 
-    result = None
-    model: BaseModel
-    for model in models:
-        if not result:
-            result = model.dict()
-        else:
-            for field_name, field_type in model.__annotations__.items():
-                result[field_name] += getattr(model, field_name)
-
-    for key, value in result.items():
-        result[key] = value / len(models)
+    result = {'mean': values.mean(axis=0), 'max': values.max(axis=0)}
+    if weights is not None and weights.sum() > 0:
+        result['weighted_mean'] = np.average(values, axis=0, weights=weights)
+    percentiles = list(percentiles)
+    if percentiles:
+        for percentile, row in zip(percentiles, np.percentile(values, percentiles, axis=0)):
+            result[f'p{percentile:g}'] = row
     return result
 
 
+def normalize_text(text: str) -> str:
+    """
+        Нормализует текст для сравнения: приводит к форме Unicode NFC и убирает пробелы по краям.
+
+        Args:
+            text (str): Исходный текст.
+
+        Returns:
+            str: Нормализованный текст.
+        """
+
+    return unicodedata.normalize('NFC', text).strip()
+
+
+def dedup_key(text: str) -> str:
+    """
+        Ключ поиска копий сообщения в коллекции: форма Unicode NFC, нижний регистр, пробельные символы
+        схлопнуты в один пробел. Модели настроения и токсичности сами приводят текст к нижнему регистру
+        и делят его по пробельным символам, поэтому для копий с одним ключом их результаты совпадают.
+
+        Args:
+            text (str): Исходный текст.
+
+        Returns:
+            str: Ключ текста.
+        """
+
+    return ' '.join(unicodedata.normalize('NFC', text).lower().split())
+
+
+def deduplicate(texts: list, key=dedup_key) -> tuple[list, list]:
+    """
+        Убирает копии текстов: каждый текст с новым ключом попадает в список уникальных текстов (первое вхождение
+        как есть), для каждого исходного текста запоминается позиция его уникального текста.
+
+        Args:
+            texts (list): Исходные тексты.
+            key (callable | None): Функция ключа текста (None - копиями считаются только одинаковые тексты).
+
+        Returns:
+            tuple[list, list]: Уникальные тексты и позиции уникального текста для каждого исходного текста.
+        """
+
+    positions = {}
+    unique, index = [], []
+    for text in texts:
+        position = positions.setdefault(key(text) if key else text, len(unique))
+        if position == len(unique):
+            unique.append(text)
+        index.append(position)
+    return unique, index
+
+
+# Смайлики и знаки пунктуации удаляются одним проходом одного выражения, скомпилированного при импорте
+EMOJI_AND_PUNCTUATION_PATTERN = re.compile("["
+                                           u"\U0001F600-\U0001F64F"  # смайлики лиц
+                                           u"\U0001F300-\U0001F5FF"  # символы и пиктограммы
+                                           u"\U0001F680-\U0001F6FF"  # транспорт и символы
+                                           u"\U0001F700-\U0001F77F"  # дополнительные символы и пиктограммы
+                                           u"\U0001F780-\U0001F7FF"  # еще больше символов и пиктограмм
+                                           u"\U0001F800-\U0001F8FF"  # другое
+                                           u"\U0001F900-\U0001F9FF"  # еще немного символов
+                                           u"\U0001FA00-\U0001FA6F"  # пиктограммы и символы
+                                           u"\U0001FA70-\U0001FAFF"  # доп. символы и пиктограммы
+                                           u"\U00002702-\U000027B0"  # разные символы
+                                           u"\U000024C2-\U0001F251"  # другие символы
+                                           + re.escape(string.punctuation) +  # знаки пунктуации
+                                           "]+", flags=re.UNICODE)
+
+
 def remove_emojis_and_punctuation(text):
     """
     Удаляет смайлики и знаки пунктуации из текста.
@@ -63,23 +151,5 @@ def remove_emojis_and_punctuation(text):
     str
         Текст без смайликов и знаков пунктуации.
     """
-    # Удаляем смайлики
-    emoji_pattern = re.compile("["
-                               u"\U0001F600-\U0001F64F"  # смайлики лиц
-                               u"\U0001F300-\U0001F5FF"  # символы и пиктограммы
-                               u"\U0001F680-\U0001F6FF"  # транспорт и символы
-                               u"\U0001F700-\U0001F77F"  # дополнительные символы и пиктограммы
-                               u"\U0001F780-\U0001F7FF"  # еще больше символов и пиктограмм
-                               u"\U0001F800-\U0001F8FF"  # другое
-                               u"\U0001F900-\U0001F9FF"  # еще немного символов
-                               u"\U0001FA00-\U0001FA6F"  # пиктограммы и символы
-                               u"\U0001FA70-\U0001FAFF"  # доп. символы и пиктограммы
-                               u"\U00002702-\U000027B0"  # разные символы
-                               u"\U000024C2-\U0001F251"  # другие символы
-                               "]+", flags=re.UNICODE)
-    text = emoji_pattern.sub(r'', text)
-
-    # Удаляем знаки пунктуации
-    text = text.translate(str.maketrans('', '', string.punctuation))
-
-    return text
+
+    return EMOJI_AND_PUNCTUATION_PATTERN.sub('', text)
@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.handlers import MoodHandler, ToxicHandler, NatashaHandler
+from app.tools.nlp_natasha.main import NlpToolNatasha
+
+logger = logging.getLogger(__name__)
+
+
+WARMUP_TEXTS = [
+    'Это пример для анализа текста',
+    'Встреча 12 января 2024 года в Москве на улице Ленина, дом 5. Пишите на https://example.com',
+    'Эта усталость уже измотала. Хочется спать, но не получается. Хочется расслабиться, но постоянно что-то '
+    'тревожит. Такое может свести с ума. ' * 6,
+]
+WARMUP_FILTERS = ['встреча', 'плохое слово']
+
+
+def _load_natasha():
+    if NatashaHandler.pool is not None:
+        NatashaHandler.pool.start()
+        return
+    for name in NlpToolNatasha.MODELS:
+        getattr(NlpToolNatasha, name)
+
+
+def _load_mood():
+    MoodHandler.nlp_dostoevsky.model
+
+
+def _load_toxicity():
+    ToxicHandler.nlp_torch_toxic
+
+
+def _warmup_natasha():
+    for text in WARMUP_TEXTS:
+        NatashaHandler._get_analyze_from_str(text, filters=WARMUP_FILTERS)
+
+
+def _warmup_mood():
+    MoodHandler._get_analyze_from_str(WARMUP_TEXTS[0])
+    MoodHandler._get_analyze_from_list(WARMUP_TEXTS)
+
+
+def _warmup_toxicity():
+    ToxicHandler._get_analyze_from_str(WARMUP_TEXTS[0])
+    ToxicHandler._get_analyze_from_list(WARMUP_TEXTS)
+
+
+# Компоненты: загрузка моделей и прогон контрольных текстов (в обход кэша результатов)
+COMPONENTS = {
+    'natasha': (_load_natasha, _warmup_natasha),
+    'mood': (_load_mood, _warmup_mood),
+    'toxicity': (_load_toxicity, _warmup_toxicity),
+}
+
+
+def preload_models():
+    """
+    Загружает модели, используемые в процессе сервера, без прогрева и без запуска пулов процессов.
+    Используется в родительском процессе режима pre-fork (app.serve): после fork воркеры разделяют
+    загруженные модели с родителем (copy-on-write), а прогрев выполняют сами.
+    """
+
+    loads = [_load_mood, _load_toxicity]
+    if NatashaHandler.pool is None:
+        loads.append(_load_natasha)
+    with ThreadPoolExecutor(len(loads), thread_name_prefix='preload') as executor:
+        for future in [executor.submit(load) for load in loads]:
+            future.result()
+
+
+class Readiness:
+    """
+        Состояние готовности приложения: модели всех компонентов загружаются параллельно в фоновом потоке,
+        затем каждый компонент прогревается на контрольных текстах. Приложение готово, когда прогрев завершен.
+
+        Атрибуты:
+        ----------
+        ready : bool
+            Все компоненты загружены и прогреты.
+        error : str | None
+            Ошибка подготовки, если она произошла.
+        timings : dict
+            Время загрузки и прогрева каждого компонента в миллисекундах.
+        """
+
+    def __init__(self):
+        self.ready = False
+        self.error = None
+        self.timings = {}
+        self._thread = None
+
+    def start(self):
+        """
+        Запускает подготовку приложения в фоновом потоке, не блокируя прием запросов.
+        """
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.prepare, name='warmup', daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    def prepare(self):
+        """
+        Загружает и прогревает все компоненты, компоненты обрабатываются параллельно.
+        """
+
+        start_time = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(len(COMPONENTS), thread_name_prefix='warmup') as executor:
+                futures = [executor.submit(self._prepare_component, name, load, warmup)
+                           for name, (load, warmup) in COMPONENTS.items()]
+                for future in futures:
+                    future.result()
+        except Exception as error:
+            self.error = repr(error)
+            logger.exception('Ошибка подготовки приложения')
+            return
+
+        self.timings['total'] = (time.perf_counter() - start_time) * 1000
+        self.ready = True
+        logger.info('Приложение готово за %.0f мс', self.timings['total'])
+
+    def _prepare_component(self, name: str, load, warmup):
+        start_time = time.perf_counter()
+        load()
+        loaded_time = time.perf_counter()
+        warmup()
+        self.timings[name] = {'load': (loaded_time - start_time) * 1000,
+                              'warmup': (time.perf_counter() - loaded_time) * 1000}
+        logger.info('Компонент %s: загрузка %.0f мс, прогрев %.0f мс', name,
+                    self.timings[name]['load'], self.timings[name]['warmup'])
+
+    def status(self) -> dict:
+        return {'ready': self.ready, 'error': self.error, 'timings': self.timings}
+
+
+readiness = Readiness()
@@ -0,0 +1,73 @@
+"""
+Бенчмарк кэша морфологического словаря: лемматизация и проверка известности слов для всех токенов корпуса
+с MorphVocab и CachedMorphVocab, доля попаданий в кэш.
+
+По умолчанию корпус синтетический: словоформы из словаря pymorphy2 выбираются с распределением Ципфа,
+как в живых текстах соцсетей. Реальный корпус (по одному сообщению в строке) передается через --corpus.
+
+Запуск:
+    python -m benchmarks.bench_morph_vocab --messages 2000
+    python -m benchmarks.bench_morph_vocab --corpus messages.txt
+"""
+import argparse
+import itertools
+import random
+import time
+
+from natasha import Doc, MorphVocab
+
+from app.tools.nlp_natasha.main import NlpToolNatasha
+from app.tools.nlp_natasha.vocab import CachedMorphVocab
+
+
+def make_zipf_corpus(size: int, vocabulary: int = 20000, seed: int = 0) -> list:
+    """
+    Формирует корпус сообщений из словоформ словаря pymorphy2 с частотами по закону Ципфа.
+    """
+
+    rnd = random.Random(seed)
+    forms = [word for word, _ in itertools.islice(MorphVocab().dictionary.words.iteritems(), 0, None, 7)
+             if word.isalpha()][:vocabulary]
+    rnd.shuffle(forms)
+    weights = [1 / rank ** 1.1 for rank in range(1, len(forms) + 1)]
+    return [' '.join(rnd.choices(forms, weights, k=rnd.randint(5, 40))) for _ in range(size)]
+
+
+def run(corpus: list, repeat: int, maxsize: int):
+    tokens = []
+    for text in corpus:
+        doc = Doc(text)
+        doc.segment(NlpToolNatasha.segmenter)
+        doc.tag_morph(NlpToolNatasha.morph_tagger)
+        tokens.extend(doc.tokens)
+    print(f'tokens: {len(tokens)}, unique forms: {len({token.text for token in tokens})}')
+
+    print(f'{"vocab":>16} {"us/token":>10} {"total, s":>10} {"hit_rate":>10}')
+    for vocab in (MorphVocab(), CachedMorphVocab('bench_morph_vocab', maxsize=maxsize)):
+        best = min(_measure(vocab, tokens) for _ in range(repeat))
+        hit_rate = vocab.memo.stats()['hit_rate'] if isinstance(vocab, CachedMorphVocab) else None
+        print(f'{type(vocab).__name__:>16} {best / len(tokens) * 1e6:>10.2f} {best:>10.3f} '
+              f'{"-" if hit_rate is None else f"{hit_rate:.3f}":>10}')
+
+
+def _measure(vocab, tokens: list) -> float:
+    start = time.perf_counter()
+    for token in tokens:
+        vocab.lemmatize(token.text, token.pos, token.feats)
+        vocab.word_is_known(token.text)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='Файл с сообщениями, по одному в строке')
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--maxsize', type=int, default=100000)
+    args = parser.parse_args()
+    if args.corpus:
+        with open(args.corpus, encoding='utf-8') as file:
+            messages = [line.strip() for line in file if line.strip()]
+    else:
+        messages = make_zipf_corpus(args.messages)
+    run(messages, args.repeat, args.maxsize)
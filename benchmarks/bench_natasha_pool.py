@@ -0,0 +1,58 @@
+"""
+Бенчмарк пула процессов Natasha: задержка одиночного запроса и пропускная способность при параллельных
+запросах в зависимости от размера пула (0 - анализ в текущем процессе, как без пула).
+
+Запуск:
+    python -m benchmarks.bench_natasha_pool --messages 200 --pool-sizes 0,1,2,4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.tools.nlp_natasha.main import NlpToolNatasha
+from app.tools.nlp_natasha.pool import NatashaPool
+from benchmarks.bench_torch_batching import make_corpus
+
+
+FILTERS = ['встреча', 'плохое слово']
+
+
+def run(messages: int, pool_sizes: list, concurrency: int, start_method: str):
+    corpus = make_corpus(messages)
+
+    print(f'{"pool_size":>10} {"latency, ms":>12} {"msg/s":>10}')
+    for pool_size in pool_sizes:
+        pool = NatashaPool(pool_size, start_method) if pool_size else None
+        if pool is not None:
+            pool.start()
+
+        def analyze(text):
+            if pool is None:
+                return NlpToolNatasha(text).analyze(FILTERS)
+            return pool.analyze(text, FILTERS)
+
+        analyze(corpus[0])  # прогрев
+        start = time.perf_counter()
+        for text in corpus[:max(messages // 10, 1)]:
+            analyze(text)
+        latency = (time.perf_counter() - start) / max(messages // 10, 1)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            list(executor.map(analyze, corpus))
+        throughput = messages / (time.perf_counter() - start)
+
+        print(f'{pool_size:>10} {latency * 1000:>12.2f} {throughput:>10.1f}')
+        if pool is not None:
+            pool.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--pool-sizes', default=','.join(str(size) for size in sorted({0, 1, 2, os.cpu_count() or 1})))
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--start-method', default='spawn')
+    args = parser.parse_args()
+    run(args.messages, [int(size) for size in args.pool_sizes.split(',')], args.concurrency, args.start_method)
@@ -0,0 +1,112 @@
+"""
+Бенчмарк этапов обработки текста в NlpToolNatasha: время каждого этапа Doc и каждого вида анализа
+на корпусе сообщений, сравнение прежней обработки (все этапы для каждого текста) с ленивой, а также
+доля текстов, пропущенных проверкой ключевых слов перед yargy, и выигрыш от нее на корпусах benchmarks.suite.
+
+Запуск:
+    python -m benchmarks.bench_natasha_stages --messages 200
+"""
+import argparse
+import time
+
+from natasha import Doc
+
+from app.tools.nlp_natasha.main import NlpToolNatasha
+from benchmarks.bench_torch_batching import make_corpus
+from benchmarks.suite import make_corpora
+
+
+def run(messages: int, repeat: int):
+    corpus = make_corpus(messages)
+    NlpToolNatasha(corpus[0]).artifacts()  # прогрев
+
+    print('Этапы Doc:')
+    print(f'{"stage":>14} {"ms/msg":>10} {"total, s":>10}')
+    for stage, best in _measure_stages(corpus, repeat).items():
+        print(f'{stage:>14} {best / messages * 1000:>10.3f} {best:>10.3f}')
+
+    print('Виды анализа (ленивые этапы):')
+    print(f'{"analysis":>14} {"ms/msg":>10} {"total, s":>10}')
+    analyses = {
+        'eager': _eager,
+        'artifacts': lambda text: NlpToolNatasha(text).artifacts(),
+        'filters': lambda text: NlpToolNatasha(text).word_filters(['пример']),
+        'meaningful': lambda text: NlpToolNatasha(text).meaningful_text(),
+    }
+    for name, analyze in analyses.items():
+        best = min(_measure(analyze, corpus) for _ in range(repeat))
+        print(f'{name:>14} {best / messages * 1000:>10.3f} {best:>10.3f}')
+
+    print('Проверка ключевых слов перед yargy (ms/msg): без проверки, проверка, с проверкой, '
+          'для сравнения - токенизация pymorphy2:')
+    print(f'{"extractor":>10} {"corpus":>8} {"skipped":>8} {"ungated":>10} {"check":>10} {"gated":>10} {"morph":>10}')
+    for corpus_name, texts in make_corpora(messages).items():
+        if corpus_name == 'long':
+            continue
+        for name, timings in _measure_gate(texts, repeat).items():
+            print(f'{name:>10} {corpus_name:>8} {timings["skipped"]:>8.1%}',
+                  *(f'{timings[key] / len(texts) * 1000:>10.3f}' for key in ('ungated', 'check', 'gated', 'morph')))
+
+
+def _eager(text: str):
+    """
+    Прежняя обработка: все этапы Doc выполняются для каждого текста независимо от запрошенного анализа.
+    """
+
+    tool = NlpToolNatasha(text)
+    tool._require('parse_syntax', 'tag_ner', 'tag_morph')
+    return tool.artifacts(), tool.word_filters(['пример']), tool.meaningful_text()
+
+
+def _measure_stages(corpus: list, repeat: int) -> dict:
+    timings = {}
+    for _ in range(repeat):
+        current = {'segment': 0.0, **{stage: 0.0 for stage in NlpToolNatasha.STAGES}}
+        for text in corpus:
+            start = time.perf_counter()
+            doc = Doc(text)
+            doc.segment(NlpToolNatasha.segmenter)
+            current['segment'] += time.perf_counter() - start
+            for stage, model in NlpToolNatasha.STAGES.items():
+                start = time.perf_counter()
+                getattr(doc, stage)(getattr(NlpToolNatasha, model))
+                current[stage] += time.perf_counter() - start
+        timings = {stage: min(value, timings.get(stage, value)) for stage, value in current.items()}
+    return timings
+
+
+def _measure_gate(corpus: list, repeat: int) -> dict:
+    """
+    Измеряет экстракторы дат и адресов без проверки ключевых слов и с ней, отдельно саму проверку
+    и, для сравнения, токенизацию текста токенизатором парсера с разбором pymorphy2.
+    """
+
+    results = {}
+    for name in ('dates', 'addresses'):
+        gated = NlpToolNatasha.dates_extractor if name == 'dates' else NlpToolNatasha.address_extractor
+        tokenizer = gated.extractor.parser.tokenizer
+        analyses = {
+            'ungated': lambda text: list(gated.extractor(text)),
+            'check': gated.has_anchors,
+            'gated': gated,
+            'morph': lambda text: list(tokenizer(text)),
+        }
+        timings = {key: min(_measure(analyze, corpus) for _ in range(repeat)) for key, analyze in analyses.items()}
+        timings['skipped'] = sum(not gated.has_anchors(text) for text in corpus) / len(corpus)
+        results[name] = timings
+    return results
+
+
+def _measure(analyze, corpus: list) -> float:
+    start = time.perf_counter()
+    for text in corpus:
+        analyze(text)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.messages, args.repeat)
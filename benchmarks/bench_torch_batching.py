@@ -0,0 +1,67 @@
+"""
+Бенчмарк батчевого инференса NlpToolTorch: сообщений в секунду в зависимости от размера батча и бэкенда.
+
+Запуск:
+    python -m benchmarks.bench_torch_batching --messages 500 --batch-sizes 1,8,16,32,64
+    python -m benchmarks.bench_torch_batching --backends torch,onnx
+"""
+import argparse
+import random
+import time
+
+from app.tools.nlp_torch.main import NlpToolTorch
+
+
+SAMPLE_TEXTS = [
+    'Это пример для анализа текста',
+    'Сердце красавицы склонно к измене и перемене... Раз, два, три, даю пробу.',
+    'Экзамен...для меня...всегда праздник, профессор.',
+    'Эта усталость уже измотала. Хочется спать, но не получается. Хочется расслабиться, но постоянно что-то '
+    'тревожит. Такое может свести с ума.',
+    'wef3egf34g',
+]
+
+
+def make_corpus(size: int, seed: int = 0) -> list:
+    """
+    Формирует корпус сообщений разной длины, от коротких реплик до длинных постов,
+    которые разбиваются на несколько фрагментов.
+    """
+
+    rnd = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        repeat = rnd.choice([1, 1, 1, 2, 4, 12])
+        corpus.append(' '.join(rnd.choice(SAMPLE_TEXTS) for _ in range(repeat)))
+    return corpus
+
+
+def run(model: str, messages: int, batch_sizes: list, repeat: int, backends: list):
+    corpus = make_corpus(messages)
+
+    print(f'{"backend":>8} {"batch_size":>10} {"msg/s":>10} {"best, s":>10}')
+    for backend in backends:
+        tool = NlpToolTorch(model, backend=backend)
+        tool.predict_probabilities(corpus[:8])  # прогрев
+        for batch_size in batch_sizes:
+            tool.batch_size = batch_size
+            best = min(_measure(tool, corpus) for _ in range(repeat))
+            print(f'{backend:>8} {batch_size:>10} {messages / best:>10.1f} {best:>10.3f}')
+
+
+def _measure(tool: NlpToolTorch, corpus: list) -> float:
+    start = time.perf_counter()
+    tool.predict_probabilities(corpus)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='cointegrated/rubert-tiny-toxicity')
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--batch-sizes', default='1,8,16,32,64')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--backends', default='torch')
+    args = parser.parse_args()
+    run(args.model, args.messages, [int(size) for size in args.batch_sizes.split(',')], args.repeat,
+        args.backends.split(','))
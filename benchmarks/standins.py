@@ -0,0 +1,68 @@
+"""
+Легкие модели-заменители для бенчмарков: маленький трансформер со случайными весами и словарем из символов
+и маленькая модель fastText, обученная на синтетическом корпусе. Они повторяют интерфейсы и форму
+вычислений настоящих моделей, но создаются за секунды и не требуют загрузки из сети.
+"""
+import os
+import random
+import string
+
+import torch
+from dostoevsky.models import FastTextSocialNetworkModel
+from dostoevsky.tokenization import RegexTokenizer
+from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+SPECIAL_TOKENS = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]']
+ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя' + string.ascii_lowercase + string.digits
+MOOD_LABELS = ('positive', 'neutral', 'negative', 'skip', 'speech')
+
+
+def make_torch_model(directory: str) -> str:
+    """
+    Создает в каталоге маленькую модель BERT с пятью выходами и символьным словарем WordPiece.
+
+    Returns:
+        str: Путь к модели для NlpToolTorch.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    vocab = SPECIAL_TOKENS + list(ALPHABET) + list(string.punctuation) + [f'##{char}' for char in ALPHABET]
+    vocab_file = os.path.join(directory, 'vocab.txt')
+    with open(vocab_file, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(vocab) + '\n')
+
+    torch.manual_seed(0)
+    config = BertConfig(vocab_size=len(vocab), hidden_size=64, num_hidden_layers=2, num_attention_heads=2,
+                        intermediate_size=128, max_position_embeddings=512, num_labels=5,
+                        problem_type='multi_label_classification')
+    BertForSequenceClassification(config).save_pretrained(directory)
+    BertTokenizerFast(vocab_file=vocab_file, do_lower_case=True).save_pretrained(directory)
+    return directory
+
+
+def make_dostoevsky_model(directory: str, texts: list) -> FastTextSocialNetworkModel:
+    """
+    Обучает в каталоге маленькую модель fastText с метками настроения dostoevsky на переданных текстах
+    (метки назначаются случайно) и возвращает модель с интерфейсом FastTextSocialNetworkModel.
+    """
+
+    import fasttext
+
+    os.makedirs(directory, exist_ok=True)
+    rnd = random.Random(0)
+    train_path = os.path.join(directory, 'train.txt')
+    tokenizer = RegexTokenizer()
+    with open(train_path, 'w', encoding='utf-8') as file:
+        for text in texts:
+            tokens = ' '.join(token for token, _ in tokenizer.split(text, lemmatize=False))
+            file.write(f'__label__{rnd.choice(MOOD_LABELS)} {tokens}\n')
+        for label in MOOD_LABELS:
+            file.write(f'__label__{label} {label}\n')
+
+    model_path = os.path.join(directory, 'fasttext-social-network-model.bin')
+    fasttext.train_supervised(train_path, dim=16, epoch=5, thread=1, verbose=0).save_model(model_path)
+
+    class StandInModel(FastTextSocialNetworkModel):
+        MODEL_PATH = model_path
+
+    return StandInModel(tokenizer=tokenizer)
@@ -0,0 +1,219 @@
+"""
+Набор микробенчмарков этапов обработки: токсичность (разбиение на фрагменты, прямой проход), настроение,
+этапы Natasha (по одному тексту и пакетом, поиск ссылок, адресов и телефонов), агрегация сводки и сериализация
+ответа. Каждый бенчмарк выполняется на корпусах с разным распределением длины сообщений, время сообщается
+в микросекундах на сообщение (медиана и минимум по повторам).
+
+С флагом --stand-in вместо настоящих моделей токсичности и настроения используются легкие заменители
+(benchmarks.standins), что позволяет запускать набор без загрузки моделей; Natasha всегда использует
+свои модели из пакета. Абсолютные значения зависят от машины, поэтому базовые результаты не хранятся
+в репозитории: их сохраняют локально (--save-baseline) и сравнивают с ними после изменений (--baseline).
+Если медиана бенчмарка хуже базовой больше чем на --threshold, набор завершается с кодом 1.
+
+Запуск:
+    python -m benchmarks.suite --stand-in --save-baseline bench_baseline.json
+    python -m benchmarks.suite --stand-in --baseline bench_baseline.json --threshold 0.2
+    python -m benchmarks.suite --filter natasha --corpora short,mixed
+"""
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_torch_batching import SAMPLE_TEXTS, make_corpus
+
+ARTIFACT_TEXTS = [
+    'Встреча назначена на 12 марта 2023 года в Москве, ул. Тверская, д. 7.',
+    'Пишите на info@example.ru или звоните +7 (912) 345-67-89.',
+    'Подробности на https://example.ru/news, Иван Петров из ООО "Ромашка" подтвердил 🙂',
+]
+
+LINK_TEXTS = [
+    'Полный текст: https://example.ru/news/2023/05/article?id=123&ref=vk',
+    'Видео https://youtu.be/dQw4w9WgXcQ и канал https://t.me/channel/4567 🔥🔥',
+    'Вопросы пишите на support@example.ru, по телефону 8 800 555-35-35.',
+    'Регистрация: https://forms.example.com/r/AbC-dEf_123 (до 12 марта)!!!',
+]
+
+
+def make_corpora(messages: int, seed: int = 0) -> dict:
+    """
+    Формирует корпуса с разным распределением длины сообщений: короткие реплики, смешанный корпус
+    (как в bench_torch_batching) и длинные посты из нескольких фрагментов модели токсичности.
+    Длинные корпуса (long и links - посты со множеством ссылок, адресов и телефонов) в четыре раза меньше
+    остальных, чтобы время прогона было сопоставимым.
+    """
+
+    rnd = random.Random(seed)
+    texts = SAMPLE_TEXTS + ARTIFACT_TEXTS
+    return {
+        'short': [rnd.choice(texts) for _ in range(messages)],
+        'mixed': make_corpus(messages, seed),
+        'long': [' '.join(rnd.choice(texts) for _ in range(rnd.randint(12, 24)))
+                 for _ in range(max(messages // 4, 1))],
+        'links': [' '.join(rnd.choice(LINK_TEXTS if index % 2 else texts) for index in range(rnd.randint(12, 24)))
+                  for _ in range(max(messages // 4, 1))],
+    }
+
+
+def install_stand_ins(directory: str, corpus: list):
+    """
+    Подменяет модели токсичности и настроения легкими заменителями.
+    """
+
+    from app.handlers import ToxicHandler
+    from app.tools.nlp_dostoevsky.main import NlpToolDostoevsky
+    from app.tools.nlp_torch.main import NlpToolTorch
+    from benchmarks.standins import make_dostoevsky_model, make_torch_model
+
+    ToxicHandler.__dict__['nlp_torch_toxic'].replace(
+        NlpToolTorch(make_torch_model(f'{directory}/torch'), backend='torch'))
+    NlpToolDostoevsky.__dict__['model'].replace(make_dostoevsky_model(f'{directory}/dostoevsky', corpus))
+
+
+def make_benchmarks() -> dict:
+    """
+    Возвращает бенчмарки: имя -> функция подготовки, которая получает корпус и возвращает
+    пару (функция одного прогона по корпусу, количество сообщений в прогоне).
+    """
+
+    from app.handlers import ToxicHandler
+    from app.main import sections_response
+    from app.models import OutputAverageModel
+    from app.text_analysis import process_with_list
+    from app.tools.nlp_dostoevsky.main import NlpToolDostoevsky
+    from app.tools.nlp_natasha.artifacts import ArtifactScanner
+    from app.tools.nlp_natasha.main import NlpToolNatasha
+    from app.utils import aggregate, remove_emojis_and_punctuation
+
+    def per_text(function):
+        return lambda corpus: (lambda: [function(text) for text in corpus], len(corpus))
+
+    def toxicity_chunks(corpus):
+        tool = ToxicHandler.nlp_torch_toxic
+        chunks = [chunk for tokens in tool._encode(corpus) for chunk in tool._split_tokens(tokens)]
+        return lambda: [tool._process_chunk(chunk) for chunk in chunks], len(corpus)
+
+    def toxicity_batch(corpus):
+        tool = ToxicHandler.nlp_torch_toxic
+        return lambda: tool._predict_batch(corpus), len(corpus)
+
+    def mood_list(corpus):
+        return lambda: NlpToolDostoevsky.analyze_list(corpus), len(corpus)
+
+    def summary_aggregate(corpus):
+        rnd = np.random.default_rng(0)
+        mood, toxicity = rnd.random((len(corpus), 5)), rnd.random((len(corpus), 5))
+        weights = rnd.integers(1, 500, len(corpus)).astype(float)
+
+        def run():
+            return OutputAverageModel.from_aggregates(mood=aggregate(mood), toxicity=aggregate(toxicity, weights),
+                                                      toxicity_count_tokens=int(weights.sum()))
+        return run, len(corpus)
+
+    def response_serialization(corpus):
+        result = process_with_list(corpus)
+        return lambda: sections_response(result).body, len(corpus)
+
+    return {
+        'toxicity.split_for_token': per_text(lambda text: ToxicHandler.nlp_torch_toxic._split_for_token(text)),
+        'toxicity.process_chunk': toxicity_chunks,
+        'toxicity.predict_batch': toxicity_batch,
+        'mood.analyze_list': mood_list,
+        'natasha.init': per_text(lambda text: NlpToolNatasha(text).doc),
+        'natasha.artifacts': per_text(lambda text: NlpToolNatasha(text).artifacts()),
+        'natasha.artifact_scan': per_text(ArtifactScanner.scan),
+        'natasha.remove_emojis': per_text(remove_emojis_and_punctuation),
+        'natasha.word_filters': per_text(lambda text: NlpToolNatasha(text).word_filters(['пример', 'усталость'])),
+        'natasha.meaningful_text': per_text(lambda text: NlpToolNatasha(text).meaningful_text()),
+        'natasha.analyze_many': lambda corpus: (
+            lambda: NlpToolNatasha.analyze_many(corpus, ['пример', 'усталость'], ('filters', 'meaningful')), len(corpus)),
+        'summary.aggregate': summary_aggregate,
+        'response.serialization': response_serialization,
+    }
+
+
+def measure(run, count: int, repeat: int) -> dict:
+    run()  # прогрев
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - start) / count * 1e6)
+    return {'median_us': statistics.median(samples), 'min_us': min(samples)}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Сравнивает медианы с базовыми и возвращает регрессии: (бенчмарк, базовая медиана, текущая медиана).
+    """
+
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base and current['median_us'] > base['median_us'] * (1 + threshold):
+            regressions.append((name, base['median_us'], current['median_us']))
+    return regressions
+
+
+def run(args) -> int:
+    corpora = make_corpora(args.messages, args.seed)
+    corpora = {name: corpus for name, corpus in corpora.items() if name in args.corpora}
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.stand_in:
+            install_stand_ins(directory, make_corpus(500, args.seed + 1))
+        benchmarks = {name: setup for name, setup in make_benchmarks().items()
+                      if any(part in name for part in args.filter)}
+
+        baseline = {}
+        if args.baseline:
+            with open(args.baseline, encoding='utf-8') as file:
+                saved = json.load(file)
+            if saved['meta']['stand_in'] != args.stand_in:
+                print('Базовые результаты получены с другими моделями (--stand-in), сравнение некорректно',
+                      file=sys.stderr)
+            baseline = saved['results']
+
+        results = {}
+        print(f'{"benchmark":<28} {"corpus":>6} {"median, us":>12} {"min, us":>12} {"baseline":>12}')
+        for name, setup in benchmarks.items():
+            for corpus_name, corpus in corpora.items():
+                key = f'{name}/{corpus_name}'
+                results[key] = measure(*setup(corpus), args.repeat)
+                base = baseline.get(key, {}).get('median_us')
+                print(f'{name:<28} {corpus_name:>6} {results[key]["median_us"]:>12.1f} '
+                      f'{results[key]["min_us"]:>12.1f} {"-" if base is None else f"{base:.1f}":>12}')
+
+    if args.save_baseline:
+        meta = {'stand_in': args.stand_in, 'messages': args.messages, 'repeat': args.repeat,
+                'python': platform.python_version(), 'machine': platform.machine(), 'created': time.time()}
+        with open(args.save_baseline, 'w', encoding='utf-8') as file:
+            json.dump({'meta': meta, 'results': results}, file, indent=2)
+
+    regressions = compare(results, baseline, args.threshold)
+    for name, base, current in regressions:
+        print(f'Регрессия {name}: {base:.1f} -> {current:.1f} мкс/сообщение (+{(current / base - 1) * 100:.0f}%)',
+              file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stand-in', action='store_true', help='легкие модели-заменители вместо настоящих')
+    parser.add_argument('--messages', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--corpora', type=lambda value: value.split(','), default=['short', 'mixed', 'long', 'links'])
+    parser.add_argument('--filter', type=lambda value: value.split(','), default=[''],
+                        help='подстроки имен бенчмарков через запятую')
+    parser.add_argument('--baseline', help='файл базовых результатов для сравнения')
+    parser.add_argument('--save-baseline', help='сохранить результаты как базовые в файл')
+    parser.add_argument('--threshold', type=float, default=0.2, help='допустимое ухудшение медианы (доля)')
+    sys.exit(run(parser.parse_args()))